@@ -0,0 +1,181 @@
+from __future__ import annotations
+from typing import Dict
+from JavaFileFacts import JavaFileFacts
+import hashlib
+import marshal
+import os
+import sqlite3
+import zlib
+import parser_service
+from jdk_symbols import symbols_version
+
+# the version of the facts records, change it when the analysis changes
+FACTS_VERSION = 5
+
+
+def facts_version() -> str:
+    """
+    get the version of the facts records, the facts of different versions
+    may differ for the same file
+    """
+    return ".".join(
+        (
+            parser_service.grammar_version(),
+            str(FACTS_VERSION),
+            symbols_version(),
+            str(marshal.version),
+        )
+    )
+
+
+class AnalysisCache:
+    """
+    on-disk cache of the facts of java files
+    an entry is keyed by the path of the file, the hash of its content,
+    the engine and the version of the grammar, so unchanged files skip tree-sitter
+    the engines have their own entries, their partial facts of a failed file
+    may differ
+    """
+
+    def __init__(
+        self, cache_path: str = ".analysis_cache/facts.db", max_bytes: int = 256 << 20
+    ) -> None:
+        """
+        open the cache, create it if it doesn't exist
+
+        :param cache_path: the path of the cache file
+        :param max_bytes: the size cap of the entries,
+            the least recently used entries are evicted beyond it
+        """
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.hit_count = 0  # the number of lookups found in the cache
+        self.miss_count = 0  # the number of lookups not found in the cache
+        self.evict_count = 0  # the number of evicted entries
+        # the version every key ends with, see 'end_key'
+        self.version = facts_version()
+
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS entry ("
+            "path TEXT PRIMARY KEY, key TEXT, data BLOB, size INTEGER, last_used INTEGER)"
+        )
+        self.total_bytes, self.clock = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0), COALESCE(MAX(last_used), 0) FROM entry"
+        ).fetchone()
+        self.used_dict: Dict[str, int] = {}  # the paths used in this run
+
+    def make_key(self, content: bytes, engine: str = "walker") -> str:
+        """
+        make the key of the content analyzed by the engine
+        """
+        return self.end_key(hashlib.sha1(content).hexdigest(), engine)
+
+    def end_key(self, key: str, engine: str = "walker") -> str:
+        """
+        end the key of an entry with the engine and the version
+        """
+        return f"{key}.{engine}.{self.version}"
+
+    def get(
+        self, path: str, content: bytes, engine: str = "walker"
+    ) -> JavaFileFacts | None:
+        """
+        get the facts of the file if the content didn't change
+        """
+        return self.get_entry(path, self.make_key(content, engine))
+
+    def get_entry(self, path: str, key: str) -> JavaFileFacts | None:
+        """
+        get the facts stored for the path if they were stored with the key
+        """
+        row = self.connection.execute(
+            "SELECT key, data FROM entry WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None or row[0] != key:
+            self.miss_count += 1
+            return None
+        self.hit_count += 1
+        self.clock += 1
+        self.used_dict[path] = self.clock
+        return JavaFileFacts.from_record(marshal.loads(zlib.decompress(row[1])))
+
+    def put(
+        self,
+        path: str,
+        content: bytes,
+        java_file_facts: JavaFileFacts,
+        engine: str = "walker",
+    ) -> None:
+        """
+        store the facts of the file analyzed by the engine
+        """
+        self.put_entry(path, self.make_key(content, engine), java_file_facts)
+
+    def put_entry(self, path: str, key: str, java_file_facts: JavaFileFacts) -> None:
+        """
+        store the facts for the path with the key
+        """
+        data = zlib.compress(marshal.dumps(java_file_facts.to_record()))
+        row = self.connection.execute(
+            "SELECT size FROM entry WHERE path = ?", (path,)
+        ).fetchone()
+        if row is not None:
+            self.total_bytes -= row[0]
+        self.clock += 1
+        self.used_dict.pop(path, None)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO entry VALUES (?, ?, ?, ?, ?)",
+            (path, key, data, len(data), self.clock),
+        )
+        self.total_bytes += len(data)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        evict the least recently used entries until the cache fits its cap
+        """
+        self.flush_used()
+        rows = self.connection.execute(
+            "SELECT path, size FROM entry ORDER BY last_used"
+        ).fetchall()
+        for path, size in rows:
+            if self.total_bytes <= self.max_bytes:
+                break
+            self.connection.execute("DELETE FROM entry WHERE path = ?", (path,))
+            self.total_bytes -= size
+            self.evict_count += 1
+
+    def flush_used(self) -> None:
+        """
+        write the last use of the entries hit in this run
+        """
+        self.connection.executemany(
+            "UPDATE entry SET last_used = ? WHERE path = ?",
+            [(last_used, path) for path, last_used in self.used_dict.items()],
+        )
+        self.used_dict = {}
+
+    def close(self) -> None:
+        """
+        save the changes and close the cache
+        """
+        self.flush_used()
+        self.connection.commit()
+        self.connection.close()
+
+    def __enter__(self) -> AnalysisCache:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __str__(self) -> str:
+        return (
+            f"hit: {self.hit_count}, miss: {self.miss_count}, "
+            f"evict: {self.evict_count}, size: {self.total_bytes}"
+        )
@@ -0,0 +1,71 @@
+from __future__ import annotations
+from typing import Dict
+import tree_sitter
+
+
+class AnalysisError(Exception):
+    """
+    the error of a construct the analysis doesn't handle
+    it records the file, the type of the node and its byte range,
+    so a failed file can be found and retried after the run
+    """
+
+    def __init__(
+        self,
+        message: str,
+        node_type: str | None = None,
+        start_byte: int | None = None,
+        end_byte: int | None = None,
+        path: str | None = None,
+    ) -> None:
+        super().__init__(message)
+        self.message = message  # what went wrong
+        self.node_type = node_type  # the type of the node, None if unknown
+        self.start_byte = start_byte  # the start of the node in the content
+        self.end_byte = end_byte  # the end of the node in the content
+        self.path = path  # the path of the file, set by the batch driver
+
+    @classmethod
+    def at(cls, message: str, node: tree_sitter.Node) -> AnalysisError:
+        """
+        make the error of the node
+        """
+        return cls(message, node.type, node.start_byte, node.end_byte)
+
+    @classmethod
+    def from_exception(cls, error: Exception, path: str) -> AnalysisError:
+        """
+        get the error of the file from any exception of its analysis,
+        an exception not raised by the analysis has no node
+        """
+        if not isinstance(error, AnalysisError):
+            error = cls(f"{type(error).__name__}: {error}")
+        error.path = path
+        return error
+
+    def to_dict(self) -> Dict:
+        """
+        get the error as a dict of plain values
+        """
+        return {
+            "path": self.path,
+            "message": self.message,
+            "node_type": self.node_type,
+            "start_byte": self.start_byte,
+            "end_byte": self.end_byte,
+        }
+
+    def __reduce__(self) -> tuple:
+        # the errors come back from the worker processes
+        return (
+            AnalysisError,
+            (self.message, self.node_type, self.start_byte, self.end_byte, self.path),
+        )
+
+    def __str__(self) -> str:
+        if self.node_type is None:
+            return f"{self.path}: {self.message}"
+        return (
+            f"{self.path}: {self.message} "
+            f"({self.node_type} at bytes {self.start_byte}-{self.end_byte})"
+        )
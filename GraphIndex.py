@@ -0,0 +1,132 @@
+from __future__ import annotations
+from typing import Dict, Iterable, List, Set, Tuple
+from collections import deque
+from JavaClass import JavaClass
+from jdk_symbols import is_jdk_id
+
+
+class GraphIndex:
+    """
+    in-memory index of the resolved class graph
+    every id is numbered, and the edges are kept as forward and reverse
+    adjacency lists, so a neighborhood is found in time of its size
+    """
+
+    def __init__(
+        self, java_classes: Iterable[JavaClass], hide_jdk: bool = False
+    ) -> None:
+        """
+        build the index from the id sets of the linked classes
+
+        :param hide_jdk: leave out the edges to the types of the jdk
+        """
+        self.id_list: List[str] = []  # the number maps to the id
+        self.number_dict: Dict[str, int] = {}  # the id maps to its number
+        self.class_dict: Dict[str, JavaClass] = {}  # the id maps to the class
+        self.forward_list: List[
+            List[Tuple[int, str]]
+        ] = []  # the number maps to the numbers and labels of the edges from it
+        self.reverse_list: List[
+            List[Tuple[int, str]]
+        ] = []  # the number maps to the numbers and labels of the edges to it
+
+        number_dict = self.number_dict
+        reverse_list = self.reverse_list
+        for java_class in java_classes:
+            self.class_dict[java_class.id] = java_class
+            source = self.get_number(java_class.id)
+            source_edge_list = self.forward_list[source]
+            for java_class_id, label in java_class.relation_edges():
+                if hide_jdk and is_jdk_id(java_class_id):
+                    continue
+                target = number_dict.get(java_class_id)
+                if target is None:
+                    target = self.get_number(java_class_id)
+                source_edge_list.append((target, label))
+                reverse_list[target].append((source, label))
+
+    def get_number(self, java_class_id: str) -> int:
+        """
+        get the number of the id, number it if it is new
+        """
+        number = self.number_dict.get(java_class_id)
+        if number is None:
+            number = len(self.id_list)
+            self.number_dict[java_class_id] = number
+            self.id_list.append(java_class_id)
+            self.forward_list.append([])
+            self.reverse_list.append([])
+        return number
+
+    def neighborhood(
+        self,
+        java_class_id: str,
+        hops: int | None = 1,
+        direction: str = "forward",
+        label_set: Set[str] | None = None,
+    ) -> Dict[str, int]:
+        """
+        find the classes within some hops of the class by breadth first search
+        return the ids mapping to their distances, the class itself included
+
+        :param java_class_id: the id of the class in the center
+        :param hops: the most edges to follow, None for no limit
+        :param direction: 'forward' follows what it uses,
+            'reverse' follows what uses it, 'both' follows both
+        :param label_set: the labels of the edges to follow, None for all,
+            e.g. {'inheritance'}, an edge has the label it is drawn with
+        """
+        number = self.number_dict.get(java_class_id)
+        if number is None:
+            raise Exception("unknown class!", java_class_id)
+        match direction:
+            case "forward":
+                adjacency_lists = (self.forward_list,)
+            case "reverse":
+                adjacency_lists = (self.reverse_list,)
+            case "both":
+                adjacency_lists = (self.forward_list, self.reverse_list)
+            case _:
+                raise Exception("unknown direction!", direction)
+
+        distance_dict: Dict[int, int] = {number: 0}
+        queue = deque((number,))
+        while queue:
+            number = queue.popleft()
+            distance = distance_dict[number]
+            if hops is not None and distance >= hops:
+                continue
+            for adjacency_list in adjacency_lists:
+                for neighbor, label in adjacency_list[number]:
+                    if neighbor in distance_dict:
+                        continue
+                    if label_set is not None and label not in label_set:
+                        continue
+                    distance_dict[neighbor] = distance + 1
+                    queue.append(neighbor)
+        return {
+            self.id_list[number]: distance
+            for number, distance in distance_dict.items()
+        }
+
+    def dependents(
+        self,
+        java_class_id: str,
+        hops: int | None = None,
+        label_set: Set[str] | None = None,
+    ) -> Dict[str, int]:
+        """
+        find the classes that use the class, directly or through others
+        e.g. who inherits from it, with label_set {'inheritance'}
+        """
+        return self.neighborhood(java_class_id, hops, "reverse", label_set)
+
+    def classes(self, id_set: Iterable[str]) -> List[JavaClass]:
+        """
+        get the analyzed classes of the ids, the others are skipped
+        """
+        return [
+            self.class_dict[java_class_id]
+            for java_class_id in id_set
+            if java_class_id in self.class_dict
+        ]
@@ -0,0 +1,242 @@
+from __future__ import annotations
+from typing import Callable, Dict, List, Set, Tuple
+from GraphIndex import GraphIndex
+from graph_metrics import find_components
+
+# the labels of the edges transitive reduction works on
+REDUCED_LABEL_SET = {"inheritance", "realization"}
+# the labels of the edges that may be dropped, the weakest first,
+# the structural edges, inheritance, realization and composition, are always kept
+WEAK_LABEL_RANK_DICT = {"dependency": 0, "aggregation": 1}
+
+
+class GraphSimplifier:
+    """
+    simplification of the class graph before it is drawn
+    graphviz takes superlinear time in the edges, so the edges are cut
+    down to a budget: the edges to hub classes used by nearly everything
+    are elided, the inheritance and realization edges implied by
+    a longer chain are reduced, and the weakest edges are dropped first
+    """
+
+    def __init__(
+        self,
+        graph_index: GraphIndex,
+        is_shown: Callable[[str], bool] | None = None,
+    ) -> None:
+        """
+        :param graph_index: the index of the linked classes
+        :param is_shown: check if the edges to the class are drawn at all,
+            e.g. 'Painter.is_shown', None to draw every edge
+        """
+        self.graph_index = graph_index
+        self.is_shown = is_shown
+        self.hub_id_list: List[str] = []  # the ids of the elided hubs
+        self.elided_count = 0  # the number of edges to hubs elided
+        self.reduced_count = 0  # the number of edges reduced
+        self.dropped_count = 0  # the number of edges dropped for the budget
+
+    def find_hubs(self, hub_degree: int) -> Set[int]:
+        """
+        find the hubs, the classes used by more than hub_degree classes
+        through weak edges, e.g. java.lang.String
+        """
+        hub_set: Set[int] = set()
+        for number, edge_list in enumerate(self.graph_index.reverse_list):
+            if len(edge_list) <= hub_degree:
+                continue
+            weak_count = sum(
+                1 for _, label in edge_list if label in WEAK_LABEL_RANK_DICT
+            )
+            if weak_count > hub_degree:
+                hub_set.add(number)
+        return hub_set
+
+    def reduce_transitive(
+        self, edge_dict: Dict[int, List[Tuple[int, str]]]
+    ) -> Set[Tuple[int, int]]:
+        """
+        find the inheritance and realization edges implied by a chain,
+        e.g. 'C implements I' when C extends B and B implements I
+        the cycles are collapsed first, and an edge between two of them is
+        redundant if its target is reached through another successor,
+        the edges inside a cycle are kept, so every class reaches
+        the same classes as before
+
+        :param edge_dict: the source maps to the targets and labels of its edges
+        return the sources and targets of the redundant edges
+        """
+        forward_list: List[List[Tuple[int, str]]] = [
+            [] for _ in self.graph_index.id_list
+        ]
+        for source, edge_list in edge_dict.items():
+            forward_list[source] = [
+                (target, label)
+                for target, label in edge_list
+                if label in REDUCED_LABEL_SET
+            ]
+        component_list = find_components(forward_list)
+        component_of = [0] * len(forward_list)  # the number maps to its component
+        for component, member_list in enumerate(component_list):
+            for member in member_list:
+                component_of[member] = component
+
+        # the components come after the ones they reach, so the classes
+        # above a component are known before it is visited
+        above_list: List[Set[int]] = []  # the component maps to all it reaches
+        successor_list: List[Set[int]] = []  # the component maps to the next ones
+        for component, member_list in enumerate(component_list):
+            successor_set = {
+                component_of[target]
+                for member in member_list
+                for target, _ in forward_list[member]
+            }
+            successor_set.discard(component)
+            above_set = set(successor_set)
+            for successor in successor_set:
+                above_set |= above_list[successor]
+            successor_list.append(successor_set)
+            above_list.append(above_set)
+
+        redundant_set: Set[Tuple[int, int]] = set()
+        for source, edge_list in enumerate(forward_list):
+            component = component_of[source]
+            successor_set = successor_list[component]
+            if len(successor_set) < 2:
+                continue
+            for target, _ in edge_list:
+                target_component = component_of[target]
+                if target_component == component:
+                    continue
+                if any(
+                    target_component in above_list[other]
+                    for other in successor_set
+                    if other != target_component
+                ):
+                    redundant_set.add((source, target))
+        return redundant_set
+
+    def simplify(
+        self,
+        edge_budget: int | None = None,
+        hub_degree: int | None = None,
+        transitive_reduction: bool = True,
+    ) -> Dict[str, Set[str]]:
+        """
+        choose the edges drawn, the analyzed classes and their structural
+        edges are always drawn, so the budget only bounds the weak edges
+        the order is deterministic, the same graph gives the same edges
+
+        :param edge_budget: the most edges drawn, the dependencies to the most
+            used classes are dropped first, then the aggregations,
+            None for no budget
+        :param hub_degree: the weak edges to a class used by more than this
+            many classes are elided, None to keep the hubs
+        :param transitive_reduction: drop the inheritance and realization
+            edges implied by a chain
+        return the ids of the analyzed classes mapping to the ids of
+            the classes their drawn edges go to, for 'Painter.keep_edges'
+        """
+        graph_index = self.graph_index
+        id_list = graph_index.id_list
+        is_shown = self.is_shown
+        shown_list: List[bool] | None = None  # the number maps to it being drawn
+        if is_shown is not None:
+            shown_list = [is_shown(java_class_id) for java_class_id in id_list]
+
+        hub_set = set() if hub_degree is None else self.find_hubs(hub_degree)
+        self.hub_id_list = sorted(id_list[number] for number in hub_set)
+        self.elided_count = 0
+        edge_dict: Dict[int, List[Tuple[int, str]]] = {}
+        for java_class_id in graph_index.class_dict:
+            source = graph_index.number_dict[java_class_id]
+            if shown_list is not None and not shown_list[source]:
+                continue
+            edge_list: List[Tuple[int, str]] = []
+            for target, label in graph_index.forward_list[source]:
+                if shown_list is not None and not shown_list[target]:
+                    continue
+                if target in hub_set and label in WEAK_LABEL_RANK_DICT:
+                    self.elided_count += 1
+                    continue
+                edge_list.append((target, label))
+            edge_dict[source] = edge_list
+
+        redundant_set: Set[Tuple[int, int]] = set()
+        if transitive_reduction:
+            redundant_set = self.reduce_transitive(edge_dict)
+        self.reduced_count = len(redundant_set)
+
+        dropped_set: Set[Tuple[int, int]] = set()
+        if edge_budget is not None:
+            weak_edge_list: List[Tuple[int, int, str, str, int, int]] = []
+            edge_count = 0
+            for source, edge_list in edge_dict.items():
+                for target, label in edge_list:
+                    if (source, target) in redundant_set:
+                        continue
+                    edge_count += 1
+                    if label in WEAK_LABEL_RANK_DICT:
+                        weak_edge_list.append(
+                            (
+                                WEAK_LABEL_RANK_DICT[label],
+                                -len(graph_index.reverse_list[target]),
+                                id_list[source],
+                                id_list[target],
+                                source,
+                                target,
+                            )
+                        )
+            if edge_count > edge_budget:
+                # the weakest edges first
+                weak_edge_list.sort()
+                excess = min(edge_count - edge_budget, len(weak_edge_list))
+                dropped_set = {
+                    (source, target)
+                    for *_, source, target in weak_edge_list[:excess]
+                }
+        self.dropped_count = len(dropped_set)
+
+        return {
+            id_list[source]: {
+                id_list[target]
+                for target, _ in edge_list
+                if (source, target) not in redundant_set
+                and (source, target) not in dropped_set
+            }
+            for source, edge_list in edge_dict.items()
+        }
+
+    def report(self) -> Dict:
+        """
+        get the result of the last simplification as a dict of plain values
+        """
+        return {
+            "hubs": self.hub_id_list,
+            "elided_edges": self.elided_count,
+            "reduced_edges": self.reduced_count,
+            "dropped_edges": self.dropped_count,
+        }
+
+
+# test code
+if __name__ == "__main__":
+    import sys
+    from project_analyzer import analyze_project, link_project
+
+    project = sys.argv[1] if len(sys.argv) > 1 else "example-project"
+    edge_budget = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    java_file_facts_list = analyze_project(project)
+    link_project(java_file_facts_list)
+    graph_index = GraphIndex(
+        java_class
+        for java_file_facts in java_file_facts_list
+        for java_class in java_file_facts.public_class_set
+    )
+    graph_simplifier = GraphSimplifier(graph_index)
+    kept_edge_dict = graph_simplifier.simplify(edge_budget, hub_degree=20)
+    print(
+        f"{sum(map(len, graph_index.forward_list))} edges, "
+        f"{sum(map(len, kept_edge_dict.values()))} kept"
+    )
+    print(graph_simplifier.report())
@@ -0,0 +1,231 @@
+from __future__ import annotations
+from typing import Dict, Iterable, Iterator, List, Tuple, TypeVar
+from contextlib import contextmanager
+import cProfile
+import heapq
+import json
+import sys
+import time
+import tree_sitter
+
+# the phases of an analysis, in the order they run
+# the java.lang names are resolved with the jdk symbols while linking
+PHASE_NAMES = (
+    "load",
+    "cache",
+    "parse",
+    "walk",
+    "import-resolution",
+    "link",
+    "dot",
+    "render",
+)
+
+T = TypeVar("T")
+
+# the status of this process on linux, its peak resident memory is read from it
+PROC_STATUS_PATH = "/proc/self/status"
+# writing 5 to it resets the peak resident memory of this process on linux
+PROC_CLEAR_REFS_PATH = "/proc/self/clear_refs"
+
+
+def reset_peak_memory() -> bool:
+    """
+    reset the peak resident memory of this process, so the next stage
+    is measured alone
+    return False if the system can't reset it, the peak then covers
+    the whole life of the process
+    """
+    try:
+        with open(PROC_CLEAR_REFS_PATH, "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def get_peak_memory() -> Dict[str, int | None]:
+    """
+    get the peak resident memory in bytes of this process, 'self',
+    and of the largest finished child process, 'children', e.g. a worker
+    a peak is None if the system doesn't report it
+    """
+    peak_memory_dict: Dict[str, int | None] = {"self": None, "children": None}
+    try:
+        with open(PROC_STATUS_PATH) as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    peak_memory_dict["self"] = int(line.split()[1]) << 10
+                    break
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        # windows has no resource module
+        return peak_memory_dict
+    # the peak is in kilobytes on linux and in bytes on macos
+    unit = 1 if sys.platform == "darwin" else 1 << 10
+    if peak_memory_dict["self"] is None:
+        peak_memory_dict["self"] = (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+        )
+    peak_memory_dict["children"] = (
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+    )
+    return peak_memory_dict
+
+
+class Instrumentation:
+    """
+    the metrics of one analysis run
+    the wall time of every phase, the node counts by type
+    and the slowest files, reported as json
+    """
+
+    def __init__(
+        self,
+        slowest_count: int = 10,
+        profile: bool = False,
+        with_node_count: bool = True,
+    ) -> None:
+        """
+        :param slowest_count: the number of slowest files kept
+        :param profile: capture a cProfile of this process
+            until stop_profile is called
+        :param with_node_count: count the nodes of the trees by type,
+            it walks every tree once more
+        """
+        self.slowest_count = slowest_count
+        self.with_node_count = with_node_count
+        self.start_time = time.perf_counter()  # the time the run started
+        self.phase_time_dict: Dict[str, float] = {}  # the phase maps to its seconds
+        self.node_count_dict: Dict[str, int] = {}  # the node type maps to its count
+        self.file_count = 0  # the number of files analyzed
+        self.slowest_file_heap: List[
+            Tuple[float, str]
+        ] = []  # the seconds and path of the slowest files, fastest first
+        self.profiler: cProfile.Profile | None = None  # the running profiler
+        if profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def add_time(self, phase_name: str, seconds: float) -> None:
+        """
+        add the seconds to the phase
+        """
+        self.phase_time_dict[phase_name] = (
+            self.phase_time_dict.get(phase_name, 0.0) + seconds
+        )
+
+    @contextmanager
+    def phase(self, phase_name: str) -> Iterator[None]:
+        """
+        time the code run in the block as the phase
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase_name, time.perf_counter() - start_time)
+
+    def timed(self, iterable: Iterable[T], phase_name: str) -> Iterator[T]:
+        """
+        iterate the items, the time spent producing them goes to the phase
+        """
+        iterator = iter(iterable)
+        while True:
+            start_time = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(phase_name, time.perf_counter() - start_time)
+                return
+            self.add_time(phase_name, time.perf_counter() - start_time)
+            yield item
+
+    def count_nodes(self, tree: tree_sitter.Tree) -> None:
+        """
+        count the nodes of the tree by type, nothing without the node count
+        """
+        if not self.with_node_count:
+            return
+        node_count_dict = self.node_count_dict
+        cursor = tree.walk()
+        while True:
+            node_type = cursor.node.type
+            node_count_dict[node_type] = node_count_dict.get(node_type, 0) + 1
+            if cursor.goto_first_child() or cursor.goto_next_sibling():
+                continue
+            while cursor.goto_parent():
+                if cursor.goto_next_sibling():
+                    break
+            else:
+                return
+
+    def record_file(self, path: str, seconds: float) -> None:
+        """
+        record the seconds one file took, keep it if it is among the slowest
+        """
+        self.file_count += 1
+        if len(self.slowest_file_heap) < self.slowest_count:
+            heapq.heappush(self.slowest_file_heap, (seconds, path))
+        elif seconds > self.slowest_file_heap[0][0]:
+            heapq.heapreplace(self.slowest_file_heap, (seconds, path))
+
+    def merge(self, other: Instrumentation) -> None:
+        """
+        add the metrics of another run, e.g. of a worker process
+        """
+        for phase_name, seconds in other.phase_time_dict.items():
+            self.add_time(phase_name, seconds)
+        for node_type, count in other.node_count_dict.items():
+            self.node_count_dict[node_type] = (
+                self.node_count_dict.get(node_type, 0) + count
+            )
+        file_count = self.file_count + other.file_count
+        for seconds, path in other.slowest_file_heap:
+            self.record_file(path, seconds)
+        self.file_count = file_count
+
+    def stop_profile(self, profile_path: str | None = None) -> None:
+        """
+        stop the profiler, dump its stats to the path if given
+        the stats can be read with pstats or snakeviz
+        """
+        if self.profiler is None:
+            return
+        self.profiler.disable()
+        if profile_path is not None:
+            self.profiler.dump_stats(profile_path)
+        self.profiler = None
+
+    def report(self) -> Dict:
+        """
+        get the metrics as a dict of plain values
+        the phases run in worker processes are summed over the workers
+        """
+        phase_name_list = [name for name in PHASE_NAMES if name in self.phase_time_dict]
+        phase_name_list += sorted(set(self.phase_time_dict) - set(PHASE_NAMES))
+        return {
+            "wall_seconds": time.perf_counter() - self.start_time,
+            "file_count": self.file_count,
+            "phase_seconds": {
+                name: self.phase_time_dict[name] for name in phase_name_list
+            },
+            "node_count": dict(
+                sorted(self.node_count_dict.items(), key=lambda item: (-item[1], item[0]))
+            ),
+            "slowest_files": [
+                {"path": path, "seconds": seconds}
+                for seconds, path in sorted(self.slowest_file_heap, reverse=True)
+            ],
+            "peak_memory_bytes": get_peak_memory(),
+        }
+
+    def write_report(self, report_path: str) -> None:
+        """
+        write the report to the path as json
+        """
+        with open(report_path, "w") as f:
+            json.dump(self.report(), f, indent=2)
@@ -1,10 +1,18 @@
 from __future__ import annotations
-from typing import List, Set
-from load_java_files import load_java_files
+from typing import List, Set, Tuple
+from load_java_files import iter_java_files
+import logging
 import tree_sitter
-from JavaClass import JavaClass
+from AnalysisError import AnalysisError
+from JavaClass import ClassState, JavaClass, make_last_term_dict
+from JavaFileFacts import JavaFileFacts
 from Painter import Painter
-import enum
+from SymbolIndex import SymbolIndex
+from query_extractor import extract_with_queries
+import parser_service
+
+# the debug output of the analysis, silent unless enabled by logging
+logger = logging.getLogger(__name__)
 
 
 class JavaAnalyzer:
@@ -12,10 +20,25 @@ class JavaAnalyzer:
     class for analyzing one java file
     """
 
-    def __init__(self, name: str, content: str) -> JavaAnalyzer:
+    def __init__(
+        self,
+        name: str,
+        content: str | bytes,
+        old_tree: tree_sitter.Tree | None = None,
+    ) -> JavaAnalyzer:
+        """
+        parse the java file
+
+        :param name: the name of the java file
+        :param content: the content of the java file, str or utf-8 bytes
+        :param old_tree: the edited tree of the previous content,
+            given to reparse incrementally
+        """
         self.id = ""  # the id of the java file, e.g. dtu.compute.util.Utils
         self.name = name  # the name of the java file
-        self.content = content  # the content of the java file
+        if isinstance(content, str):
+            content = bytes(content, "utf-8")
+        self.content = content  # the utf-8 content of the java file
         self.package_name = ""  # the name of package it belongs to
         self.import_file_set: Set[
             str
@@ -26,36 +49,52 @@ class JavaAnalyzer:
         self.public_class_set: Set[
             JavaClass
         ] = set()  # the set of public classes it creates
+        self.ambiguous_name_list: List[
+            Tuple[str, str, List[str]]
+        ] = []  # the class, the name and the ids it matches, if several match
+
+        # get the shared parser, the grammar is loaded once per process
+        parser = parser_service.get_parser()
+
+        # init the tree and the root node, None after 'release'
+        self.tree: tree_sitter.Tree | None
+        if old_tree is None:
+            self.tree = parser.parse(self.content)
+        else:
+            self.tree = parser.parse(self.content, old_tree)
+        self.root_node: tree_sitter.Node | None = self.tree.root_node
+
+    def release(self) -> None:
+        """
+        drop the content and the tree, only the extracted facts are kept
+        the tree is many times larger than the source, so a pipeline
+        should release every file as soon as its facts are taken
+        """
+        self.content = b""
+        self.tree = None
+        self.root_node = None
 
-        # load the tree sitter
-        tree_sitter.Language.build_library(
-            # Store the library in the `build` directory
-            "build/my-languages.so",
-            # Include one or more languages
-            [
-                "./tree-sitter-java",
-            ],
-        )
-
-        # init the parser
-        JAVA_LANGUAGE = tree_sitter.Language("build/my-languages.so", "java")
-        parser = tree_sitter.Parser()
-        parser.set_language(JAVA_LANGUAGE)
-
-        # init the root node
-        self.root_node = parser.parse(bytes(self.content, "utf-8")).root_node
-
-    def analyze(self) -> None:
+    def analyze(self, engine: str = "walker") -> None:
         """
-        analyze the code and extract the information
+        analyze the code, extract the information and resolve what it can alone
+
+        :param engine: 'walker' visits the tree node by node in python,
+            'query' captures the nodes with compiled tree-sitter queries
         """
+        self.extract(engine)
+        self.resolve_dependency()
 
-        class ClassState(enum.Enum):
-            INHERITANCE = 1
-            REALIZATION = 2
-            AGGREGATION = 3
-            COMPOSITION = 4
-            DEPENDENCY = 5
+    def extract(self, engine: str = "walker") -> None:
+        """
+        extract the information from the tree
+
+        :param engine: 'walker' visits the tree node by node in python,
+            'query' captures the nodes with compiled tree-sitter queries,
+            both give the same facts, the query takes milliseconds to compile
+            once per process, so it only pays off on many large method bodies
+        """
+        # checked once, so the walker pays nothing for the debug output
+        debug = logger.isEnabledFor(logging.DEBUG)
 
         def analyze_node(
             node: tree_sitter.Node,
@@ -86,7 +125,8 @@ class JavaAnalyzer:
                 nonlocal generic_type_name_set
                 new_level_generic_set = generic_type_name_set.copy()
                 for child_node in node.named_children:
-                    print(" " * debug_level, child_node.type)
+                    if debug:
+                        logger.debug("%s %s", " " * debug_level, child_node.type)
                     analyze_node(
                         child_node,
                         debug_level + 1,
@@ -107,14 +147,16 @@ class JavaAnalyzer:
                 nonlocal node
                 nonlocal debug_level
                 for child_node in node.named_children:
-                    print(" " * debug_level, child_node.type, child_node.text)
+                    logger.debug(
+                        "%s %s %s", " " * debug_level, child_node.type, child_node.text
+                    )
 
             def print_debug_info(info: str | bytes) -> None:
                 """
                 print the debug info
                 """
                 nonlocal debug_level
-                print(" " * debug_level, info)
+                logger.debug("%s %s", " " * debug_level, info)
 
             def analyze_child_node() -> None:
                 """
@@ -163,7 +205,9 @@ class JavaAnalyzer:
                     # scoped_identifier
                     scoped_id_node = node.named_children[0]
                     if scoped_id_node.type != "scoped_identifier":
-                        raise Exception("unhandled situation in package_declaration")
+                        raise AnalysisError.at(
+                            "unhandled situation in package_declaration!", node
+                        )
 
                     self.package_name = scoped_id_node.text.decode()
                     # set up id
@@ -175,7 +219,9 @@ class JavaAnalyzer:
                     # scoped_identifier
                     scoped_id_node = node.named_children[0]
                     if scoped_id_node.type != "scoped_identifier":
-                        raise Exception("import_declaration")
+                        raise AnalysisError.at(
+                            "unhandled situation in import_declaration!", node
+                        )
 
                     match node.named_child_count:
                         case 1:
@@ -183,15 +229,17 @@ class JavaAnalyzer:
                         case 2:
                             self.import_package_set.add(scoped_id_node.text.decode())
                         case _:
-                            raise Exception(
-                                "unhandled situation in import_declaration!"
+                            raise AnalysisError.at(
+                                "unhandled situation in import_declaration!", node
                             )
 
                 case "scoped_identifier":
-                    print_debug_info(node.text)
+                    if debug:
+                        print_debug_info(node.text)
 
                 case "asterisk":
-                    print_debug_info(node.text)
+                    if debug:
+                        print_debug_info(node.text)
 
                 case "line_comment":
                     # print_debug_info(node.text)
@@ -205,9 +253,11 @@ class JavaAnalyzer:
                     # print_child_type_text()
 
                     # the node of the identifier
-                    id_node = node.named_children[1]
-                    if id_node.type != "identifier":
-                        raise Exception("unhandled situation in class_declaration!")
+                    id_node = node.child_by_field_name("name")
+                    if id_node is None or id_node.type != "identifier":
+                        raise AnalysisError.at(
+                            "unhandled situation in class_declaration!", node
+                        )
 
                     if type(current_class) == type(None):
                         new_class = JavaClass(
@@ -226,28 +276,33 @@ class JavaAnalyzer:
                         current_class.compose_id_set.add(new_class.id)
                     current_class = new_class  # change current focus class
 
-                    match node.named_children[0].text.decode():
-                        case "public":
-                            self.public_class_set.add(new_class)
-                        case _:
-                            raise Exception(
-                                "unhandled situation in class_declaration!",
-                                node.named_children[0].text,
-                            )
+                    # the class is kept before any error,
+                    # so the partial facts still resolve the names using it
+                    self.public_class_set.add(new_class)
+                    modifiers_node = node.named_children[0]
+                    if modifiers_node.type != "modifiers" or not any(
+                        child.type == "public" for child in modifiers_node.children
+                    ):
+                        raise AnalysisError.at(
+                            "unhandled non-public class_declaration!", node
+                        )
 
                     debug_analyze_child()
 
                 case "modifiers":
-                    print_debug_info(node.text)
+                    if debug:
+                        print_debug_info(node.text)
                     # print_child_type_text()
 
                 case "type_parameters":
                     for child_node in node.named_children:
-                        print_debug_info(child_node.text)
+                        if debug:
+                            print_debug_info(child_node.text)
                         generic_type_name_set.add(child_node.text.decode())
 
                 case "identifier":
-                    print_debug_info(node.text)
+                    if debug:
+                        print_debug_info(node.text)
 
                 case "super_interfaces":
                     class_state = ClassState.REALIZATION
@@ -255,14 +310,20 @@ class JavaAnalyzer:
 
                 case "superclass":
                     first_child = node.named_children[0]
+                    if first_child.type == "generic_type":
+                        # 'Base<String>' inherits 'Base'
+                        first_child = first_child.named_children[0]
                     match first_child.type:
                         case "type_identifier":
                             current_class.inherit_name_set.add(
                                 first_child.text.decode()
                             )
-                        case "_":
-                            raise Exception("unhandled case in superclass!")
-                    print_child_type_text()
+                        case _:
+                            raise AnalysisError.at(
+                                "unhandled case in superclass!", node
+                            )
+                    if debug:
+                        print_child_type_text()
 
                 case "type_list":
                     debug_analyze_child()
@@ -281,22 +342,26 @@ class JavaAnalyzer:
                     debug_analyze_child()
 
                 case "type_identifier":
-                    print_debug_info(node.text)
+                    if debug:
+                        print_debug_info(node.text)
                     class_name = node.text.decode()
                     if class_name not in generic_type_name_set:
                         add_class_name_to_set(node.text.decode())
 
                 case "void_type":
-                    print_debug_info(node.text)
+                    if debug:
+                        print_debug_info(node.text)
 
                 case "array_type":
                     debug_analyze_child()
 
                 case "dimensions":
-                    print_debug_info(node.text)
+                    if debug:
+                        print_debug_info(node.text)
 
                 case "variable_declarator":
-                    print_debug_info(node.text)
+                    if debug:
+                        print_debug_info(node.text)
 
                 case "method_declaration":
                     debug_analyze_child()
@@ -323,60 +388,80 @@ class JavaAnalyzer:
                         case "field_access":
                             pass  # handle it next level
                         case _:
-                            raise Exception("unhandled case in method_invocation")
+                            raise AnalysisError.at(
+                                "unhandled case in method_invocation!", node
+                            )
 
                     debug_analyze_child()
 
                 case "field_access":
                     current_class.depend_field_set.add(node.text.decode())
-                    print_debug_info(node.text)
+                    if debug:
+                        print_debug_info(node.text)
                     # debug_analyze_child()
 
                 case "argument_list":
-                    print_debug_info(node.text)
+                    if debug:
+                        print_debug_info(node.text)
 
         # for node in self.root_node.named_children:
         #     print(node.type)
         #     analyze_node(node, 0, None, ClassState.DEPENDENCY, set())
-        analyze_node(self.root_node, 0, None, ClassState.DEPENDENCY, set())
+        match engine:
+            case "walker":
+                analyze_node(self.root_node, 0, None, ClassState.DEPENDENCY, set())
+            case "query":
+                extract_with_queries(self)
+            case _:
+                raise Exception("unknown engine!", engine)
+
+        if debug:
+            self.log_facts(with_ids=False)
+
+    def resolve_dependency(self) -> None:
+        """
+        resolve the dependencies known without the other files
+        """
+        # final check the dependency, with the imports looked up by last term
+        # add the dependency in the import file set
+        # the jdk types and the fields are left to 'SymbolIndex.link_file',
+        # a class of the same package hides a jdk type of the same name
+        import_last_term_dict = make_last_term_dict(self.import_file_set)
+        for java_class in self.public_class_set:
+            for name, candidate_list in java_class.final_check_dependency(
+                import_last_term_dict
+            ):
+                # kept in the facts, the driver reports them
+                self.ambiguous_name_list.append((java_class.id, name, candidate_list))
+            java_class.depend_id_set.update(self.import_file_set)
 
-        print()
-        print("id:", self.id)
-        print("import files:", self.import_file_set)
-        print("import packages:", self.import_package_set)
-        print("public classes:", [i.id for i in self.public_class_set])
-        print()
+        if logger.isEnabledFor(logging.DEBUG):
+            self.log_facts(with_ids=True)
 
-        for java_class in self.public_class_set:
-            print(java_class.id)
-            print(" ", "realize name set:", java_class.realize_name_set)
-            print(" ", "aggregate name set:", java_class.aggregate_name_set)
-            print(" ", "depend name set:", java_class.depend_name_set)
-            print(" ", "depend field set:", java_class.depend_field_set)
-            print()
+    def log_facts(self, with_ids: bool) -> None:
+        """
+        log the extracted information at debug level
 
-        # add the dependency from java lang
-        # add the dependency left in field set
-        # add the dependency in the import file set
-        # final check the dependency
-        for java_class in self.public_class_set:
-            java_class.add_lang_dependency()
-            java_class.add_dependency_in_field()
-            java_class.depend_id_set = java_class.depend_id_set.union(
-                self.import_file_set
+        :param with_ids: log the resolved id sets too
+        """
+        if not with_ids:
+            logger.debug("id: %s", self.id)
+            logger.debug("import files: %s", self.import_file_set)
+            logger.debug("import packages: %s", self.import_package_set)
+            logger.debug(
+                "public classes: %s", [i.id for i in self.public_class_set]
             )
-            java_class.final_check_dependency()
 
         for java_class in self.public_class_set:
-            print(java_class.id)
-            print(" ", "realize name set:", java_class.realize_name_set)
-            print(" ", "aggregate name set:", java_class.aggregate_name_set)
-            print(" ", "depend name set:", java_class.depend_name_set)
-            print(" ", "depend field set:", java_class.depend_field_set)
-            print(" ", "realize id set:", java_class.realize_id_set)
-            print(" ", "aggregate id set:", java_class.aggregate_id_set)
-            print(" ", "depend id set:", java_class.depend_id_set)
-            print()
+            logger.debug("%s", java_class.id)
+            logger.debug("  realize name set: %s", java_class.realize_name_set)
+            logger.debug("  aggregate name set: %s", java_class.aggregate_name_set)
+            logger.debug("  depend name set: %s", java_class.depend_name_set)
+            logger.debug("  depend field set: %s", java_class.depend_field_set)
+            if with_ids:
+                logger.debug("  realize id set: %s", java_class.realize_id_set)
+                logger.debug("  aggregate id set: %s", java_class.aggregate_id_set)
+                logger.debug("  depend id set: %s", java_class.depend_id_set)
 
     def check_dependency(self, java_analyzer: JavaAnalyzer) -> None:
         """
@@ -396,29 +481,21 @@ class JavaAnalyzer:
 
 # test code
 if __name__ == "__main__":
-    # name_content_list = load_java_files("course-02242-examples")
-    # name_content_list = load_java_files("example-dependency-graphs")
-    # name_content_list = load_java_files("test")
-    name_content_list = load_java_files("example-project")
-    java_analyzer_list: list[JavaAnalyzer] = []
-    for name, content in name_content_list:
-        java_analyzer_list.append(JavaAnalyzer(name, content))
-        java_analyzer_list[-1].analyze()
-
-    # test_java_analyzer = java_analyzer_list[3]
-    # test_java_analyzer.analyze()
-
-    for i in java_analyzer_list:
-        for j in java_analyzer_list:
-            if i == j:
-                continue
-            else:
-                i.check_dependency(j)
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+    # only the facts of a file are kept, its content and tree are dropped
+    java_file_facts_list: List[JavaFileFacts] = []
+    for _, name, content in iter_java_files("example-project"):
+        java_analyzer = JavaAnalyzer(name, content)
+        java_analyzer.analyze()
+        java_analyzer.release()
+        java_file_facts_list.append(JavaFileFacts.from_analyzer(java_analyzer))
+
+    SymbolIndex(java_file_facts_list).link()
 
     painter = Painter()
     print("---------")
-    for java_analyzer in java_analyzer_list:
-        for java_class in java_analyzer.public_class_set:
+    for java_file_facts in java_file_facts_list:
+        for java_class in java_file_facts.public_class_set:
             print(java_class.id)
             print(" ", "aggregate name set:", java_class.aggregate_name_set)
             print(" ", "depend name set:", java_class.depend_name_set)
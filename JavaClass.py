@@ -1,123 +1,372 @@
 from __future__ import annotations
-from typing import Set, List
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Set, Tuple
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableSet
+from StringTable import string_table
+from jdk_symbols import get_visible_type_dict
+import enum
+
+
+class ClassState(enum.Enum):
+    """
+    the relation a class name found in the code has to the current class
+    """
+
+    INHERITANCE = 1
+    REALIZATION = 2
+    AGGREGATION = 3
+    COMPOSITION = 4
+    DEPENDENCY = 5
+
+
+# the sets of a class kept in its record, in record order
+# the position of a set is also the kind of its edges
+RECORD_SET_NAMES = (
+    "inherit_id_set",
+    "inherit_name_set",
+    "realize_id_set",
+    "realize_name_set",
+    "aggregate_id_set",
+    "aggregate_name_set",
+    "compose_id_set",
+    "compose_name_set",
+    "depend_id_set",
+    "depend_name_set",
+    "depend_field_set",
+)
+
+# an edge is its kind shifted by these bits plus the index of its string
+KIND_SHIFT = 32
+STRING_MASK = (1 << KIND_SHIFT) - 1
+
+# the label of the edges of every id set drawn in the graph
+# a class found in several sets is drawn once, with the label of the first set
+RELATION_LABEL_DICT = {
+    "inherit_id_set": "inheritance",
+    "realize_id_set": "realization",
+    "aggregate_id_set": "aggregation",
+    "compose_id_set": "composition",
+    "depend_id_set": "dependency",
+}
+
+# the kind of an edge maps to its label, None for the kinds not drawn
+KIND_LABEL_LIST: List[str | None] = [
+    RELATION_LABEL_DICT.get(set_name) for set_name in RECORD_SET_NAMES
+]
+
+
+def get_last_term(id: str) -> str:
+    """
+    get the last term of the id, e.g. 'Utils' of 'dtu.compute.util.Utils'
+    """
+    return id[id.rfind(".") + 1 :]
+
+
+def make_last_term_dict(ids: Iterable[str]) -> Dict[str, List[str]]:
+    """
+    map the last terms of the ids to the ids, sorted
+    """
+    last_term_dict: Dict[str, List[str]] = {}
+    for id in ids:
+        last_term_dict.setdefault(get_last_term(id), []).append(id)
+    for id_list in last_term_dict.values():
+        id_list.sort()
+    return last_term_dict
+
+
+def compact_strings(java_classes: Iterable[JavaClass]) -> None:
+    """
+    drop the strings no given class uses from the string table of the process
+    and renumber the edges of the classes
+    every live class must be given, the edges of the others are wrong afterwards
+    """
+    # a class is given once, two classes may share an id
+    class_dict = {id(java_class): java_class for java_class in java_classes}
+    used_index_set: Set[int] = set()
+    for java_class in class_dict.values():
+        # the interned names stay shared
+        used_index_set.add(string_table.index(java_class.id))
+        used_index_set.add(string_table.index(java_class.package_name))
+        used_index_set.add(string_table.index(java_class.name))
+        if java_class.edge_array is not None:
+            used_index_set.update(edge & STRING_MASK for edge in java_class.edge_array)
+    new_index_list = string_table.compact(used_index_set)
+    for java_class in class_dict.values():
+        if java_class.edge_array is not None:
+            java_class.edge_array = array(
+                "Q",
+                [
+                    edge & ~STRING_MASK | new_index_list[edge & STRING_MASK]
+                    for edge in java_class.edge_array
+                ],
+            )
+
+
+class RelationSet(MutableSet):
+    """
+    the set view of the edges of one kind of a class
+    it reads and writes the edge array of the class, it holds no strings
+    """
+
+    __slots__ = ("java_class", "kind")
+
+    def __init__(self, java_class: JavaClass, kind: int) -> None:
+        self.java_class = java_class  # the class owning the edges
+        self.kind = kind  # the kind of the edges
+
+    def bounds(self) -> Tuple[int, int]:
+        """
+        get the range of the edges of the kind in the edge array
+        """
+        edge_array = self.java_class.edge_array
+        if edge_array is None:
+            return 0, 0
+        low = bisect_left(edge_array, self.kind << KIND_SHIFT)
+        high = bisect_left(edge_array, (self.kind + 1) << KIND_SHIFT, low)
+        return low, high
+
+    def __contains__(self, value: object) -> bool:
+        edge_array = self.java_class.edge_array
+        if edge_array is None or not isinstance(value, str):
+            return False
+        index = string_table.find(value)
+        if index is None:
+            return False
+        edge = self.kind << KIND_SHIFT | index
+        position = bisect_left(edge_array, edge)
+        return position < len(edge_array) and edge_array[position] == edge
+
+    def __iter__(self) -> Iterator[str]:
+        # iterate a copy, so the class can change while it is iterated
+        low, high = self.bounds()
+        string_list = string_table.string_list
+        return iter(
+            [
+                string_list[edge & STRING_MASK]
+                for edge in self.java_class.edge_array[low:high]
+            ]
+            if low < high
+            else ()
+        )
+
+    def __len__(self) -> int:
+        low, high = self.bounds()
+        return high - low
+
+    def add(self, value: str) -> None:
+        self.java_class.add_edge(self.kind, string_table.index(value))
+
+    def discard(self, value: str) -> None:
+        index = string_table.find(value)
+        if index is not None:
+            self.java_class.discard_edge(self.kind, index)
+
+    def copy(self) -> Set[str]:
+        return set(self)
+
+    def union(self, *others: Iterable[str]) -> Set[str]:
+        return set(self).union(*others)
+
+    def intersection(self, *others: Iterable[str]) -> Set[str]:
+        return set(self).intersection(*others)
+
+    def difference(self, *others: Iterable[str]) -> Set[str]:
+        return set(self).difference(*others)
+
+    def update(self, *others: Iterable[str]) -> None:
+        for other in others:
+            for value in other:
+                self.add(value)
+
+    def __repr__(self) -> str:
+        return repr(set(self))
+
+
+def relation_property(set_name: str, doc: str) -> property:
+    """
+    make the property exposing the edges of the set as a RelationSet
+    assigning an iterable to it replaces the edges
+    """
+    kind = RECORD_SET_NAMES.index(set_name)
+
+    def get_set(java_class: JavaClass) -> RelationSet:
+        return RelationSet(java_class, kind)
+
+    def set_set(java_class: JavaClass, values: Iterable[str]) -> None:
+        java_class.set_edges(kind, values)
+
+    return property(get_set, set_set, doc=doc)
 
 
 class JavaClass:
     """
     the class representing a java class
+    the relations are kept as one sorted array of edges,
+    an edge holds its kind and the index of its string in the string table
     """
 
+    __slots__ = ("id", "package_name", "name", "outter_class_name_tuple", "edge_array")
+
     def __init__(
         self, package_name: str, class_name: str, outter_class_name_list: List[str]
     ) -> None:
-        self.id = package_name
-        for name in outter_class_name_list:
-            self.id += "." + name
-        self.id += "." + class_name
-        self.package_name = package_name
-        self.name = class_name
-        self.outter_class_name_list: list[str] = outter_class_name_list
-
-        """
-        name sets serve as 'temporary' set
-        once we can identify their specific source, we move them into id set
-        """
-        self.inherit_id_set: Set[str] = set()  # the id of the classes it extends
-        self.inherit_name_set: Set[str] = set()  # the name of the classes it extends
-
-        self.realize_id_set: Set[str] = set()  # the id of the classes it implement
-        self.realize_name_set: Set[str] = set()  # the name of the classes it implement
-
-        self.aggregate_id_set: Set[
-            str
-        ] = set()  # the id of the classes its field contains
-        self.aggregate_name_set: Set[
-            str
-        ] = set()  # the name of the classes its field contains
-
-        self.compose_id_set: Set[
-            str
-        ] = set()  # the id of the classes its nonstatic innerclass
-        self.compose_name_set: Set[
-            str
-        ] = set()  # the name of the classes its nonstatic innerclass
-
-        self.depend_id_set: Set[str] = set()  # the id of the classes it depends on
-        self.depend_name_set: Set[str] = set()  # the id of the classes it depends on
-
-        self.depend_field_set: Set[str] = set()  # the fields it depends on
-
-    def add_lang_dependency(self) -> None:
-        """
-        add the dependencie from lang
-        """
-        lang_dependencies_set: Set[str] = {
-            "Boolean",
-            "Byte",
-            "Character",
-            "Class",
-            "ClassLoader",
-            "ClassValue",
-            "Compiler",
-            "Double",
-            "Enu",
-            "Float",
-            "InheritableThreadLoca",
-            "Integer",
-            "Iterable",
-            "Long",
-            "Math",
-            "Number",
-            "Object",
-            "Package",
-            "Process",
-            "ProcessBuilder",
-            "Runtime",
-            "RuntimePermission",
-            "SecurityManager",
-            "Short",
-            "StackTraceElement",
-            "StrictMath",
-            "String",
-            "StringBuffer",
-            "StringBuilder",
-            "System",
-            "Thread",
-            "ThreadGroup",
-            "ThreadLocal",
-            "Throwable",
-            "Void",
-        }
-
-        def add_lang_prefix(name: str) -> str:
-            return "java.lang." + name
-
-        for name in list(self.inherit_name_set):
-            if name in lang_dependencies_set:
-                self.inherit_id_set.add(add_lang_prefix(name))
-                self.inherit_name_set.remove(name)
-
-        for name in list(self.realize_name_set):
-            if name in lang_dependencies_set:
-                self.realize_id_set.add(add_lang_prefix(name))
-                self.realize_name_set.remove(name)
-
-        for name in list(self.aggregate_name_set):
-            if name in lang_dependencies_set:
-                self.aggregate_id_set.add(add_lang_prefix(name))
-                self.aggregate_name_set.remove(name)
-
-        for name in list(self.depend_name_set):
-            if name in lang_dependencies_set:
-                self.depend_id_set.add(add_lang_prefix(name))
-                self.depend_name_set.remove(name)
+        self.id = string_table.intern(
+            ".".join((package_name, *outter_class_name_list, class_name))
+        )
+        self.package_name = string_table.intern(package_name)
+        self.name = string_table.intern(class_name)
+        self.outter_class_name_tuple: Tuple[str, ...] = tuple(
+            outter_class_name_list
+        )  # the names of the classes it is nested in, outermost first
+        self.edge_array: array | None = None  # the sorted edges, None for none
+
+    # name sets serve as 'temporary' set
+    # once we can identify their specific source, we move them into id set
+    inherit_id_set = relation_property(
+        "inherit_id_set", "the id of the classes it extends"
+    )
+    inherit_name_set = relation_property(
+        "inherit_name_set", "the name of the classes it extends"
+    )
+
+    realize_id_set = relation_property(
+        "realize_id_set", "the id of the classes it implement"
+    )
+    realize_name_set = relation_property(
+        "realize_name_set", "the name of the classes it implement"
+    )
+
+    aggregate_id_set = relation_property(
+        "aggregate_id_set", "the id of the classes its field contains"
+    )
+    aggregate_name_set = relation_property(
+        "aggregate_name_set", "the name of the classes its field contains"
+    )
+
+    compose_id_set = relation_property(
+        "compose_id_set", "the id of the classes its nonstatic innerclass"
+    )
+    compose_name_set = relation_property(
+        "compose_name_set", "the name of the classes its nonstatic innerclass"
+    )
+
+    depend_id_set = relation_property(
+        "depend_id_set", "the id of the classes it depends on"
+    )
+    depend_name_set = relation_property(
+        "depend_name_set", "the name of the classes it depends on"
+    )
+
+    depend_field_set = relation_property(
+        "depend_field_set", "the fields it depends on"
+    )
+
+    @property
+    def outter_class_name_list(self) -> List[str]:
+        """
+        the names of the classes it is nested in, outermost first
+        """
+        return list(self.outter_class_name_tuple)
+
+    def add_edge(self, kind: int, index: int) -> None:
+        """
+        add the edge of the kind to the string of the index
+        """
+        edge = kind << KIND_SHIFT | index
+        edge_array = self.edge_array
+        if edge_array is None:
+            self.edge_array = array("Q", (edge,))
+            return
+        position = bisect_left(edge_array, edge)
+        if position == len(edge_array) or edge_array[position] != edge:
+            edge_array.insert(position, edge)
+
+    def discard_edge(self, kind: int, index: int) -> None:
+        """
+        remove the edge of the kind to the string of the index if it exists
+        """
+        edge = kind << KIND_SHIFT | index
+        edge_array = self.edge_array
+        if edge_array is None:
+            return
+        position = bisect_left(edge_array, edge)
+        if position < len(edge_array) and edge_array[position] == edge:
+            del edge_array[position]
+            if not edge_array:
+                self.edge_array = None
+
+    def set_edges(self, kind: int, values: Iterable[str]) -> None:
+        """
+        replace the edges of the kind with the edges to the values
+        """
+        edge_list = sorted(
+            {kind << KIND_SHIFT | string_table.index(value) for value in values}
+        )
+        low, high = RelationSet(self, kind).bounds()
+        edge_array = self.edge_array
+        if edge_array is None:
+            edge_array = array("Q")
+        edge_array = edge_array[:low] + array("Q", edge_list) + edge_array[high:]
+        self.edge_array = edge_array if edge_array else None
+
+    def relation_edges(self) -> Iterator[Tuple[str, str]]:
+        """
+        iterate the ids of the classes it relates to and the labels of the relations
+        every id is given once, with the label of its first set in RELATION_LABEL_DICT
+        """
+        if self.edge_array is None:
+            return
+        string_list = string_table.string_list
+        seen_index_set: Set[int] = set()
+        # the kinds of the id sets are in the order of RELATION_LABEL_DICT
+        for edge in self.edge_array.tolist():
+            label = KIND_LABEL_LIST[edge >> KIND_SHIFT]
+            if label is None:
+                continue
+            index = edge & STRING_MASK
+            if index not in seen_index_set:
+                seen_index_set.add(index)
+                yield string_list[index], label
+
+    def add_lang_dependency(
+        self,
+        visible_type_dict: Dict[str, str] | None = None,
+        shadow_name_set: Set[str] | FrozenSet[str] = frozenset(),
+    ) -> None:
+        """
+        add the dependencies on the jdk, one dict probe for every name
+
+        :param visible_type_dict: the jdk types the file sees by name,
+            made by 'jdk_symbols.get_visible_type_dict', java.lang by default
+        :param shadow_name_set: the names the file declares or imports by itself
+            and the names of the project it sees, never taken as jdk types
+        """
+        if visible_type_dict is None:
+            visible_type_dict = get_visible_type_dict(frozenset())
+
+        for name_set, id_set in (
+            (self.inherit_name_set, self.inherit_id_set),
+            (self.realize_name_set, self.realize_id_set),
+            (self.aggregate_name_set, self.aggregate_id_set),
+            (self.depend_name_set, self.depend_id_set),
+        ):
+            for name in list(name_set):
+                if name in shadow_name_set:
+                    continue
+                java_class_id = visible_type_dict.get(name)
+                if java_class_id is not None:
+                    id_set.add(java_class_id)
+                    name_set.remove(name)
 
         for field_name in list(self.depend_field_set):
             # get the first identifier of the field
-            dot_loc = field_name.find(".")
-            name = field_name[:dot_loc]
-            if name in lang_dependencies_set:
-                self.depend_id_set.add(add_lang_prefix(name))
+            name = field_name.partition(".")[0]
+            if name in shadow_name_set:
+                continue
+            java_class_id = visible_type_dict.get(name)
+            if java_class_id is not None:
+                self.depend_id_set.add(java_class_id)
                 self.depend_field_set.remove(field_name)
 
     def add_dependency_if_depend(self, java_class: JavaClass) -> None:
@@ -137,36 +386,41 @@ class JavaClass:
             self.depend_id_set.add(java_class.id)
             self.depend_name_set.remove(java_class.name)
 
-    def final_check_dependency(self) -> None:
+    def final_check_dependency(
+        self, import_last_term_dict: Dict[str, List[str]] | None = None
+    ) -> List[Tuple[str, List[str]]]:
         """
         final check for dependency
         check classes left in name set
-        compare them with depend id set
-        """
-
-        def extract_last_term(id: str) -> str:
-            """
-            extract the last term in the id
-            """
-            dot_loc = id.rfind(".")
-            return id[dot_loc + 1 :]
-
-        for class_id in self.depend_id_set:
-            for name in list(self.inherit_name_set):
-                if name == extract_last_term(class_id):
-                    self.inherit_id_set.add(class_id)
-                    self.inherit_name_set.remove(name)
-                    break
-            for name in list(self.realize_name_set):
-                if name == extract_last_term(class_id):
-                    self.realize_id_set.add(class_id)
-                    self.realize_name_set.remove(name)
-                    break
-            for name in list(self.aggregate_name_set):
-                if name == extract_last_term(class_id):
-                    self.aggregate_id_set.add(class_id)
-                    self.aggregate_name_set.remove(name)
-                    break
+        match them with the last terms of the ids the file imports,
+        the smallest id is taken
+        return the names matched by several ids and the ids, the chosen first
+
+        :param import_last_term_dict: the ids the file imports by last term,
+            made once by 'make_last_term_dict' for all the classes of the file
+        """
+        if not (
+            self.inherit_name_set or self.realize_name_set or self.aggregate_name_set
+        ):
+            return []
+        if import_last_term_dict is None:
+            import_last_term_dict = {}
+
+        ambiguous_name_list: List[Tuple[str, List[str]]] = []
+        for name_set, id_set in (
+            (self.inherit_name_set, self.inherit_id_set),
+            (self.realize_name_set, self.realize_id_set),
+            (self.aggregate_name_set, self.aggregate_id_set),
+        ):
+            for name in list(name_set):
+                candidate_list = import_last_term_dict.get(name, [])
+                if not candidate_list:
+                    continue
+                if len(candidate_list) > 1:
+                    ambiguous_name_list.append((name, candidate_list))
+                id_set.add(candidate_list[0])
+                name_set.remove(name)
+        return ambiguous_name_list
 
     def add_dependency_in_field(self) -> None:
         """
@@ -178,6 +432,38 @@ class JavaClass:
         # empty the field set
         self.depend_field_set = set()
 
+    def to_record(self) -> tuple:
+        """
+        convert the class into a record of plain tuples and strings
+        """
+        return (
+            self.package_name,
+            self.name,
+            self.outter_class_name_tuple,
+            tuple(tuple(getattr(self, set_name)) for set_name in RECORD_SET_NAMES),
+        )
+
+    @classmethod
+    def from_record(cls, record: tuple) -> JavaClass:
+        """
+        rebuild the class from a record made by 'to_record'
+        """
+        package_name, class_name, outter_class_name_tuple, set_tuple = record
+        java_class = cls(package_name, class_name, outter_class_name_tuple)
+        edge_list = [
+            kind << KIND_SHIFT | string_table.index(value)
+            for kind, name_tuple in enumerate(set_tuple)
+            for value in name_tuple
+        ]
+        if edge_list:
+            java_class.edge_array = array("Q", sorted(set(edge_list)))
+        return java_class
+
+    def __reduce__(self) -> tuple:
+        # the indexes belong to the string table of this process,
+        # so a pickle carries the strings
+        return (JavaClass.from_record, (self.to_record(),))
+
     def __hash__(self) -> int:
         return self.id.__hash__()
 
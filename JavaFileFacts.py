@@ -0,0 +1,109 @@
+from __future__ import annotations
+from typing import List, Set, Tuple
+from JavaClass import JavaClass
+
+
+class JavaFileFacts:
+    """
+    the facts extracted from one java file
+    it holds no source and no parse tree, so it is cheap to pickle
+    """
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        package_name: str,
+        import_file_set: Set[str],
+        import_package_set: Set[str],
+        public_class_set: Set[JavaClass],
+        ambiguous_name_list: List[Tuple[str, str, List[str]]] | None = None,
+    ) -> None:
+        self.id = id  # the id of the java file, e.g. dtu.compute.util.Utils
+        self.name = name  # the name of the java file
+        self.package_name = package_name  # the name of package it belongs to
+        self.import_file_set = import_file_set  # the names of the files it imports
+        self.import_package_set = (
+            import_package_set  # the names of the packages it imports
+        )
+        self.public_class_set = public_class_set  # the public classes it creates
+        self.ambiguous_name_list: List[Tuple[str, str, List[str]]] = (
+            [] if ambiguous_name_list is None else ambiguous_name_list
+        )  # the class, the name and the ids it matches, if several match
+
+    @classmethod
+    def from_analyzer(cls, java_analyzer) -> JavaFileFacts:
+        """
+        take the facts from an analyzed JavaAnalyzer
+        """
+        return cls(
+            java_analyzer.id,
+            java_analyzer.name,
+            java_analyzer.package_name,
+            java_analyzer.import_file_set,
+            java_analyzer.import_package_set,
+            java_analyzer.public_class_set,
+            java_analyzer.ambiguous_name_list,
+        )
+
+    def to_record(self) -> tuple:
+        """
+        convert the facts into a record of plain tuples and strings
+        """
+        return (
+            self.id,
+            self.name,
+            self.package_name,
+            tuple(self.import_file_set),
+            tuple(self.import_package_set),
+            tuple(java_class.to_record() for java_class in self.public_class_set),
+            tuple(
+                (java_class_id, name, tuple(candidate_list))
+                for java_class_id, name, candidate_list in self.ambiguous_name_list
+            ),
+        )
+
+    @classmethod
+    def from_record(cls, record: tuple) -> JavaFileFacts:
+        """
+        rebuild the facts from a record made by 'to_record'
+        """
+        (
+            id,
+            name,
+            package_name,
+            import_file_tuple,
+            import_package_tuple,
+            class_tuple,
+            ambiguous_name_tuple,
+        ) = record
+        return cls(
+            id,
+            name,
+            package_name,
+            set(import_file_tuple),
+            set(import_package_tuple),
+            {JavaClass.from_record(class_record) for class_record in class_tuple},
+            [
+                (java_class_id, name, list(candidate_tuple))
+                for java_class_id, name, candidate_tuple in ambiguous_name_tuple
+            ],
+        )
+
+    def check_dependency(self, java_file_facts: JavaFileFacts) -> None:
+        """
+        check if its classes depend on classes from another file
+        add them if identify dependencies
+        """
+        # check if it imports java_file_facts
+        if (
+            self.package_name == java_file_facts.package_name
+            or java_file_facts.id in self.import_file_set
+            or java_file_facts.package_name in self.import_package_set
+        ):
+            for source_class in java_file_facts.public_class_set:
+                for java_class in self.public_class_set:
+                    java_class.add_dependency_if_depend(source_class)
+
+    def __str__(self) -> str:
+        return self.id
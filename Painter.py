@@ -1,7 +1,23 @@
 from __future__ import annotations
 from JavaClass import JavaClass
-from typing import List, Dict, Set
+from GraphIndex import GraphIndex
+from Renderer import Renderer
+from jdk_symbols import is_jdk_id
+from typing import Iterable, Iterator, List, Dict, Set, TextIO, Tuple
+import io
 import os
+import subprocess
+import sys
+
+# the size of the write buffer of the dot file
+DOT_BUFFER_SIZE = 1 << 20
+
+
+def get_format(output_path: str) -> str:
+    """
+    get the format of the picture from the extension of its path
+    """
+    return os.path.splitext(output_path)[1][1:].lower() or "png"
 
 
 class Painter:
@@ -9,9 +25,83 @@ class Painter:
     class that draws the dependency graph
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        collapse_packages: bool = False,
+        package_depth: int | None = None,
+        expanded_package_set: Set[str] | None = None,
+        hide_jdk: bool = False,
+    ) -> None:
+        """
+        :param collapse_packages: draw one node for every package
+            instead of one node for every class
+        :param package_depth: collapse the packages to their prefixes
+            of this many names, None for whole package names
+        :param expanded_package_set: the collapsed packages whose classes
+            are still drawn, inside a cluster of the package
+        :param hide_jdk: leave out the edges to the types of the jdk
+        """
         self.java_class_set: Set[JavaClass] = set()
-        self.dot_code = ""  # the dot code representing the graph
+        self.dot_code = ""  # the dot code representing the graph, if kept
+        self.collapse_packages = collapse_packages
+        self.package_depth = package_depth
+        self.expanded_package_set: Set[str] = (
+            set() if expanded_package_set is None else expanded_package_set
+        )
+        self.shown_id_set: Set[str] | None = None  # the ids drawn, None for all
+        self.hide_jdk = hide_jdk
+        self.cycle_dict: Dict[str, int] = {}  # the id maps to its cycle, if any
+        self.kept_edge_dict: Dict[
+            str, Set[str]
+        ] | None = None  # the id maps to the targets of its edges drawn, None for all
+
+    def add_subgraph(self, graph_index: GraphIndex, id_set: Iterable[str]) -> None:
+        """
+        add the classes of a part of the graph, e.g. a neighborhood
+        only the edges between the ids of the part are drawn
+        """
+        self.shown_id_set = set(id_set)
+        for java_class in graph_index.classes(self.shown_id_set):
+            self.add_one(java_class)
+
+    def highlight_cycles(self, cycle_list: List[List[str]]) -> None:
+        """
+        draw the classes of every dependency cycle and the edges between them
+        in red, e.g. the cycles of 'graph_metrics.find_cycles'
+        """
+        self.cycle_dict = {
+            java_class_id: cycle_index
+            for cycle_index, cycle in enumerate(cycle_list)
+            for java_class_id in cycle
+        }
+
+    def keep_edges(self, kept_edge_dict: Dict[str, Set[str]]) -> None:
+        """
+        draw only the edges chosen, e.g. by 'GraphSimplifier.simplify'
+        the classes only the other edges go to are not drawn either
+        """
+        self.kept_edge_dict = kept_edge_dict
+
+    def is_shown(self, java_class_id: str) -> bool:
+        """
+        check if the edges to the class are drawn
+        """
+        if self.shown_id_set is not None and java_class_id not in self.shown_id_set:
+            return False
+        return not (self.hide_jdk and is_jdk_id(java_class_id))
+
+    def drawn_edges(self, java_class: JavaClass) -> Iterator[Tuple[str, str]]:
+        """
+        iterate the ids and labels of the edges of the class that are drawn
+        """
+        edges = java_class.relation_edges()
+        if self.kept_edge_dict is not None:
+            kept_id_set = self.kept_edge_dict.get(java_class.id, ())
+            edges = (edge for edge in edges if edge[0] in kept_id_set)
+        if self.shown_id_set is not None or self.hide_jdk:
+            is_shown = self.is_shown
+            edges = (edge for edge in edges if is_shown(edge[0]))
+        return edges
 
     def add_one(self, java_class: JavaClass) -> None:
         """
@@ -19,89 +109,275 @@ class Painter:
         """
         self.java_class_set.add(java_class)
 
-    def generate_dot_code(self) -> None:
+    def generate_dot_code(
+        self, output: str | TextIO = "./result.dot", keep_dot_code: bool = False
+    ) -> None:
         """
         generate the dot code
-        save the code into './result.dot'
+        save the code into './result.dot' by default
+
+        :param output: the path or the file object the code is written to
+        :param keep_dot_code: keep the code in 'dot_code' too
+        """
+        if not keep_dot_code:
+            self.write_dot(output)
+            return
+        code_buffer = io.StringIO()
+        self.write_dot(code_buffer)
+        self.dot_code = code_buffer.getvalue()
+        if isinstance(output, str):
+            with open(output, "w") as f:
+                f.write(self.dot_code)
+        else:
+            output.write(self.dot_code)
+
+    def write_dot(self, output: str | TextIO) -> None:
         """
-        dot_id_map: Dict[str, str] = {}  # java class id maps to dot id
-        self.dot_code = "digraph SourceGra {\n"
-        self.dot_id = 0  # the id for java class in dot class
+        write the dot code node by node and edge by edge
+        only the dot ids of the classes are held in memory
+
+        :param output: the path or the file object the code is written to
+        """
+        if isinstance(output, str):
+            with open(output, "w", buffering=DOT_BUFFER_SIZE) as f:
+                self.write_dot(f)
+            return
+        if self.collapse_packages:
+            self.write_package_dot(output)
+            return
+
+        write = output.write
+        dot_id_map: Dict[str, int] = {}  # java class id maps to dot id
+        write("digraph SourceGra {\n")
+
+        cycle_dict = self.cycle_dict
 
         def allocate_id(java_class_id: str) -> None:
             """
-            allocate the id to java class if it doesn't have one
+            allocate the id to java class and declare it if it doesn't have one
             """
-            if java_class_id in dot_id_map:
-                return
-            else:
-                dot_id_map[java_class_id] = str(self.dot_id)
-                self.dot_id += 1
+            if java_class_id not in dot_id_map:
+                dot_id_map[java_class_id] = len(dot_id_map)
+                style = ", color = red" if java_class_id in cycle_dict else ""
+                dot_id = dot_id_map[java_class_id]
+                write(f'x{dot_id} [label = "{java_class_id}"{style}];\n')
 
-        # allocate the dot id to java class
         for java_class in self.java_class_set:
             allocate_id(java_class.id)
+            for java_class_id, _ in self.drawn_edges(java_class):
+                allocate_id(java_class_id)
 
-            for tmp_file_id in java_class.inherit_id_set:
-                allocate_id(tmp_file_id)
-            for tmp_file_id in java_class.realize_id_set:
-                allocate_id(tmp_file_id)
-            for tmp_file_id in java_class.aggregate_id_set:
-                allocate_id(tmp_file_id)
-            for tmp_file_id in java_class.depend_id_set:
-                allocate_id(tmp_file_id)
-
-        for java_class_id in dot_id_map:
-            self.dot_code += (
-                f'x{dot_id_map[java_class_id]} [label = "{java_class_id}"];\n'
-            )
-
+        # one edge for every related class, labeled by its strongest relation
         for java_class in self.java_class_set:
-            for inherit_class_id in java_class.inherit_id_set:
-                self.dot_code += f'x{dot_id_map[java_class.id]} -> x{dot_id_map[inherit_class_id]} [label = "inheritance"];\n'
-            for realize_class_id in java_class.realize_id_set:
-                if realize_class_id not in java_class.inherit_id_set:
-                    self.dot_code += f'x{dot_id_map[java_class.id]} -> x{dot_id_map[realize_class_id]} [label = "realization"];\n'
-            for aggregate_class_id in java_class.aggregate_id_set:
-                if (
-                    aggregate_class_id not in java_class.inherit_id_set
-                    and aggregate_class_id not in java_class.realize_id_set
-                ):
-                    self.dot_code += f'x{dot_id_map[java_class.id]} -> x{dot_id_map[aggregate_class_id]} [label = "aggregation"];\n'
-            for compose_class_id in java_class.compose_id_set:
+            source = f"x{dot_id_map[java_class.id]} -> x"
+            cycle_index = cycle_dict.get(java_class.id)
+            for java_class_id, label in self.drawn_edges(java_class):
                 if (
-                    compose_class_id not in java_class.inherit_id_set
-                    and compose_class_id not in java_class.aggregate_id_set
-                    and compose_class_id not in java_class.realize_id_set
+                    cycle_index is not None
+                    and cycle_dict.get(java_class_id) == cycle_index
                 ):
-                    self.dot_code += f'x{dot_id_map[java_class.id]} -> x{dot_id_map[compose_class_id]} [label = "composition"];\n'
-            for depend_class_id in java_class.depend_id_set:
-                if (
-                    depend_class_id not in java_class.inherit_id_set
-                    and depend_class_id not in java_class.compose_id_set
-                    and depend_class_id not in java_class.aggregate_id_set
-                    and depend_class_id not in java_class.realize_id_set
-                ):
-                    self.dot_code += f'x{dot_id_map[java_class.id]} -> x{dot_id_map[depend_class_id]} [label = "dependency"];\n'
+                    write(
+                        f'{source}{dot_id_map[java_class_id]} '
+                        f'[label = "{label}", color = red];\n'
+                    )
+                    continue
+                write(f'{source}{dot_id_map[java_class_id]} [label = "{label}"];\n')
+
+        write("}")
+
+    def write_diff_dot(
+        self,
+        added_edge_set: Set[Tuple[str, str, str]],
+        removed_edge_set: Set[Tuple[str, str, str]],
+        output: str | TextIO,
+    ) -> None:
+        """
+        write the dot code of the classes with the change of their edges,
+        the added edges in green, the removed ones dashed in red
+        and the others as usual
+
+        :param added_edge_set: the ids of the sources and targets
+            and the labels of the new edges
+        :param removed_edge_set: the same of the edges that are gone
+        :param output: the path or the file object the code is written to
+        """
+        if isinstance(output, str):
+            with open(output, "w", buffering=DOT_BUFFER_SIZE) as f:
+                self.write_diff_dot(added_edge_set, removed_edge_set, f)
+            return
+
+        write = output.write
+        dot_id_map: Dict[str, int] = {}  # java class id maps to dot id
+        write("digraph SourceGra {\n")
+        filtered = self.shown_id_set is not None or self.hide_jdk
+        is_shown = self.is_shown
+
+        def get_dot_id(java_class_id: str) -> int:
+            """
+            get the dot id of the class, declare it if it doesn't have one
+            """
+            dot_id = dot_id_map.get(java_class_id)
+            if dot_id is None:
+                dot_id = len(dot_id_map)
+                dot_id_map[java_class_id] = dot_id
+                write(f'x{dot_id} [label = "{java_class_id}"];\n')
+            return dot_id
+
+        for java_class in self.java_class_set:
+            source = get_dot_id(java_class.id)
+            for java_class_id, label in java_class.relation_edges():
+                if filtered and not is_shown(java_class_id):
+                    continue
+                if (java_class.id, java_class_id, label) in added_edge_set:
+                    continue
+                target = get_dot_id(java_class_id)
+                write(f'x{source} -> x{target} [label = "{label}"];\n')
+        for edge_set, style in (
+            (added_edge_set, "color = green"),
+            (removed_edge_set, "color = red, style = dashed"),
+        ):
+            for source_id, target_id, label in sorted(edge_set):
+                if filtered and not is_shown(target_id):
+                    continue
+                source = get_dot_id(source_id)
+                target = get_dot_id(target_id)
+                write(f'x{source} -> x{target} [label = "{label}", {style}];\n')
+        write("}")
+
+    def get_package_group(self, package_name: str) -> str:
+        """
+        get the name of the collapsed package the package belongs to
+        """
+        if self.package_depth is None:
+            return package_name
+        return ".".join(package_name.split(".")[: self.package_depth])
+
+    def write_package_dot(self, output: TextIO) -> None:
+        """
+        write the dot code of the graph collapsed by package
+        the edges between two packages are merged, one for every relation,
+        weighted by the number of class edges merged into it
+        the edges inside a collapsed package are only counted in its label
+        """
+        # the package of a class not added is taken from its id,
+        # the id of a nested one is read as a package
+        package_map: Dict[str, str] = {
+            java_class.id: java_class.package_name for java_class in self.java_class_set
+        }
+        group_map: Dict[str, str] = {}  # package maps to its collapsed package
+        node_map: Dict[str, int] = {}  # class id or collapsed package maps to dot id
+        group_class_dict: Dict[str, Set[str]] = {}  # collapsed package maps to ids
+        group_node_dict: Dict[
+            str, List[Tuple[int, str]]
+        ] = {}  # expanded package maps to the dot ids and ids of its classes
+        internal_edge_dict: Dict[int, int] = {}  # collapsed node maps to edge count
+        edge_count_dict: Dict[Tuple[int, int, str], int] = {}  # edge maps to count
 
-        self.dot_code += "}"
+        def get_node(java_class_id: str) -> int:
+            """
+            get the dot id of the node the class is drawn in
+            """
+            package_name = package_map.get(java_class_id)
+            if package_name is None:
+                package_name = java_class_id.rpartition(".")[0]
+            group = group_map.get(package_name)
+            if group is None:
+                group = self.get_package_group(package_name)
+                group_map[package_name] = group
+            group_class_dict.setdefault(group, set()).add(java_class_id)
+            expanded = group in self.expanded_package_set
+            key = java_class_id if expanded else group
+            node = node_map.get(key)
+            if node is None:
+                node = len(node_map)
+                node_map[key] = node
+                if expanded:
+                    group_node_dict.setdefault(group, []).append((node, java_class_id))
+            return node
 
-        dot_file_path = "./result.dot"
-        with open(dot_file_path, "w") as f:
-            f.write(self.dot_code)
+        for java_class in self.java_class_set:
+            source = get_node(java_class.id)
+            for java_class_id, label in self.drawn_edges(java_class):
+                target = get_node(java_class_id)
+                if source == target:
+                    internal_edge_dict[source] = internal_edge_dict.get(source, 0) + 1
+                    continue
+                edge = (source, target, label)
+                edge_count_dict[edge] = edge_count_dict.get(edge, 0) + 1
+
+        write = output.write
+        write("digraph SourceGra {\n")
+        for cluster_id, (group, node_list) in enumerate(group_node_dict.items()):
+            write(f"subgraph cluster_{cluster_id} {{\n")
+            write(f'label = "{group}";\n')
+            for node, java_class_id in node_list:
+                write(f'x{node} [label = "{java_class_id}"];\n')
+            write("}\n")
+        expanded_node_set = {
+            node for node_list in group_node_dict.values() for node, _ in node_list
+        }
+        for key, node in node_map.items():
+            if node in expanded_node_set:
+                continue
+            label = f"{key}\\n{len(group_class_dict[key])} classes"
+            if node in internal_edge_dict:
+                label += f", {internal_edge_dict[node]} inner edges"
+            write(f'x{node} [label = "{label}", shape = box];\n')
+        for (source, target, label), count in edge_count_dict.items():
+            write(
+                f'x{source} -> x{target} [label = "{label} ({count})", weight = {count}];\n'
+            )
+        write("}")
+
+    def render_graph(
+        self,
+        output_path: str = "./result.png",
+        dpi: int = 500,
+        renderer: Renderer | None = None,
+    ) -> str:
+        """
+        render the graph into a picture, the format is taken from the extension
+        the dot code is piped to graphviz, no dot file is written
+        return the path of the picture
 
-    def generate_graph_and_show(self) -> None:
+        :param output_path: the path of the picture, '.png', '.svg' or '.pdf'
+        :param dpi: the dots per inch of the picture
+        :param renderer: the renderer and its cache, a default one if None
+        """
+        return self.render_graphs([output_path], dpi, renderer)[0]
+
+    def render_graphs(
+        self,
+        output_path_list: List[str],
+        dpi: int = 500,
+        renderer: Renderer | None = None,
+    ) -> List[str]:
+        """
+        render the graph into several pictures at the same time
+        return the paths of the pictures
+        """
+        if renderer is None:
+            renderer = Renderer()
+        code_buffer = io.StringIO()
+        self.write_dot(code_buffer)
+        dot_code = code_buffer.getvalue()
+        return renderer.render_many(
+            [
+                (dot_code, output_path, get_format(output_path), dpi)
+                for output_path in output_path_list
+            ]
+        )
+
+    def generate_graph_and_show(self, output_path: str = "./result.png") -> None:
         """
         generate the graph
         save the graph to './result.png'
         show the graph
         """
-
-        DPI = 500  # the dpi of the result picture
-        self.generate_dot_code()
-        command = (
-            f".\\Graphviz\\bin\\dot.exe -Tpng -Gdpi={DPI} .\\result.dot -o result.png"
-        )
-        os.system(command)
-        command = ".\\result.png"
-        os.system(command)
+        picture_path = self.render_graph(output_path)
+        if sys.platform == "win32":
+            os.startfile(picture_path)
+        elif sys.platform == "darwin":
+            subprocess.Popen(["open", picture_path])
+        else:
+            subprocess.Popen(["xdg-open", picture_path])
@@ -0,0 +1,220 @@
+from __future__ import annotations
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+from JavaClass import JavaClass, compact_strings
+from JavaFileFacts import JavaFileFacts
+from StringTable import string_table
+from SymbolIndex import SymbolIndex
+
+
+class ProjectState:
+    """
+    the linked facts of a project, kept up to date while files change
+    only the files that can see a changed file are linked again
+    """
+
+    def __init__(self) -> None:
+        self.index = SymbolIndex([])  # the symbol index of the linked files
+        self.file_index_dict: Dict[str, int] = {}  # the path maps to its index
+        self.path_list: List[str | None] = []  # the index maps to its path
+        self.record_dict: Dict[
+            str, tuple
+        ] = {}  # the path maps to the record of its facts before linking
+        self.unresolved_name_dict: Dict[
+            str, Set[str]
+        ] = {}  # the path maps to the names its classes leave before linking
+        self.unlinked_index_set: Set[int] = set()  # the files added but not linked
+        self.compacted_string_count = 0  # the strings left by the last compaction
+
+    def update_file(self, path: str, java_file_facts: JavaFileFacts) -> Set[str]:
+        """
+        add or replace the facts of a file and link the files it affects
+        return the paths of the files linked again
+        """
+        changed_name_set = {
+            java_class.name for java_class in java_file_facts.public_class_set
+        }
+        dependent_set: Set[int] = set()
+        if path in self.file_index_dict:
+            file_index = self.file_index_dict[path]
+            old_facts = self.index.java_file_list[file_index]
+            changed_name_set.update(
+                java_class.name for java_class in old_facts.public_class_set
+            )
+            dependent_set = self.index.dependent_files(file_index)
+            self.index.replace_file(file_index, java_file_facts)
+        else:
+            file_index = self.index.add_file(java_file_facts)
+            self.file_index_dict[path] = file_index
+            self.path_list.append(path)
+        dependent_set.update(self.index.dependent_files(file_index))
+
+        self.keep_record(path, java_file_facts)
+        self.index.link_file(file_index)
+        self.unlinked_index_set.discard(file_index)
+        return {path} | self.relink_dependents(dependent_set, changed_name_set)
+
+    def affected_paths(
+        self, path: str, java_file_facts: JavaFileFacts | None
+    ) -> Set[str]:
+        """
+        find the files 'update_file' or 'remove_file' would link again,
+        without changing the state
+
+        :param java_file_facts: the new facts of the file, None if it is removed
+        return the path and the paths of the files in the state using its classes
+        """
+        changed_name_set: Set[str] = set()
+        dependent_set: Set[int] = set()
+        if java_file_facts is not None:
+            changed_name_set.update(
+                java_class.name for java_class in java_file_facts.public_class_set
+            )
+            dependent_set.update(self.index.visible_files(java_file_facts))
+        if path in self.file_index_dict:
+            file_index = self.file_index_dict[path]
+            old_facts = self.index.java_file_list[file_index]
+            changed_name_set.update(
+                java_class.name for java_class in old_facts.public_class_set
+            )
+            dependent_set.update(self.index.dependent_files(file_index))
+            dependent_set.discard(file_index)
+        affected_path_set = {path}
+        for file_index in dependent_set:
+            dependent_path = self.path_list[file_index]
+            if not self.unresolved_name_dict[dependent_path].isdisjoint(
+                changed_name_set
+            ):
+                affected_path_set.add(dependent_path)
+        return affected_path_set
+
+    def add_files(
+        self, path_facts_list: Iterable[Tuple[str, JavaFileFacts]], link: bool = True
+    ) -> None:
+        """
+        load the facts of a whole project into an empty state and link them,
+        cheaper than 'update_file' file by file
+
+        :param link: link every file now, False to link a file only
+            when its linked facts are needed
+        """
+        if self.file_index_dict:
+            raise Exception("the state is not empty!")
+        file_index_list: List[int] = []
+        for path, java_file_facts in path_facts_list:
+            if path in self.file_index_dict:
+                raise Exception("file added twice!", path)
+            file_index = self.index.add_file(java_file_facts)
+            self.file_index_dict[path] = file_index
+            self.path_list.append(path)
+            self.keep_record(path, java_file_facts)
+            file_index_list.append(file_index)
+        if not link:
+            self.unlinked_index_set.update(file_index_list)
+            return
+        for file_index in file_index_list:
+            self.index.link_file(file_index)
+
+    def link_paths(self, path_iterable: Iterable[str]) -> None:
+        """
+        link the files not linked yet among the paths
+        """
+        for path in path_iterable:
+            file_index = self.file_index_dict.get(path)
+            if file_index in self.unlinked_index_set:
+                self.index.link_file(file_index)
+                self.unlinked_index_set.remove(file_index)
+
+    def keep_record(self, path: str, java_file_facts: JavaFileFacts) -> None:
+        """
+        keep the facts of the file before linking and the names they leave
+        """
+        self.record_dict[path] = java_file_facts.to_record()
+        unresolved_name_set: Set[str] = set()
+        for java_class in java_file_facts.public_class_set:
+            unresolved_name_set.update(java_class.inherit_name_set)
+            unresolved_name_set.update(java_class.realize_name_set)
+            unresolved_name_set.update(java_class.aggregate_name_set)
+            unresolved_name_set.update(java_class.depend_name_set)
+        self.unresolved_name_dict[path] = unresolved_name_set
+
+    def remove_file(self, path: str) -> Set[str]:
+        """
+        remove the facts of a file and link the files it affects
+        return the paths of the files linked again
+        """
+        file_index = self.file_index_dict.pop(path)
+        old_facts = self.index.java_file_list[file_index]
+        changed_name_set = {java_class.name for java_class in old_facts.public_class_set}
+        dependent_set = self.index.dependent_files(file_index)
+        self.index.remove_file(file_index)
+        self.unlinked_index_set.discard(file_index)
+        self.path_list[file_index] = None
+        del self.record_dict[path]
+        del self.unresolved_name_dict[path]
+        return self.relink_dependents(dependent_set, changed_name_set)
+
+    def relink_dependents(
+        self, dependent_set: Set[int], changed_name_set: Set[str]
+    ) -> Set[str]:
+        """
+        link the dependent files again if they use a changed class name
+        return their paths
+        """
+        relinked_path_set: Set[str] = set()
+        for file_index in dependent_set:
+            path = self.path_list[file_index]
+            if self.unresolved_name_dict[path].isdisjoint(changed_name_set):
+                continue
+            self.index.replace_file(
+                file_index, JavaFileFacts.from_record(self.record_dict[path])
+            )
+            self.index.link_file(file_index)
+            self.unlinked_index_set.discard(file_index)
+            relinked_path_set.add(path)
+        return relinked_path_set
+
+    def compact_strings(self, growth: float = 2.0) -> bool:
+        """
+        drop the strings of the string table the classes of the state no longer
+        use, once the table has grown by the factor since the last compaction
+        only for a process whose classes all belong to the state,
+        e.g. the watcher, or the daemon between two analyses
+        return True if the table was compacted
+        """
+        if len(string_table) <= growth * self.compacted_string_count:
+            return False
+        compact_strings(
+            java_class
+            for java_file_facts in self.index.java_file_list
+            if java_file_facts is not None
+            for java_class in java_file_facts.public_class_set
+        )
+        self.compacted_string_count = len(string_table)
+        return True
+
+    def get_facts(self, path: str) -> JavaFileFacts:
+        """
+        get the linked facts of a file
+        """
+        self.link_paths((path,))
+        return self.index.java_file_list[self.file_index_dict[path]]
+
+    def java_file_facts_list(self) -> List[JavaFileFacts]:
+        """
+        get the linked facts of all files
+        """
+        self.link_paths(
+            [self.path_list[file_index] for file_index in self.unlinked_index_set]
+        )
+        return [
+            java_file_facts
+            for java_file_facts in self.index.java_file_list
+            if java_file_facts is not None
+        ]
+
+    def java_classes(self) -> Iterator[JavaClass]:
+        """
+        iterate all the linked public classes
+        """
+        for java_file_facts in self.java_file_facts_list():
+            yield from java_file_facts.public_class_set
@@ -0,0 +1,169 @@
+from __future__ import annotations
+from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+
+# the directory of this file, paths below are relative to it
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# the graphviz shipped with the repository, used when dot is not on the path
+BUNDLED_DOT_PATH = os.path.join(BASE_DIR, "Graphviz", "bin", "dot.exe")
+# the formats dot is asked for
+FORMAT_SET = {"png", "svg", "pdf"}
+
+# a render request: the dot code, the output path, the format and the dpi
+RenderJob = Tuple[str, str, str, int]
+
+
+def find_dot() -> str:
+    """
+    find the dot executable, on the path first, then the bundled one
+    """
+    dot_path = shutil.which("dot")
+    if dot_path is None and os.path.exists(BUNDLED_DOT_PATH):
+        dot_path = BUNDLED_DOT_PATH
+    if dot_path is None:
+        raise Exception("dot of graphviz is not found!")
+    return dot_path
+
+
+class Renderer:
+    """
+    render dot code into pictures with graphviz
+    the code is piped to dot without a temporary file,
+    and every picture is cached by the hash of its code and options,
+    so an unchanged graph is never laid out twice
+    """
+
+    def __init__(
+        self,
+        dot_path: str | None = None,
+        cache_dir: str = ".render_cache",
+        max_bytes: int = 256 << 20,
+        max_workers: int | None = None,
+    ) -> None:
+        """
+        :param dot_path: the dot executable, found by 'find_dot' by default
+        :param cache_dir: the directory of the cached pictures
+        :param max_bytes: the size cap of the cache,
+            the least recently used pictures are removed beyond it
+        :param max_workers: the number of renders run at the same time
+        """
+        self.dot_path = dot_path if dot_path is not None else find_dot()
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self.hit_count = 0  # the number of renders found in the cache
+        self.miss_count = 0  # the number of renders laid out by dot
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, dot_code: bytes, format: str, dpi: int) -> str:
+        """
+        make the cache key of the code and the options
+        """
+        key_hash = hashlib.sha1(dot_code)
+        key_hash.update(f"\0{format}\0{dpi}\0{self.dot_path}".encode("utf-8"))
+        return key_hash.hexdigest()
+
+    def render(
+        self,
+        dot_code: str | bytes,
+        output_path: str | None = None,
+        format: str = "png",
+        dpi: int = 500,
+    ) -> str:
+        """
+        render the dot code into a picture
+        return the path of the picture
+
+        :param dot_code: the dot code of the graph
+        :param output_path: the path the picture is copied to,
+            None to use the picture in the cache
+        :param format: 'png', 'svg' or 'pdf'
+        :param dpi: the dots per inch of the picture
+        """
+        if format not in FORMAT_SET:
+            raise Exception("unsupported format!", format)
+        if isinstance(dot_code, str):
+            dot_code = dot_code.encode("utf-8")
+
+        cache_path = os.path.join(
+            self.cache_dir, self.make_key(dot_code, format, dpi) + "." + format
+        )
+        if os.path.exists(cache_path):
+            self.hit_count += 1
+            os.utime(cache_path)
+        else:
+            self.miss_count += 1
+            temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                completed = subprocess.run(
+                    [self.dot_path, f"-T{format}", f"-Gdpi={dpi}"],
+                    input=dot_code,
+                    stdout=f,
+                    stderr=subprocess.PIPE,
+                )
+            if completed.returncode != 0:
+                os.remove(temp_path)
+                raise Exception(
+                    "dot failed!", completed.stderr.decode("utf-8", "replace")
+                )
+            os.replace(temp_path, cache_path)
+            self.evict()
+
+        if output_path is None:
+            return cache_path
+        shutil.copyfile(cache_path, output_path)
+        return output_path
+
+    def render_many(self, job_list: List[RenderJob]) -> List[str]:
+        """
+        render several graphs at the same time
+        a graph requested twice with the same options is laid out once
+        return the paths of the pictures in the order of the jobs
+        """
+        first_index_dict: Dict[Tuple[str, str, int], int] = {}
+        for index, (dot_code, _, format, dpi) in enumerate(job_list):
+            first_index_dict.setdefault((dot_code, format, dpi), index)
+        first_index_list = sorted(first_index_dict.values())
+
+        path_list: List[str | None] = [None] * len(job_list)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            rendered_path_list = executor.map(
+                lambda index: self.render(*job_list[index]), first_index_list
+            )
+            for index, path in zip(first_index_list, rendered_path_list):
+                path_list[index] = path
+        # the repeated graphs are in the cache now
+        for index, job in enumerate(job_list):
+            if path_list[index] is None:
+                path_list[index] = self.render(*job)
+        return path_list
+
+    def evict(self) -> None:
+        """
+        remove the least recently used pictures until the cache fits its cap
+        """
+        entry_list: List[Tuple[float, int, str]] = []
+        total_bytes = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entry_list.append((stat.st_mtime, stat.st_size, entry.path))
+                total_bytes += stat.st_size
+        if total_bytes <= self.max_bytes:
+            return
+        for _, size, path in sorted(entry_list):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total_bytes -= size
+
+    def __str__(self) -> str:
+        return f"hit: {self.hit_count}, miss: {self.miss_count}"
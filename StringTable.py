@@ -0,0 +1,75 @@
+from __future__ import annotations
+from typing import Dict, Iterable, List
+
+
+class StringTable:
+    """
+    the interning table of the names and ids of the analysis
+    every distinct string is kept once and numbered by a small integer,
+    so the classes can store their relations as arrays of integers
+    """
+
+    def __init__(self) -> None:
+        self.index_dict: Dict[str, int] = {}  # the string maps to its index
+        self.string_list: List[str] = []  # the index maps to its string
+
+    def index(self, string: str) -> int:
+        """
+        get the index of the string, add the string if it is new
+        """
+        index = self.index_dict.get(string)
+        if index is None:
+            index = len(self.string_list)
+            self.index_dict[string] = index
+            self.string_list.append(string)
+        return index
+
+    def find(self, string: str) -> int | None:
+        """
+        get the index of the string, None if it was never added
+        """
+        return self.index_dict.get(string)
+
+    def string(self, index: int) -> str:
+        """
+        get the string of the index
+        """
+        return self.string_list[index]
+
+    def intern(self, string: str) -> str:
+        """
+        get the kept copy of the string, add the string if it is new
+        """
+        return self.string_list[self.index(string)]
+
+    def compact(self, used_index_iterable: Iterable[int]) -> List[int]:
+        """
+        keep only the strings of the indexes, renumbered in the same order,
+        so sorted indexes stay sorted
+        return the old indexes mapping to the new ones, -1 for the dropped strings
+        """
+        new_index_list = [-1] * len(self.string_list)
+        string_list: List[str] = []
+        for index in sorted(set(used_index_iterable)):
+            new_index_list[index] = len(string_list)
+            string_list.append(self.string_list[index])
+        # changed in place, the classes read the list through the table
+        self.string_list[:] = string_list
+        self.index_dict = {string: index for index, string in enumerate(string_list)}
+        return new_index_list
+
+    def clear(self) -> None:
+        """
+        drop every string, only when no class of the process is left
+        """
+        self.index_dict = {}
+        self.string_list.clear()
+
+    def __len__(self) -> int:
+        return len(self.string_list)
+
+
+# the table shared by all the classes of the process
+# the indexes are local to the process, records and pickles carry the strings
+# it only grows, a long running process compacts it with 'compact_strings'
+string_table = StringTable()
@@ -0,0 +1,189 @@
+from __future__ import annotations
+from typing import Dict, List, Sequence, Set, Tuple
+from JavaClass import JavaClass, make_last_term_dict
+from jdk_symbols import get_visible_type_dict
+import bisect
+
+
+class SymbolIndex:
+    """
+    global symbol table of the analyzed java files
+    it resolves the names left in the classes with dictionary lookups
+    instead of checking every pair of files
+    """
+
+    def __init__(self, java_file_list: Sequence) -> None:
+        """
+        build the index
+
+        :param java_file_list: analyzed JavaAnalyzer or JavaFileFacts,
+            their order decides which class wins when a name is ambiguous
+        """
+        self.java_file_list: List = []  # the files, None for removed ones
+        self.package_class_dict: Dict[
+            str, List[JavaClass]
+        ] = {}  # the name of a package maps to its public classes
+        self.id_class_dict: Dict[str, JavaClass] = {}  # the id maps to the class
+        self.name_candidate_dict: Dict[
+            str, List[Tuple[int, JavaClass]]
+        ] = {}  # the simple name maps to the index of the file and the class
+        self.package_file_dict: Dict[
+            str, Set[int]
+        ] = {}  # the name of a package maps to the indexes of its files
+        self.importer_dict: Dict[
+            str, Set[int]
+        ] = {}  # the imported file or package maps to the indexes of the importers
+
+        for java_file in java_file_list:
+            self.add_file(java_file)
+
+    def index_file(self, file_index: int) -> None:
+        """
+        add the classes and imports of the file to the tables
+        """
+        java_file = self.java_file_list[file_index]
+        self.package_file_dict.setdefault(java_file.package_name, set()).add(
+            file_index
+        )
+        for imported_name in java_file.import_file_set | java_file.import_package_set:
+            self.importer_dict.setdefault(imported_name, set()).add(file_index)
+
+        # sort the classes, so the candidates of a name are deterministic
+        for java_class in sorted(java_file.public_class_set, key=str):
+            self.package_class_dict.setdefault(java_class.package_name, []).append(
+                java_class
+            )
+            self.id_class_dict[java_class.id] = java_class
+            bisect.insort(
+                self.name_candidate_dict.setdefault(java_class.name, []),
+                (file_index, java_class),
+                key=lambda candidate: candidate[0],
+            )
+
+    def unindex_file(self, file_index: int) -> None:
+        """
+        remove the classes and imports of the file from the tables
+        """
+        java_file = self.java_file_list[file_index]
+        self.package_file_dict[java_file.package_name].discard(file_index)
+        for imported_name in java_file.import_file_set | java_file.import_package_set:
+            self.importer_dict[imported_name].discard(file_index)
+
+        for java_class in java_file.public_class_set:
+            self.package_class_dict[java_class.package_name].remove(java_class)
+            if self.id_class_dict.get(java_class.id) is java_class:
+                del self.id_class_dict[java_class.id]
+            candidate_list = self.name_candidate_dict[java_class.name]
+            candidate_list.remove((file_index, java_class))
+            if not candidate_list:
+                del self.name_candidate_dict[java_class.name]
+
+    def add_file(self, java_file) -> int:
+        """
+        add a file after all the others
+        return its index
+        """
+        self.java_file_list.append(java_file)
+        file_index = len(self.java_file_list) - 1
+        self.index_file(file_index)
+        return file_index
+
+    def replace_file(self, file_index: int, java_file) -> None:
+        """
+        replace the file at the index, it keeps its place in the order
+        """
+        self.unindex_file(file_index)
+        self.java_file_list[file_index] = java_file
+        self.index_file(file_index)
+
+    def remove_file(self, file_index: int) -> None:
+        """
+        remove the file at the index
+        """
+        self.unindex_file(file_index)
+        self.java_file_list[file_index] = None
+
+    def visible_files(self, java_file) -> Set[int]:
+        """
+        get the indexes of the files that can see the classes of a file,
+        the file itself need not be in the index
+        """
+        file_index_set = set(self.package_file_dict.get(java_file.package_name, ()))
+        file_index_set.update(self.importer_dict.get(java_file.id, ()))
+        file_index_set.update(self.importer_dict.get(java_file.package_name, ()))
+        return file_index_set
+
+    def dependent_files(self, file_index: int) -> Set[int]:
+        """
+        get the indexes of the files that can see the classes of the file
+        """
+        file_index_set = self.visible_files(self.java_file_list[file_index])
+        file_index_set.discard(file_index)
+        return file_index_set
+
+    def is_visible(self, file_index: int, source_index: int) -> bool:
+        """
+        check if the classes of the source file are visible in the file
+        """
+        if file_index == source_index:
+            return False
+        java_file = self.java_file_list[file_index]
+        source_file = self.java_file_list[source_index]
+        return (
+            java_file.package_name == source_file.package_name
+            or source_file.id in java_file.import_file_set
+            or source_file.package_name in java_file.import_package_set
+        )
+
+    def resolve_name(self, file_index: int, name: str) -> JavaClass | None:
+        """
+        find the class the name refers to in the file
+        the first visible candidate in file order wins
+        """
+        for source_index, source_class in self.name_candidate_dict.get(name, ()):
+            if self.is_visible(file_index, source_index):
+                return source_class
+        return None
+
+    def link_file(self, file_index: int) -> None:
+        """
+        resolve the names left in the classes of one file
+        """
+        java_file = self.java_file_list[file_index]
+        for java_class in java_file.public_class_set:
+            for name_set, id_set in (
+                (java_class.inherit_name_set, java_class.inherit_id_set),
+                (java_class.realize_name_set, java_class.realize_id_set),
+                (java_class.aggregate_name_set, java_class.aggregate_id_set),
+                (java_class.depend_name_set, java_class.depend_id_set),
+            ):
+                for name in list(name_set):
+                    source_class = self.resolve_name(file_index, name)
+                    if source_class is not None:
+                        id_set.add(source_class.id)
+                        name_set.remove(name)
+
+        # the jdk types come last, the names imported one by one, declared
+        # in the file or found in the project above hide them
+        visible_type_dict = get_visible_type_dict(
+            frozenset(java_file.import_package_set)
+        )
+        shadow_name_set = set(make_last_term_dict(java_file.import_file_set))
+        shadow_name_set.update(
+            java_class.name for java_class in java_file.public_class_set
+        )
+        for java_class in java_file.public_class_set:
+            for field_name in java_class.depend_field_set:
+                name = field_name.partition(".")[0]
+                if self.resolve_name(file_index, name) is not None:
+                    shadow_name_set.add(name)
+            java_class.add_lang_dependency(visible_type_dict, shadow_name_set)
+            java_class.add_dependency_in_field()
+
+    def link(self) -> None:
+        """
+        resolve the names left in the classes of all files
+        """
+        for file_index, java_file in enumerate(self.java_file_list):
+            if java_file is not None:
+                self.link_file(file_index)
@@ -0,0 +1,334 @@
+from __future__ import annotations
+from typing import Dict, List, Tuple
+from load_java_files import iter_java_files, load_java_files
+from Instrumentation import get_peak_memory, reset_peak_memory
+from JavaAnalyzer import JavaAnalyzer
+from JavaClass import RECORD_SET_NAMES, JavaClass
+from JavaFileFacts import JavaFileFacts
+from Painter import Painter
+from Renderer import Renderer
+from SymbolIndex import SymbolIndex
+from synthetic_corpus import generate_corpus
+import datetime
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import tree_sitter
+import parser_service
+
+# the directory the generated corpora are kept in between runs
+CORPUS_DIR = ".bench_corpus"
+# the numbers of files the pipeline is benchmarked with by default
+SCALE_LIST = [100, 1000, 10000, 100000]
+# the stages of the pipeline, in the order they run
+STAGE_NAMES = ("load", "parse", "analyze", "link", "dot", "render")
+
+
+def benchmark_parser_startup(project_name: str) -> Dict[str, float]:
+    """
+    measure the cost of getting a parser and parsing the files of the project
+    'per_file' builds the language and parser for every file, as before
+    'shared' reuses the parser of the parser service
+    return the times in seconds
+    """
+    name_content_list: List[Tuple[str, str]] = load_java_files(project_name)
+    content_list = [bytes(content, "utf-8") for _, content in name_content_list]
+    result: Dict[str, float] = {"file_count": len(content_list)}
+
+    # the old way, the library is checked and loaded for every file
+    start_time = time.perf_counter()
+    for content in content_list:
+        tree_sitter.Language.build_library(
+            parser_service.LIBRARY_PATH, parser_service.GRAMMAR_PATHS
+        )
+        language = tree_sitter.Language(parser_service.LIBRARY_PATH, "java")
+        parser = tree_sitter.Parser()
+        parser.set_language(language)
+        parser.parse(content)
+    result["per_file_total"] = time.perf_counter() - start_time
+
+    # the new way, the first call pays the startup
+    parser_service.reset()
+    start_time = time.perf_counter()
+    parser_service.get_parser()
+    result["shared_startup"] = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    for content in content_list:
+        parser_service.get_parser().parse(content)
+    result["shared_parse"] = time.perf_counter() - start_time
+    result["shared_total"] = result["shared_startup"] + result["shared_parse"]
+
+    if content_list:
+        result["per_file_avg"] = result["per_file_total"] / len(content_list)
+        result["shared_avg"] = result["shared_parse"] / len(content_list)
+    return result
+
+
+class LegacyJavaClass:
+    """
+    the layout of JavaClass before the edge array, kept for comparison
+    eleven sets of strings and an id built by concatenation
+    """
+
+    def __init__(
+        self, package_name: str, class_name: str, outter_class_name_list: List[str]
+    ) -> None:
+        self.id = package_name
+        for name in outter_class_name_list:
+            self.id += "." + name
+        self.id += "." + class_name
+        self.package_name = package_name
+        self.name = class_name
+        self.outter_class_name_list = outter_class_name_list
+        for set_name in RECORD_SET_NAMES:
+            setattr(self, set_name, set())
+
+
+def benchmark_class_memory(
+    class_count: int = 20000, edge_count: int = 12, seed: int = 0
+) -> Dict[str, float]:
+    """
+    measure the memory of classes with the old and the new layout
+    every class gets the same random edges in both layouts,
+    and every string is a new object, as decoded from a tree
+    return the bytes per class
+    """
+    package_count = max(1, class_count // 20)
+    rng = random.Random(seed)
+    spec_list = [
+        (
+            f"com.example.p{rng.randrange(package_count)}",
+            f"C{index}",
+            [
+                (rng.randrange(len(RECORD_SET_NAMES)), rng.randrange(class_count))
+                for _ in range(edge_count)
+            ],
+        )
+        for index in range(class_count)
+    ]
+    result: Dict[str, float] = {"class_count": class_count, "edge_count": edge_count}
+
+    for layout_name, layout_class in (("legacy", LegacyJavaClass), ("compact", JavaClass)):
+        tracemalloc.start()
+        class_list = []
+        for package_name, class_name, edge_list in spec_list:
+            java_class = layout_class(package_name, class_name, [])
+            for kind, target in edge_list:
+                set_name = RECORD_SET_NAMES[kind]
+                # ids for the id sets, simple names for the others
+                if set_name.endswith("_id_set"):
+                    value = f"com.example.p{target % package_count}.C{target}"
+                else:
+                    value = f"C{target}"
+                getattr(java_class, set_name).add(value)
+            class_list.append(java_class)
+        current_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result[f"{layout_name}_bytes_per_class"] = current_bytes / class_count
+        del class_list
+    return result
+
+
+def get_corpus(file_count: int, seed: int = 0) -> str:
+    """
+    get the directory of a synthetic corpus, generate it on first use
+    return the directory
+    """
+    root = os.path.join(CORPUS_DIR, f"files{file_count}_seed{seed}")
+    done_path = os.path.join(root, ".done")
+    if not os.path.exists(done_path):
+        shutil.rmtree(root, ignore_errors=True)
+        generate_corpus(root, file_count, seed=seed)
+        open(done_path, "w").close()
+    return root
+
+
+def benchmark_pipeline(
+    project_name: str, engine: str = "walker", render: bool = False
+) -> Dict[str, float | None]:
+    """
+    time every stage of the pipeline on the project, in this process
+    only the facts of the files are kept, the trees are dropped one by one
+    return the seconds of the stages, the sizes of the graph
+    and the peak resident memory of the run in bytes,
+    'render' is None if it is skipped or graphviz is missing
+    """
+    result: Dict[str, float | None] = {}
+    reset_peak_memory()
+
+    # the files are read one by one, and only the facts of a file are kept
+    load_time = 0.0
+    parse_time = 0.0
+    analyze_time = 0.0
+    java_file_facts_list: List[JavaFileFacts] = []
+    file_iterator = iter_java_files(project_name)
+    while True:
+        start_time = time.perf_counter()
+        path_name_content = next(file_iterator, None)
+        load_time += time.perf_counter() - start_time
+        if path_name_content is None:
+            break
+        _, name, content = path_name_content
+        start_time = time.perf_counter()
+        java_analyzer = JavaAnalyzer(name, content)
+        middle_time = time.perf_counter()
+        java_analyzer.analyze(engine)
+        end_time = time.perf_counter()
+        parse_time += middle_time - start_time
+        analyze_time += end_time - middle_time
+        java_analyzer.release()
+        java_file_facts_list.append(JavaFileFacts.from_analyzer(java_analyzer))
+    result["load"] = load_time
+    result["parse"] = parse_time
+    result["analyze"] = analyze_time
+
+    start_time = time.perf_counter()
+    SymbolIndex(java_file_facts_list).link()
+    result["link"] = time.perf_counter() - start_time
+
+    painter = Painter()
+    for java_file_facts in java_file_facts_list:
+        for java_class in java_file_facts.public_class_set:
+            painter.add_one(java_class)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dot_path = os.path.join(temp_dir, "result.dot")
+        start_time = time.perf_counter()
+        painter.generate_dot_code(dot_path)
+        result["dot"] = time.perf_counter() - start_time
+        result["dot_bytes"] = os.path.getsize(dot_path)
+
+        result["render"] = None
+        if render:
+            try:
+                renderer = Renderer(cache_dir=os.path.join(temp_dir, "cache"))
+            except Exception:
+                renderer = None
+            if renderer is not None:
+                start_time = time.perf_counter()
+                painter.render_graph(os.path.join(temp_dir, "result.svg"), 96, renderer)
+                result["render"] = time.perf_counter() - start_time
+
+    result["file_count"] = len(java_file_facts_list)
+    result["class_count"] = len(painter.java_class_set)
+    result["edge_count"] = sum(
+        sum(1 for _ in java_class.relation_edges())
+        for java_class in painter.java_class_set
+    )
+    result["peak_memory_bytes"] = get_peak_memory()["self"]
+    return result
+
+
+def get_commit() -> str | None:
+    """
+    get the commit the benchmark runs on, None outside a git repository
+    """
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=parser_service.BASE_DIR,
+        )
+    except OSError:
+        return None
+    if completed.returncode != 0:
+        return None
+    return completed.stdout.strip()
+
+
+def benchmark_scales(
+    scale_list: List[int] = SCALE_LIST,
+    engine: str = "walker",
+    render: bool = False,
+    seed: int = 0,
+) -> Dict:
+    """
+    benchmark the pipeline on synthetic corpora of several sizes
+    return the results with the commit and the machine they are measured on
+    """
+    return {
+        "commit": get_commit(),
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "engine": engine,
+        "seed": seed,
+        "results": [
+            {"scale": scale, **benchmark_pipeline(get_corpus(scale, seed), engine, render)}
+            for scale in scale_list
+        ],
+    }
+
+
+def compare_results(old_report: Dict, new_report: Dict) -> List[str]:
+    """
+    compare two reports of 'benchmark_scales' stage by stage
+    return lines of the seconds and the ratio of the new to the old
+    """
+    old_result_dict = {result["scale"]: result for result in old_report["results"]}
+    line_list = [f"{old_report['commit']} -> {new_report['commit']}"]
+    for new_result in new_report["results"]:
+        old_result = old_result_dict.get(new_result["scale"])
+        if old_result is None:
+            continue
+        for stage_name in STAGE_NAMES:
+            old_time = old_result.get(stage_name)
+            new_time = new_result.get(stage_name)
+            if old_time is None or new_time is None:
+                continue
+            ratio = new_time / old_time if old_time > 0 else float("inf")
+            line_list.append(
+                f"{new_result['scale']:>7} {stage_name:<8} "
+                f"{old_time:9.3f}s {new_time:9.3f}s {ratio:6.2f}x"
+            )
+        old_bytes = old_result.get("peak_memory_bytes")
+        new_bytes = new_result.get("peak_memory_bytes")
+        if old_bytes and new_bytes:
+            line_list.append(
+                f"{new_result['scale']:>7} {'memory':<8} "
+                f"{old_bytes / (1 << 20):8.1f}M {new_bytes / (1 << 20):8.1f}M "
+                f"{new_bytes / old_bytes:6.2f}x"
+            )
+    return line_list
+
+
+# test code
+if __name__ == "__main__":
+    import argparse
+    import json
+    import warnings
+
+    warnings.simplefilter("ignore", FutureWarning)
+    arg_parser = argparse.ArgumentParser(description="benchmark the analysis")
+    arg_parser.add_argument("project", nargs="?", default="course-02242-examples")
+    arg_parser.add_argument(
+        "--scales", help="benchmark the pipeline at these comma separated file counts"
+    )
+    arg_parser.add_argument("--engine", default="walker", choices=("walker", "query"))
+    arg_parser.add_argument("--render", action="store_true", help="time rendering")
+    arg_parser.add_argument("--output", help="write the results as json to the path")
+    arg_parser.add_argument("--compare", help="compare with the results at the path")
+    args = arg_parser.parse_args()
+
+    if args.scales is None:
+        for key, value in benchmark_parser_startup(args.project).items():
+            print(f"{key}: {value}")
+        for key, value in benchmark_class_memory().items():
+            print(f"{key}: {value}")
+    else:
+        scale_list = [int(scale) for scale in args.scales.split(",")]
+        report = benchmark_scales(scale_list, args.engine, args.render)
+        for result in report["results"]:
+            print(json.dumps(result))
+        if args.output is not None:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+        if args.compare is not None:
+            with open(args.compare) as f:
+                print("\n".join(compare_results(json.load(f), report)))
@@ -0,0 +1,463 @@
+"""
+warm analysis daemon
+the parsers, the facts and the linked graph of a project stay in memory,
+and requests are answered over a unix socket, or localhost tcp where
+unix sockets are missing, one json object per line:
+    {"id": 1, "method": "edges", "params": {"class": "dtu.deps.normal.Primes"}}
+    {"id": 1, "result": [...]} or {"id": 1, "error": "..."}
+the requests of all the connections are handled concurrently,
+and the files are parsed in a pool of worker processes
+a client only reaches the files of the project and the output directory,
+the paths it sends resolving anywhere else are refused
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Set, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import io
+import json
+import logging
+import multiprocessing
+import os
+import socket
+from GraphIndex import GraphIndex
+from JavaFileFacts import JavaFileFacts
+from Painter import Painter, get_format
+from ProjectState import ProjectState
+from Renderer import Renderer
+from StringTable import string_table
+from load_java_files import get_name, iter_java_file_paths, read_java_file
+from project_analyzer import BATCH_SIZE, analyze_file, init_worker
+import parser_service
+
+logger = logging.getLogger(__name__)
+
+# the socket the daemon listens on by default
+DEFAULT_SOCKET_PATH = os.path.join(parser_service.BASE_DIR, ".daemon.sock")
+# the localhost port the daemon listens on where unix sockets are missing
+DEFAULT_PORT = 7341
+# the longest request line read
+MAX_LINE_BYTES = 16 << 20
+# the directory the pictures are written to by default
+DEFAULT_OUTPUT_DIR = os.path.join(parser_service.BASE_DIR, ".daemon_output")
+
+
+def resolve_inside(root_dir: str, path: str) -> str:
+    """
+    join a path sent by a client to the directory, refuse it if it resolves
+    outside of the directory, e.g. through '..', as an absolute path or a link
+    return the absolute path
+    """
+    joined_path = os.path.abspath(os.path.join(root_dir, path))
+    real_root_dir = os.path.realpath(root_dir)
+    real_path = os.path.realpath(joined_path)
+    if os.path.commonpath([real_root_dir, real_path]) != real_root_dir:
+        raise Exception("path outside of the directory!", path, root_dir)
+    return joined_path
+
+
+def analyze_paths(path_list: List[str], engine: str = "walker") -> List[tuple | None]:
+    """
+    read and analyze the files in a worker, a failed file keeps its partial facts
+    return the records of their facts in the same order, None for a file that
+    is gone, the records are plain strings so the names are only put into
+    the string table of the daemon by the thread of the event loop
+    """
+    if multiprocessing.parent_process() is not None:
+        # the facts of the last batch are sent, no class is left in the worker
+        string_table.clear()
+    record_list: List[tuple | None] = []
+    for path in path_list:
+        try:
+            content = read_java_file(path)
+        except FileNotFoundError:
+            record_list.append(None)
+            continue
+        java_file_facts, analysis_error = analyze_file(
+            (path, get_name(path), content), engine
+        )
+        if analysis_error is not None:
+            logger.warning("partial facts for %s", analysis_error)
+        record_list.append(java_file_facts.to_record())
+    return record_list
+
+
+class AnalysisDaemon:
+    """
+    the daemon of one project
+    the state is only changed in the thread of the event loop,
+    between two awaits, so a request never sees a half updated graph
+    """
+
+    def __init__(
+        self,
+        project_name: str,
+        workers: int | None = None,
+        engine: str = "walker",
+        renderer: Renderer | None = None,
+        output_dir: str = DEFAULT_OUTPUT_DIR,
+    ) -> None:
+        """
+        :param project_name: the directory of the project
+        :param workers: the number of worker processes, by default one per core
+        :param engine: the engine extracting the facts, "walker" or "query"
+        :param renderer: the renderer of the pictures, a default one if None
+        :param output_dir: the directory 'render' writes to, the output paths
+            of the requests are relative to it
+        """
+        self.project_name = os.path.abspath(project_name)
+        self.output_dir = os.path.abspath(output_dir)
+        self.engine = engine
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=init_worker
+        )
+        self.renderer = renderer
+        self.state = ProjectState()  # the linked facts of the project
+        self.graph_index: GraphIndex | None = None  # built on demand, None if stale
+        self.generation = 0  # the number of analyses started
+        self.pending_count = 0  # the analyses waiting for the workers
+        self.path_generation_dict: Dict[
+            str, int
+        ] = {}  # the path maps to the analysis its facts come from
+        self.server: asyncio.AbstractServer | None = None
+        self.method_dict: Dict[str, Callable[[Dict], Any]] = {
+            "status": self.status,
+            "analyze": self.analyze,
+            "edges": self.edges,
+            "neighborhood": self.neighborhood,
+            "render": self.render,
+            "shutdown": self.shutdown,
+        }
+
+    async def analyze_batches(
+        self, path_list: List[str]
+    ) -> List[Tuple[str, JavaFileFacts | None]]:
+        """
+        analyze the files in the worker pool, a batch per task
+        return the paths and their facts, None for the files that are gone
+        """
+        loop = asyncio.get_running_loop()
+        batch_list = [
+            path_list[start : start + BATCH_SIZE]
+            for start in range(0, len(path_list), BATCH_SIZE)
+        ]
+        self.pending_count += 1
+        try:
+            record_list_list = await asyncio.gather(
+                *(
+                    loop.run_in_executor(
+                        self.executor, analyze_paths, batch, self.engine
+                    )
+                    for batch in batch_list
+                )
+            )
+        finally:
+            self.pending_count -= 1
+        # the results are unpickled in a thread of the pool, the string table
+        # isn't locked, so the facts are rebuilt here
+        return [
+            (path, None if record is None else JavaFileFacts.from_record(record))
+            for batch, record_list in zip(batch_list, record_list_list)
+            for path, record in zip(batch, record_list)
+        ]
+
+    async def load(self) -> None:
+        """
+        analyze the whole project and link it
+        """
+        path_list = [
+            os.path.abspath(path) for path in iter_java_file_paths(self.project_name)
+        ]
+        path_facts_list = await self.analyze_batches(path_list)
+        self.state = ProjectState()
+        self.state.add_files(
+            (path, java_file_facts)
+            for path, java_file_facts in path_facts_list
+            if java_file_facts is not None
+        )
+        self.graph_index = None
+        self.compact_strings()
+
+    def compact_strings(self) -> None:
+        """
+        drop the names of the replaced classes from the string table,
+        only when no analysis is pending, so every class is in the state
+        """
+        if self.pending_count == 0:
+            self.state.compact_strings()
+
+    def get_graph_index(self) -> GraphIndex:
+        """
+        get the index of the linked graph, build it again after a change
+        """
+        if self.graph_index is None:
+            self.graph_index = GraphIndex(self.state.java_classes())
+        return self.graph_index
+
+    async def status(self, params: Dict) -> Dict:
+        """
+        get the size of the project in memory
+        """
+        return {
+            "project": self.project_name,
+            "file_count": len(self.state.file_index_dict),
+            "class_count": sum(1 for _ in self.state.java_classes()),
+        }
+
+    async def analyze(self, params: Dict) -> Dict:
+        """
+        analyze the files again after they changed, were added or removed
+        params: 'paths', the paths of the files, relative to the project
+        return the paths of the files linked again
+        """
+        path_list = [
+            resolve_inside(self.project_name, path) for path in params["paths"]
+        ]
+        self.generation += 1
+        generation = self.generation
+        path_facts_list = await self.analyze_batches(path_list)
+
+        relinked_path_set: Set[str] = set()
+        for path, java_file_facts in path_facts_list:
+            # a later analysis of the file may have finished first
+            if self.path_generation_dict.get(path, 0) > generation:
+                continue
+            self.path_generation_dict[path] = generation
+            if java_file_facts is not None:
+                relinked_path_set |= self.state.update_file(path, java_file_facts)
+            elif path in self.state.file_index_dict:
+                relinked_path_set |= self.state.remove_file(path)
+        if relinked_path_set:
+            self.graph_index = None
+        self.compact_strings()
+        return {"relinked": sorted(relinked_path_set)}
+
+    async def edges(self, params: Dict) -> List[Dict]:
+        """
+        get the edges of a class
+        params: 'class', the id of the class,
+            'direction', 'forward' for what it uses, 'reverse' for what uses it
+        """
+        graph_index = self.get_graph_index()
+        number = graph_index.number_dict.get(params["class"])
+        if number is None:
+            raise Exception("unknown class!", params["class"])
+        direction = params.get("direction", "forward")
+        match direction:
+            case "forward":
+                edge_list = graph_index.forward_list[number]
+                key_name = "target"
+            case "reverse":
+                edge_list = graph_index.reverse_list[number]
+                key_name = "source"
+            case _:
+                raise Exception("unknown direction!", direction)
+        return [
+            {key_name: graph_index.id_list[neighbor], "label": label}
+            for neighbor, label in edge_list
+        ]
+
+    async def neighborhood(self, params: Dict) -> Dict[str, int]:
+        """
+        get the classes near a class and their distances
+        params: 'class', 'hops' and 'direction' of 'GraphIndex.neighborhood'
+        """
+        return self.get_graph_index().neighborhood(
+            params["class"],
+            params.get("hops", 1),
+            params.get("direction", "forward"),
+        )
+
+    async def render(self, params: Dict) -> Dict:
+        """
+        draw the neighborhood of a class
+        params: 'class', 'hops' and 'direction' of the neighborhood,
+            'output', the path of the picture or of the '.dot' file,
+            relative to the output directory
+        return the path written
+        """
+        output_path = resolve_inside(self.output_dir, params["output"])
+        graph_index = self.get_graph_index()
+        painter = Painter()
+        painter.add_subgraph(
+            graph_index,
+            graph_index.neighborhood(
+                params["class"],
+                params.get("hops", 1),
+                params.get("direction", "forward"),
+            ),
+        )
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        if get_format(output_path) == "dot":
+            painter.generate_dot_code(output_path)
+            return {"output": output_path}
+        # the code is written now, graphviz runs in a thread
+        code_buffer = io.StringIO()
+        painter.write_dot(code_buffer)
+        if self.renderer is None:
+            self.renderer = Renderer()
+        picture_path = await asyncio.to_thread(
+            self.renderer.render,
+            code_buffer.getvalue(),
+            output_path,
+            get_format(output_path),
+            params.get("dpi", 96),
+        )
+        return {"output": picture_path}
+
+    async def shutdown(self, params: Dict) -> None:
+        """
+        stop the daemon after the answer is sent
+        """
+        asyncio.get_running_loop().call_soon(self.server.close)
+
+    async def handle_request(self, line: bytes) -> Dict:
+        """
+        answer one request line
+        """
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            method = self.method_dict.get(request.get("method"))
+            if method is None:
+                raise Exception("unknown method!", request.get("method"))
+            result = await method(request.get("params", {}))
+        except Exception as exception:
+            return {"id": request_id, "error": repr(exception)}
+        return {"id": request_id, "result": result}
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        answer the requests of a connection, each one as soon as it is done,
+        so a slow analysis doesn't hold the queries behind it
+        """
+        write_lock = asyncio.Lock()
+        task_set: Set[asyncio.Task] = set()
+
+        async def answer(line: bytes) -> None:
+            response = await self.handle_request(line)
+            async with write_lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(answer(line))
+                task_set.add(task)
+                task.add_done_callback(task_set.discard)
+            if task_set:
+                await asyncio.gather(*task_set)
+        except ConnectionError:
+            pass
+        except asyncio.CancelledError:
+            # the daemon shuts down, the answers not sent yet are dropped
+            for task in task_set:
+                task.cancel()
+        finally:
+            writer.close()
+
+    async def serve(
+        self, socket_path: str | None = DEFAULT_SOCKET_PATH, port: int = DEFAULT_PORT
+    ) -> None:
+        """
+        load the project and answer requests until shut down
+
+        :param socket_path: the unix socket to listen on,
+            None to listen on the localhost port
+        :param port: the localhost port, used where unix sockets are missing
+        """
+        await self.load()
+        if socket_path is not None and hasattr(socket, "AF_UNIX"):
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            self.server = await asyncio.start_unix_server(
+                self.handle_connection, socket_path, limit=MAX_LINE_BYTES
+            )
+        else:
+            socket_path = None
+            self.server = await asyncio.start_server(
+                self.handle_connection, "127.0.0.1", port, limit=MAX_LINE_BYTES
+            )
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.executor.shutdown()
+            if socket_path is not None and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+def send_request(
+    method: str,
+    params: Dict | None = None,
+    socket_path: str | None = DEFAULT_SOCKET_PATH,
+    port: int = DEFAULT_PORT,
+) -> Any:
+    """
+    send one request to a running daemon and wait for the answer
+    return the result, raise the error of the daemon
+    """
+    if socket_path is not None and hasattr(socket, "AF_UNIX"):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(socket_path)
+    else:
+        client = socket.create_connection(("127.0.0.1", port))
+    with client, client.makefile("rwb") as f:
+        f.write(
+            json.dumps({"id": 0, "method": method, "params": params or {}}).encode()
+            + b"\n"
+        )
+        f.flush()
+        response = json.loads(f.readline())
+    if "error" in response:
+        raise Exception("daemon failed!", response["error"])
+    return response["result"]
+
+
+# test code
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="the warm analysis daemon")
+    arg_parser.add_argument("project", nargs="?", default="example-project")
+    arg_parser.add_argument("--workers", type=int, default=None)
+    arg_parser.add_argument("--engine", default="walker", choices=("walker", "query"))
+    arg_parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH)
+    arg_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    arg_parser.add_argument(
+        "--output-dir",
+        default=DEFAULT_OUTPUT_DIR,
+        help="the directory the pictures are written to",
+    )
+    arg_parser.add_argument(
+        "--tcp", action="store_true", help="listen on localhost instead of a socket"
+    )
+    arg_parser.add_argument(
+        "--request",
+        nargs=2,
+        metavar=("METHOD", "PARAMS"),
+        help="send a request with json params to a running daemon, print the answer",
+    )
+    args = arg_parser.parse_args()
+
+    socket_path = None if args.tcp else args.socket
+    if args.request is not None:
+        method, params = args.request
+        print(
+            json.dumps(
+                send_request(method, json.loads(params), socket_path, args.port),
+                indent=2,
+            )
+        )
+    else:
+        daemon = AnalysisDaemon(
+            args.project, args.workers, args.engine, output_dir=args.output_dir
+        )
+        asyncio.run(daemon.serve(socket_path, args.port))
@@ -0,0 +1,363 @@
+"""
+the change of the dependency graph between two git revisions
+the java files are read from the object store of git, nothing is checked out,
+the facts of a blob are cached by its object id, and only the files changed
+between the revisions and the files using their classes are linked,
+so the linking grows with the change, not with the repository
+"""
+from __future__ import annotations
+from typing import Dict, Iterator, List, Set, TextIO, Tuple
+import subprocess
+from AnalysisCache import AnalysisCache
+from JavaClass import RELATION_LABEL_DICT
+from JavaFileFacts import JavaFileFacts
+from ProjectState import ProjectState
+from load_java_files import get_name, to_utf8
+from project_analyzer import analyze_files
+
+# the object id git prints for a missing side of a change
+NULL_OBJECT_ID = "0" * 40
+
+# an edge: the id of the source class, the id of the target and the label
+Edge = Tuple[str, str, str]
+
+
+def run_git(repository: str, *argument_list: str) -> bytes:
+    """
+    run a git command in the repository
+    return its output
+    """
+    completed = subprocess.run(
+        ["git", "-C", repository, *argument_list],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    if completed.returncode != 0:
+        raise Exception("git failed!", completed.stderr.decode("utf-8", "replace"))
+    return completed.stdout
+
+
+def list_java_blobs(repository: str, revision: str) -> Dict[str, str]:
+    """
+    list the java files of the revision
+    return the paths mapping to the object ids of their blobs, sorted by path
+    """
+    blob_dict: Dict[str, str] = {}
+    output = run_git(repository, "ls-tree", "-r", "-z", "--full-tree", revision)
+    for entry in output.split(b"\0"):
+        if not entry:
+            continue
+        info, _, path = entry.decode("utf-8", "surrogateescape").partition("\t")
+        _, object_type, object_id = info.split()
+        if object_type == "blob" and path.endswith(".java"):
+            blob_dict[path] = object_id
+    return blob_dict
+
+
+def diff_java_blobs(
+    repository: str, old_revision: str, new_revision: str
+) -> List[Tuple[str, str | None, str | None]]:
+    """
+    list the java files changed between the revisions, a rename is
+    a removal and an addition
+    return the paths and the object ids before and after, None if missing
+    """
+    change_list: List[Tuple[str, str | None, str | None]] = []
+    output = run_git(
+        repository, "diff-tree", "-r", "-z", "--no-renames", old_revision, new_revision
+    )
+    field_list = output.split(b"\0")
+    # every change is ':mode mode id id status' and then the path
+    for info, path in zip(field_list[0::2], field_list[1::2]):
+        path = path.decode("utf-8", "surrogateescape")
+        if not path.endswith(".java"):
+            continue
+        _, _, old_object_id, new_object_id, _ = info.decode().split()
+        change_list.append(
+            (
+                path,
+                None if old_object_id == NULL_OBJECT_ID else old_object_id,
+                None if new_object_id == NULL_OBJECT_ID else new_object_id,
+            )
+        )
+    return change_list
+
+
+class BlobReader:
+    """
+    read blobs through one long running 'git cat-file --batch'
+    """
+
+    def __init__(self, repository: str) -> None:
+        self.process = subprocess.Popen(
+            ["git", "-C", repository, "cat-file", "--batch"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+    def read(self, object_id: str) -> bytes:
+        """
+        read the content of the blob
+        """
+        self.process.stdin.write(object_id.encode() + b"\n")
+        self.process.stdin.flush()
+        header = self.process.stdout.readline().split()
+        if len(header) != 3:
+            raise Exception("git object not found!", object_id)
+        content = self.process.stdout.read(int(header[2]))
+        self.process.stdout.read(1)  # the newline after the content
+        return content
+
+    def close(self) -> None:
+        """
+        stop the git process
+        """
+        self.process.stdin.close()
+        self.process.wait()
+
+    def __enter__(self) -> BlobReader:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def get_blob_facts(
+    blob_reader: BlobReader,
+    path_blob_list: List[Tuple[str, str]],
+    cache: AnalysisCache | None = None,
+    workers: int | None = 1,
+    engine: str = "walker",
+) -> List[JavaFileFacts]:
+    """
+    get the facts of the blobs, from the cache when it has them,
+    the others are read from git and analyzed
+    a blob is cached under its object id and its file name, so a blob
+    seen in any revision is never read again
+
+    :param path_blob_list: the paths and object ids of the files
+    return the facts in the same order, not linked yet
+    """
+    java_file_facts_list: List[JavaFileFacts | None] = []
+    missing_list: List[Tuple[int, str, str]] = []  # index, path, object id
+    for path, object_id in path_blob_list:
+        java_file_facts = None
+        if cache is not None:
+            java_file_facts = cache.get_entry(
+                f"git:{object_id}:{get_name(path)}", cache.end_key(object_id, engine)
+            )
+        java_file_facts_list.append(java_file_facts)
+        if java_file_facts is None:
+            missing_list.append((len(java_file_facts_list) - 1, path, object_id))
+
+    def iter_missing_files() -> Iterator[Tuple[str, str, bytes]]:
+        for _, path, object_id in missing_list:
+            yield path, get_name(path), to_utf8(blob_reader.read(object_id))
+
+    analyzed_facts_list = analyze_files(iter_missing_files(), workers, None, engine)
+    for (index, path, object_id), java_file_facts in zip(
+        missing_list, analyzed_facts_list
+    ):
+        java_file_facts_list[index] = java_file_facts
+        if cache is not None:
+            cache.put_entry(
+                f"git:{object_id}:{get_name(path)}",
+                cache.end_key(object_id, engine),
+                java_file_facts,
+            )
+    return java_file_facts_list
+
+
+def get_edges(java_file_facts: JavaFileFacts) -> Set[Edge]:
+    """
+    get the edges of the classes of a linked file, one for every relation
+    """
+    edge_set: Set[Edge] = set()
+    for java_class in java_file_facts.public_class_set:
+        for set_name, label in RELATION_LABEL_DICT.items():
+            for java_class_id in getattr(java_class, set_name):
+                edge_set.add((java_class.id, java_class_id, label))
+    return edge_set
+
+
+class RevisionDiff:
+    """
+    the change of the dependency graph between two revisions
+    """
+
+    def __init__(
+        self,
+        changed_path_list: List[str],
+        relinked_path_list: List[str],
+        added_edge_set: Set[Edge],
+        removed_edge_set: Set[Edge],
+        state: ProjectState,
+    ) -> None:
+        self.changed_path_list = changed_path_list  # the changed java files
+        self.relinked_path_list = (
+            relinked_path_list  # the unchanged files linked again for them
+        )
+        self.added_edge_set = added_edge_set  # the edges only in the new revision
+        self.removed_edge_set = removed_edge_set  # the edges only in the old one
+        self.state = state  # the linked facts of the new revision
+
+    def report(self) -> Dict:
+        """
+        get the diff as a dict of plain values
+        """
+        return {
+            "changed_files": self.changed_path_list,
+            "relinked_files": self.relinked_path_list,
+            "added_edges": [list(edge) for edge in sorted(self.added_edge_set)],
+            "removed_edges": [list(edge) for edge in sorted(self.removed_edge_set)],
+        }
+
+    def write_dot(self, output: str | TextIO) -> None:
+        """
+        write the dot code of the classes of the changed and relinked files,
+        the added edges in green and the removed ones in red
+        """
+        from Painter import Painter
+
+        painter = Painter()
+        for path in self.changed_path_list + self.relinked_path_list:
+            if path in self.state.file_index_dict:
+                for java_class in self.state.get_facts(path).public_class_set:
+                    painter.add_one(java_class)
+        painter.write_diff_dot(self.added_edge_set, self.removed_edge_set, output)
+
+
+def diff_revisions(
+    repository: str,
+    old_revision: str,
+    new_revision: str,
+    cache: AnalysisCache | None = None,
+    workers: int | None = 1,
+    engine: str = "walker",
+    state: ProjectState | None = None,
+) -> RevisionDiff:
+    """
+    find how the dependency graph changed between two revisions
+    the old revision is loaded from the cached facts without linking it,
+    only the changed files and the files that use their classes are linked,
+    once before the change and once after, and their edges are compared
+
+    :param repository: a directory inside the git repository
+    :param old_revision: the revision before, e.g. 'main'
+    :param new_revision: the revision after, e.g. 'HEAD'
+    :param cache: the cache of the facts, None to analyze every file
+    :param workers: the number of worker processes for the files not cached
+    :param engine: the engine extracting the facts, "walker" or "query"
+    :param state: the state of the old revision, e.g. the state of the last diff,
+        it is updated to the new revision, None to load it from git
+    """
+    change_list = diff_java_blobs(repository, old_revision, new_revision)
+
+    with BlobReader(repository) as blob_reader:
+        if state is None:
+            old_blob_dict = list_java_blobs(repository, old_revision)
+            state = ProjectState()
+            state.add_files(
+                zip(
+                    old_blob_dict,
+                    get_blob_facts(
+                        blob_reader, list(old_blob_dict.items()), cache, workers, engine
+                    ),
+                ),
+                link=False,
+            )
+        new_path_blob_list = [
+            (path, new_object_id)
+            for path, _, new_object_id in change_list
+            if new_object_id is not None
+        ]
+        new_facts_list = get_blob_facts(
+            blob_reader, new_path_blob_list, cache, workers, engine
+        )
+
+    path_facts_list: List[Tuple[str, JavaFileFacts | None]] = []
+    new_facts_iterator = iter(new_facts_list)
+    for path, _, new_object_id in change_list:
+        path_facts_list.append(
+            (path, None if new_object_id is None else next(new_facts_iterator))
+        )
+
+    # only the files the change can affect are linked in the old revision
+    affected_path_set: Set[str] = set()
+    for path, java_file_facts in path_facts_list:
+        affected_path_set.update(state.affected_paths(path, java_file_facts))
+    old_edge_dict: Dict[str, Set[Edge]] = {
+        path: get_edges(state.get_facts(path))
+        for path in affected_path_set
+        if path in state.file_index_dict
+    }
+
+    for path, java_file_facts in path_facts_list:
+        if java_file_facts is not None:
+            affected_path_set.update(state.update_file(path, java_file_facts))
+        elif path in state.file_index_dict:
+            affected_path_set.update(state.remove_file(path))
+
+    added_edge_set: Set[Edge] = set()
+    removed_edge_set: Set[Edge] = set()
+    for path in affected_path_set:
+        old_edge_set = old_edge_dict.get(path, set())
+        new_edge_set: Set[Edge] = set()
+        if path in state.file_index_dict:
+            new_edge_set = get_edges(state.get_facts(path))
+        added_edge_set |= new_edge_set - old_edge_set
+        removed_edge_set |= old_edge_set - new_edge_set
+    # an edge moved between two files is not a change
+    moved_edge_set = added_edge_set & removed_edge_set
+    added_edge_set -= moved_edge_set
+    removed_edge_set -= moved_edge_set
+
+    changed_path_set = {path for path, _, _ in change_list}
+    return RevisionDiff(
+        sorted(changed_path_set),
+        sorted(affected_path_set - changed_path_set),
+        added_edge_set,
+        removed_edge_set,
+        state,
+    )
+
+
+# test code
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    arg_parser = argparse.ArgumentParser(
+        description="diff the dependency graph of two git revisions"
+    )
+    arg_parser.add_argument("old_revision")
+    arg_parser.add_argument("new_revision", nargs="?", default="HEAD")
+    arg_parser.add_argument("--repository", default=".")
+    arg_parser.add_argument("--workers", type=int, default=1)
+    arg_parser.add_argument("--engine", default="walker", choices=("walker", "query"))
+    arg_parser.add_argument("--json", help="write the diff as json to the path")
+    arg_parser.add_argument("--dot", help="write the diff as dot code to the path")
+    args = arg_parser.parse_args()
+
+    with AnalysisCache() as cache:
+        revision_diff = diff_revisions(
+            args.repository,
+            args.old_revision,
+            args.new_revision,
+            cache,
+            args.workers,
+            args.engine,
+        )
+    print(
+        f"{len(revision_diff.changed_path_list)} files changed, "
+        f"{len(revision_diff.relinked_path_list)} linked again"
+    )
+    for edge in sorted(revision_diff.added_edge_set):
+        print("+ %s -> %s (%s)" % edge)
+    for edge in sorted(revision_diff.removed_edge_set):
+        print("- %s -> %s (%s)" % edge)
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump(revision_diff.report(), f, indent=2)
+    if args.dot is not None:
+        revision_diff.write_dot(args.dot)
@@ -0,0 +1,285 @@
+"""
+export of the resolved class graph for other tools
+the graph is written as json lines, graphml or csr arrays in a '.npz',
+class by class and edge by edge, without building the graph in memory
+"""
+from __future__ import annotations
+from typing import Collection, Dict, Iterator, List, TextIO, Tuple
+from array import array
+from xml.sax.saxutils import escape
+import json
+import os
+import zipfile
+from JavaClass import JavaClass, RELATION_LABEL_DICT
+from jdk_symbols import is_jdk_id
+
+# the size of the write buffer of the text formats
+EXPORT_BUFFER_SIZE = 1 << 20
+# the labels of the edges, the relation of an edge in the csr arrays is its index
+LABEL_LIST: List[str] = list(RELATION_LABEL_DICT.values())
+# the extension of a path maps to its format
+FORMAT_DICT = {".jsonl": "jsonl", ".graphml": "graphml", ".npz": "csr"}
+
+
+def iter_edges(java_class: JavaClass, hide_jdk: bool) -> Iterator[Tuple[str, str]]:
+    """
+    iterate the ids and labels of the edges of the class that are exported
+    """
+    if not hide_jdk:
+        return java_class.relation_edges()
+    return (
+        (java_class_id, label)
+        for java_class_id, label in java_class.relation_edges()
+        if not is_jdk_id(java_class_id)
+    )
+
+
+def number_nodes(
+    java_classes: Collection[JavaClass], hide_jdk: bool = False
+) -> Tuple[Dict[str, int], int]:
+    """
+    number the nodes of the graph, the analyzed classes first, in their order,
+    then the classes they use that were not analyzed
+    the classes of the same id, e.g. from two files, are one node
+    return the ids mapping to the numbers and the number of analyzed classes
+    """
+    number_dict: Dict[str, int] = {}
+    for java_class in java_classes:
+        number_dict.setdefault(java_class.id, len(number_dict))
+    analyzed_count = len(number_dict)
+    for java_class in java_classes:
+        for java_class_id, _ in iter_edges(java_class, hide_jdk):
+            if java_class_id not in number_dict:
+                number_dict[java_class_id] = len(number_dict)
+    return number_dict, analyzed_count
+
+
+def write_jsonl(
+    java_classes: Collection[JavaClass], output: str | TextIO, hide_jdk: bool = False
+) -> None:
+    """
+    write the graph as json lines, the nodes first, then the edges
+    {"kind": "node", "id": 0, "name": "dtu.deps.normal.Primes", "analyzed": true}
+    {"kind": "edge", "source": 0, "target": 1, "label": "dependency"}
+
+    :param output: the path or the file object the lines are written to
+    :param hide_jdk: leave out the edges to the types of the jdk
+    """
+    if isinstance(output, str):
+        with open(output, "w", encoding="utf-8", buffering=EXPORT_BUFFER_SIZE) as f:
+            write_jsonl(java_classes, f, hide_jdk)
+        return
+    write = output.write
+    number_dict, analyzed_count = number_nodes(java_classes, hide_jdk)
+    for java_class_id, number in number_dict.items():
+        write(
+            '{"kind": "node", "id": %d, "name": %s, "analyzed": %s}\n'
+            % (number, json.dumps(java_class_id), json.dumps(number < analyzed_count))
+        )
+    for java_class in java_classes:
+        source = f'{{"kind": "edge", "source": {number_dict[java_class.id]}, "target": '
+        for java_class_id, label in iter_edges(java_class, hide_jdk):
+            write(f'{source}{number_dict[java_class_id]}, "label": "{label}"}}\n')
+
+
+def write_graphml(
+    java_classes: Collection[JavaClass], output: str | TextIO, hide_jdk: bool = False
+) -> None:
+    """
+    write the graph as graphml, every node has its id as 'name'
+    and every edge its relation as 'label'
+
+    :param output: the path or the file object the xml is written to
+    :param hide_jdk: leave out the edges to the types of the jdk
+    """
+    if isinstance(output, str):
+        with open(output, "w", encoding="utf-8", buffering=EXPORT_BUFFER_SIZE) as f:
+            write_graphml(java_classes, f, hide_jdk)
+        return
+    write = output.write
+    number_dict, analyzed_count = number_nodes(java_classes, hide_jdk)
+    write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+    write('<key id="name" for="node" attr.name="name" attr.type="string"/>\n')
+    write('<key id="analyzed" for="node" attr.name="analyzed" attr.type="boolean"/>\n')
+    write('<key id="label" for="edge" attr.name="label" attr.type="string"/>\n')
+    write('<graph id="SourceGra" edgedefault="directed">\n')
+    for java_class_id, number in number_dict.items():
+        analyzed = "true" if number < analyzed_count else "false"
+        write(
+            f'<node id="n{number}"><data key="name">{escape(java_class_id)}</data>'
+            f'<data key="analyzed">{analyzed}</data></node>\n'
+        )
+    for java_class in java_classes:
+        source = f'<edge source="n{number_dict[java_class.id]}" target="n'
+        for java_class_id, label in iter_edges(java_class, hide_jdk):
+            write(
+                f'{source}{number_dict[java_class_id]}">'
+                f'<data key="label">{label}</data></edge>\n'
+            )
+    write("</graph>\n</graphml>\n")
+
+
+def import_numpy():
+    """
+    import numpy, only the csr format needs it
+    """
+    try:
+        import numpy
+    except ImportError:
+        raise Exception(
+            "the csr export needs numpy, install it with 'pip install numpy'!"
+        ) from None
+    return numpy
+
+
+def write_csr(
+    java_classes: Collection[JavaClass], output_path: str, hide_jdk: bool = False
+) -> None:
+    """
+    write the graph as csr adjacency arrays into an uncompressed '.npz'
+    'indptr' (int64): the edges of the node i are at indptr[i]:indptr[i + 1]
+    'indices' (int32): the target of every edge
+    'relations' (uint8): the relation of every edge, an index of 'labels'
+    'labels': the labels of the relations
+    'id_data' (uint8) and 'id_offsets' (int64): the utf-8 ids of the nodes,
+        the id of the node i is id_data[id_offsets[i]:id_offsets[i + 1]]
+    'analyzed_count': the nodes below it are analyzed classes
+    the edges are gathered in compact arrays, never as python objects
+
+    :param output_path: the path of the '.npz', loaded back by 'load_csr'
+    :param hide_jdk: leave out the edges to the types of the jdk
+    """
+    numpy = import_numpy()
+    label_index_dict = {label: index for index, label in enumerate(LABEL_LIST)}
+    number_dict, analyzed_count = number_nodes(java_classes, hide_jdk)
+
+    # a row per node, the edges of the classes of the same id are merged
+    class_list_list: List[List[JavaClass]] = [[] for _ in range(analyzed_count)]
+    for java_class in java_classes:
+        class_list_list[number_dict[java_class.id]].append(java_class)
+    indptr = array("q", [0])
+    indices = array("i")
+    relations = array("B")
+    for class_list in class_list_list:
+        for java_class in class_list:
+            for java_class_id, label in iter_edges(java_class, hide_jdk):
+                indices.append(number_dict[java_class_id])
+                relations.append(label_index_dict[label])
+        indptr.append(len(indices))
+    # the classes only used have no edges
+    indptr.extend([len(indices)] * (len(number_dict) - analyzed_count))
+
+    id_data = bytearray()
+    id_offsets = array("q", [0])
+    for java_class_id in number_dict:
+        id_data += java_class_id.encode("utf-8")
+        id_offsets.append(len(id_data))
+
+    numpy.savez(
+        output_path,
+        indptr=numpy.frombuffer(indptr, dtype=numpy.int64),
+        indices=numpy.frombuffer(indices, dtype=numpy.int32),
+        relations=numpy.frombuffer(relations, dtype=numpy.uint8),
+        labels=numpy.array(LABEL_LIST),
+        id_data=numpy.frombuffer(bytes(id_data), dtype=numpy.uint8),
+        id_offsets=numpy.frombuffer(id_offsets, dtype=numpy.int64),
+        analyzed_count=numpy.array(analyzed_count, dtype=numpy.int64),
+    )
+
+
+def load_csr(input_path: str, mmap: bool = True) -> Dict[str, object]:
+    """
+    load the arrays written by 'write_csr'
+    the members of the '.npz' are stored without compression,
+    so they are memory-mapped where they lie and nothing is read up front
+
+    :param mmap: map the arrays, False to read them into memory
+    """
+    numpy = import_numpy()
+    if not mmap:
+        with numpy.load(input_path) as npz_file:
+            return {name: npz_file[name] for name in npz_file.files}
+
+    array_dict: Dict[str, object] = {}
+    with (
+        zipfile.ZipFile(input_path) as zip_file,
+        open(input_path, "rb") as f,
+        numpy.load(input_path) as npz_file,
+    ):
+        for info in zip_file.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise Exception("compressed member, load it with mmap False!", info)
+            # the data follows the local header, its name and its extra field
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = numpy.frombuffer(f.read(4), dtype="<u2")
+            f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+            if numpy.lib.format.read_magic(f) == (1, 0):
+                header = numpy.lib.format.read_array_header_1_0(f)
+            else:
+                header = numpy.lib.format.read_array_header_2_0(f)
+            shape, fortran_order, dtype = header
+            name = os.path.splitext(info.filename)[0]
+            # the empty arrays and the scalars can't be mapped, they are tiny
+            if dtype.hasobject or not shape or 0 in shape:
+                array_dict[name] = npz_file[name]
+                continue
+            array_dict[name] = numpy.memmap(
+                input_path,
+                dtype=dtype,
+                mode="r",
+                offset=f.tell(),
+                shape=shape,
+                order="F" if fortran_order else "C",
+            )
+    return array_dict
+
+
+def get_csr_id(array_dict: Dict[str, object], number: int) -> str:
+    """
+    get the id of the node of the number from the arrays of 'load_csr'
+    """
+    id_offsets = array_dict["id_offsets"]
+    start, end = int(id_offsets[number]), int(id_offsets[number + 1])
+    return bytes(array_dict["id_data"][start:end]).decode("utf-8")
+
+
+def export_graph(
+    java_classes: Collection[JavaClass], output_path: str, hide_jdk: bool = False
+) -> None:
+    """
+    export the graph, the format is taken from the extension of the path,
+    '.jsonl', '.graphml' or '.npz'
+
+    :param hide_jdk: leave out the edges to the types of the jdk
+    """
+    extension = os.path.splitext(output_path)[1].lower()
+    match FORMAT_DICT.get(extension):
+        case "jsonl":
+            write_jsonl(java_classes, output_path, hide_jdk)
+        case "graphml":
+            write_graphml(java_classes, output_path, hide_jdk)
+        case "csr":
+            write_csr(java_classes, output_path, hide_jdk)
+        case _:
+            raise Exception("unknown export format!", output_path)
+
+
+# test code
+if __name__ == "__main__":
+    import sys
+    from project_analyzer import analyze_project, link_project
+
+    project = sys.argv[1] if len(sys.argv) > 1 else "example-project"
+    output_path = sys.argv[2] if len(sys.argv) > 2 else "result.jsonl"
+    java_file_facts_list = analyze_project(project)
+    link_project(java_file_facts_list)
+    export_graph(
+        [
+            java_class
+            for java_file_facts in java_file_facts_list
+            for java_class in java_file_facts.public_class_set
+        ],
+        output_path,
+    )
+    print("graph exported to", output_path)
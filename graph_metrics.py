@@ -0,0 +1,276 @@
+"""
+metrics of the resolved class graph
+dependency cycles, fan-in and fan-out, coupling of the packages
+and depth of inheritance, every one linear in the nodes and edges
+of the numbered graph of a GraphIndex
+"""
+from __future__ import annotations
+from typing import Dict, List, Set, Tuple
+import json
+from GraphIndex import GraphIndex
+
+# the label of the inheritance edges
+INHERITANCE_LABEL = "inheritance"
+
+
+def get_package_names(graph_index: GraphIndex) -> List[str]:
+    """
+    get the package of every number
+    the package of a class not analyzed is taken from its id
+    """
+    class_dict = graph_index.class_dict
+    package_name_list: List[str] = []
+    for java_class_id in graph_index.id_list:
+        java_class = class_dict.get(java_class_id)
+        if java_class is not None:
+            package_name_list.append(java_class.package_name)
+        else:
+            package_name_list.append(java_class_id.rpartition(".")[0])
+    return package_name_list
+
+
+def find_components(
+    forward_list: List[List[Tuple[int, str]]], label_set: Set[str] | None = None
+) -> List[List[int]]:
+    """
+    find the strongly connected components of tarjan, without recursion,
+    so deep graphs don't reach the recursion limit
+    return every component, a component comes after the components it reaches
+
+    :param forward_list: the number maps to the numbers and labels of its edges
+    :param label_set: the labels of the edges followed, None for all
+    """
+    node_count = len(forward_list)
+    index_list = [-1] * node_count  # the number maps to its visiting order
+    low_list = [0] * node_count  # the number maps to its lowest reachable order
+    on_stack = bytearray(node_count)
+    stack: List[int] = []
+    component_list: List[List[int]] = []
+    order = 0
+
+    for root in range(node_count):
+        if index_list[root] != -1:
+            continue
+        # the nodes being visited and the position in their edge lists
+        call_stack: List[Tuple[int, int]] = [(root, 0)]
+        index_list[root] = low_list[root] = order
+        order += 1
+        stack.append(root)
+        on_stack[root] = 1
+        while call_stack:
+            node, position = call_stack[-1]
+            edge_list = forward_list[node]
+            while position < len(edge_list):
+                neighbor, label = edge_list[position]
+                position += 1
+                if label_set is not None and label not in label_set:
+                    continue
+                if index_list[neighbor] == -1:
+                    break
+                if on_stack[neighbor] and index_list[neighbor] < low_list[node]:
+                    low_list[node] = index_list[neighbor]
+            else:
+                # every edge is done, close the node
+                call_stack.pop()
+                if call_stack:
+                    parent = call_stack[-1][0]
+                    if low_list[node] < low_list[parent]:
+                        low_list[parent] = low_list[node]
+                if low_list[node] == index_list[node]:
+                    component: List[int] = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = 0
+                        component.append(member)
+                        if member == node:
+                            break
+                    component_list.append(component)
+                continue
+            # visit the neighbor, come back to the next edge after it
+            call_stack[-1] = (node, position)
+            call_stack.append((neighbor, 0))
+            index_list[neighbor] = low_list[neighbor] = order
+            order += 1
+            stack.append(neighbor)
+            on_stack[neighbor] = 1
+    return component_list
+
+
+def find_cycles(
+    graph_index: GraphIndex, label_set: Set[str] | None = None
+) -> List[List[str]]:
+    """
+    find the dependency cycles by the strongly connected components
+    return the components of more than one class, or of one using itself,
+    the largest first, every one sorted by id
+
+    :param label_set: the labels of the edges followed, None for all
+    """
+    forward_list = graph_index.forward_list
+    component_list = find_components(forward_list, label_set)
+    id_list = graph_index.id_list
+    cycle_list: List[List[str]] = []
+    for component in component_list:
+        if len(component) == 1:
+            node = component[0]
+            if not any(
+                neighbor == node and (label_set is None or label in label_set)
+                for neighbor, label in forward_list[node]
+            ):
+                continue
+        cycle_list.append(sorted(id_list[member] for member in component))
+    cycle_list.sort(key=lambda cycle: (-len(cycle), cycle[0]))
+    return cycle_list
+
+
+def fan_in_out(graph_index: GraphIndex) -> Dict[str, Tuple[int, int]]:
+    """
+    count the classes using every analyzed class and the classes it uses
+    return the ids mapping to their fan-in and fan-out
+    """
+    return {
+        java_class_id: (
+            len(graph_index.reverse_list[number]),
+            len(graph_index.forward_list[number]),
+        )
+        for java_class_id, number in graph_index.number_dict.items()
+        if java_class_id in graph_index.class_dict
+    }
+
+
+def package_coupling(graph_index: GraphIndex) -> Dict[str, Tuple[int, int, float]]:
+    """
+    measure the coupling of the packages of the analyzed classes
+    the afferent coupling is the number of classes outside the package
+    using classes inside it, the efferent coupling the number of classes
+    outside it used by classes inside it,
+    the instability is efferent / (afferent + efferent), 0 when both are 0
+    return the packages mapping to their afferent, efferent and instability
+    """
+    package_name_list = get_package_names(graph_index)
+    afferent_dict: Dict[str, Set[int]] = {}  # the package maps to its users
+    efferent_dict: Dict[str, Set[int]] = {}  # the package maps to what it uses
+    for java_class_id in graph_index.class_dict:
+        source = graph_index.number_dict[java_class_id]
+        source_package_name = package_name_list[source]
+        efferent_set = efferent_dict.setdefault(source_package_name, set())
+        for target, _ in graph_index.forward_list[source]:
+            target_package_name = package_name_list[target]
+            if target_package_name == source_package_name:
+                continue
+            efferent_set.add(target)
+            afferent_dict.setdefault(target_package_name, set()).add(source)
+
+    coupling_dict: Dict[str, Tuple[int, int, float]] = {}
+    for package_name in sorted(efferent_dict):
+        afferent = len(afferent_dict.get(package_name, ()))
+        efferent = len(efferent_dict[package_name])
+        total = afferent + efferent
+        coupling_dict[package_name] = (
+            afferent,
+            efferent,
+            efferent / total if total else 0.0,
+        )
+    return coupling_dict
+
+
+def inheritance_depth(graph_index: GraphIndex) -> Dict[str, int]:
+    """
+    measure the depth of inheritance of every analyzed class,
+    the number of classes above it along its 'extends' edges
+    a class whose parent was not analyzed has depth 1, one without a parent 0,
+    an inheritance cycle is cut where the walk comes back to it
+    """
+    forward_list = graph_index.forward_list
+    depth_list: List[int] = [-1] * len(forward_list)  # -1 until measured
+    parent_list: List[int | None] = [None] * len(forward_list)
+    for number, edge_list in enumerate(forward_list):
+        for neighbor, label in edge_list:
+            if label == INHERITANCE_LABEL:
+                parent_list[number] = neighbor
+                break
+
+    for number in range(len(forward_list)):
+        # walk up to a measured class or the top, then measure the path down
+        path: List[int] = []
+        on_path: Set[int] = set()
+        node = number
+        while node is not None and depth_list[node] == -1 and node not in on_path:
+            path.append(node)
+            on_path.add(node)
+            node = parent_list[node]
+        depth = -1 if node is None or node in on_path else depth_list[node]
+        for node in reversed(path):
+            depth += 1
+            depth_list[node] = depth
+
+    return {
+        java_class_id: depth_list[graph_index.number_dict[java_class_id]]
+        for java_class_id in graph_index.class_dict
+    }
+
+
+def metrics_report(graph_index: GraphIndex) -> Dict:
+    """
+    get all the metrics as a dict of plain values
+    """
+    cycle_list = find_cycles(graph_index)
+    fan_dict = fan_in_out(graph_index)
+    depth_dict = inheritance_depth(graph_index)
+    return {
+        "class_count": len(graph_index.class_dict),
+        "edge_count": sum(map(len, graph_index.forward_list)),
+        "cycles": cycle_list,
+        "classes": {
+            java_class_id: {
+                "fan_in": fan_dict[java_class_id][0],
+                "fan_out": fan_dict[java_class_id][1],
+                "inheritance_depth": depth_dict[java_class_id],
+            }
+            for java_class_id in sorted(graph_index.class_dict)
+        },
+        "packages": {
+            package_name: {
+                "afferent": afferent,
+                "efferent": efferent,
+                "instability": instability,
+            }
+            for package_name, (
+                afferent,
+                efferent,
+                instability,
+            ) in package_coupling(graph_index).items()
+        },
+    }
+
+
+def write_metrics_report(graph_index: GraphIndex, report_path: str) -> None:
+    """
+    write the metrics to the path as json
+    """
+    with open(report_path, "w") as f:
+        json.dump(metrics_report(graph_index), f, indent=2)
+
+
+# test code
+if __name__ == "__main__":
+    import sys
+    from project_analyzer import analyze_project, link_project
+
+    project = sys.argv[1] if len(sys.argv) > 1 else "example-project"
+    java_file_facts_list = analyze_project(project)
+    link_project(java_file_facts_list)
+    graph_index = GraphIndex(
+        java_class
+        for java_file_facts in java_file_facts_list
+        for java_class in java_file_facts.public_class_set
+    )
+    report = metrics_report(graph_index)
+    print(f"{report['class_count']} classes, {report['edge_count']} edges")
+    for cycle in report["cycles"]:
+        print("cycle:", ", ".join(cycle))
+    for package_name, coupling in report["packages"].items():
+        print(
+            f"{package_name}: Ca {coupling['afferent']}, Ce {coupling['efferent']}, "
+            f"I {coupling['instability']:.2f}"
+        )
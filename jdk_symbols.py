@@ -0,0 +1,92 @@
+"""
+symbol table of the public types of the jdk
+the table is read from 'jdk_symbols.txt' at most once per process,
+so a standard library name is resolved by one dictionary probe
+"""
+from __future__ import annotations
+from typing import Dict, FrozenSet
+from functools import lru_cache
+import hashlib
+import os
+
+# the directory of this file, paths below are relative to it
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# the table, a package name and the names of its types on every line
+JDK_SYMBOLS_PATH = os.path.join(BASE_DIR, "jdk_symbols.txt")
+# the package every java file imports
+JAVA_LANG = "java.lang"
+
+_package_type_dict: Dict[
+    str, FrozenSet[str]
+] | None = None  # the package maps to the names of its types
+_symbols_version: str | None = None  # the version of the table
+
+
+def get_package_type_dict() -> Dict[str, FrozenSet[str]]:
+    """
+    get the packages of the jdk and the names of their types, load them on first use
+    """
+    global _package_type_dict
+    if _package_type_dict is None:
+        package_type_dict: Dict[str, FrozenSet[str]] = {}
+        with open(JDK_SYMBOLS_PATH, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                package_name, *type_name_list = line.split()
+                package_type_dict[package_name] = frozenset(type_name_list)
+        _package_type_dict = package_type_dict
+    return _package_type_dict
+
+
+def symbols_version() -> str:
+    """
+    get the version of the table, the hash of its file
+    """
+    global _symbols_version
+    if _symbols_version is None:
+        with open(JDK_SYMBOLS_PATH, "rb") as f:
+            _symbols_version = hashlib.sha1(f.read()).hexdigest()[:12]
+    return _symbols_version
+
+
+@lru_cache(maxsize=256)
+def get_visible_type_dict(import_package_set: FrozenSet[str]) -> Dict[str, str]:
+    """
+    get the jdk types a file sees without a single type import
+    return the names mapping to the ids, e.g. 'List' to 'java.util.List'
+    a name of java.lang comes first, then the packages in sorted order
+    the files importing the same packages share the same dict, don't change it
+
+    :param import_package_set: the packages the file imports with '.*'
+    """
+    package_type_dict = get_package_type_dict()
+    visible_type_dict: Dict[str, str] = {}
+    for package_name in (JAVA_LANG, *sorted(import_package_set)):
+        for type_name in package_type_dict.get(package_name, ()):
+            visible_type_dict.setdefault(type_name, package_name + "." + type_name)
+    return visible_type_dict
+
+
+def is_jdk_id(java_class_id: str) -> bool:
+    """
+    check if the id is a type of the jdk, e.g. 'java.util.List'
+    """
+    package_name, _, type_name = java_class_id.rpartition(".")
+    return type_name in get_package_type_dict().get(package_name, ())
+
+
+# test code
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    package_type_dict = get_package_type_dict()
+    print(
+        f"{sum(map(len, package_type_dict.values()))} types "
+        f"in {len(package_type_dict)} packages, "
+        f"loaded in {(time.perf_counter() - start) * 1000:.2f} ms"
+    )
+    visible_type_dict = get_visible_type_dict(frozenset({"java.util"}))
+    print(visible_type_dict["List"], visible_type_dict["String"])
+    print(is_jdk_id("java.util.Map"), is_jdk_id("dtu.compute.util.Utils"))
@@ -1,36 +1,160 @@
 from __future__ import annotations
-from typing import List, Tuple
-import glob
+from typing import Iterator, List, Tuple
+import codecs
+import os
+import zipfile
 
+# the extensions of the source archives, read without extracting them
+ARCHIVE_EXTENSIONS = (".jar", ".zip")
 
-def load_java_files(project_name: str) -> list[Tuple[str, str]]:
+# the byte order marks and the encodings they stand for, longest first
+BOM_ENCODING_LIST: List[Tuple[bytes, str]] = [
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+# the encoding of a content without a mark that isn't utf-8,
+# e.g. a windows or latin-1 source, every byte decodes
+FALLBACK_ENCODING = "latin-1"
+
+
+def iter_java_file_paths(project_name: str) -> Iterator[str]:
     """
-    load all the contents of java files in the project
-    return a list of tuples of file name and content
+    find the paths of all java files in the project lazily
+    directories and files are visited in sorted order
+    """
+    for dir_path, dir_names, file_names in os.walk(project_name):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            if file_name.endswith(".java"):
+                yield os.path.join(dir_path, file_name)
+
+
+def find_java_file_paths(project_name: str) -> List[str]:
+    """
+    find the paths of all java files in the project
+    """
+    return list(iter_java_file_paths(project_name))
+
+
+def get_name(path: str) -> str:
+    """
+    get the name of the java file from the path
+    both '/' and '\\' are taken as separators
     """
-    file_paths: List[str] = []
-    # find all java files in the project
-    for file_path in glob.glob("./" + project_name + "/**/*.java", recursive=True):
-        file_paths.append(file_path)
+    slash_loc = max(path.rfind("/"), path.rfind("\\"))
+    file_name = path[slash_loc + 1 :]
+    dot_loc = file_name.rfind(".")
+    if dot_loc > 0:
+        file_name = file_name[:dot_loc]
+    return file_name
 
-    # print(file_paths)
 
-    def get_name(path: str) -> str:
-        """
-        get the name of the java file from the path
-        """
-        dot_loc = path.rfind(".")
-        file_name = path[:dot_loc]
-        slash_loc = file_name.rfind("\\")
-        file_name = file_name[slash_loc + 1 :]
-        return file_name
+def detect_bom(head: bytes) -> Tuple[bytes, str] | None:
+    """
+    detect the byte order mark at the head of the content
+    return the mark and its encoding, None if there is no mark
+    """
+    for bom, encoding in BOM_ENCODING_LIST:
+        if head.startswith(bom):
+            return bom, encoding
+    return None
+
+
+def to_utf8(content: bytes) -> bytes:
+    """
+    convert the content to utf-8 bytes for tree-sitter
+    utf-8 without a byte order mark is returned as it is,
+    another content without a mark is decoded with the fallback encoding
+    """
+    bom_encoding = detect_bom(content[:4])
+    if bom_encoding is None:
+        try:
+            content.decode("utf-8")
+        except UnicodeDecodeError:
+            return content.decode(FALLBACK_ENCODING).encode("utf-8")
+        return content
+    bom, encoding = bom_encoding
+    if encoding == "utf-8":
+        return content[len(bom) :]
+    return content[len(bom) :].decode(encoding).encode("utf-8")
+
 
+def read_java_file(path: str) -> bytes:
+    """
+    read the content of the java file as utf-8 bytes
+    the content is read in one piece, tree-sitter, the cache and the workers
+    all need it as bytes, so a mapping would only be copied again
+    """
+    with open(path, "rb") as file:
+        return to_utf8(file.read())
+
+
+def is_archive(path: str) -> bool:
+    """
+    check if the path is a source archive, e.g. a '-sources.jar'
+    """
+    return path.lower().endswith(ARCHIVE_EXTENSIONS) and os.path.isfile(path)
+
+
+def get_entry_path(archive_path: str, entry_name: str) -> str:
+    """
+    get the path of an entry of the archive,
+    e.g. 'lib/guava-sources.jar!/com/google/common/base/Strings.java'
+    """
+    return f"{archive_path}!/{entry_name}"
+
+
+def iter_archive_entries(zip_file: zipfile.ZipFile) -> Iterator[zipfile.ZipInfo]:
+    """
+    find the java files in the archive, sorted by name
+    """
+    for info in sorted(zip_file.infolist(), key=lambda info: info.filename):
+        if not info.is_dir() and info.filename.endswith(".java"):
+            yield info
+
+
+def iter_archive_java_files(archive_path: str) -> Iterator[Tuple[str, str, bytes]]:
+    """
+    load the java files of the archive one by one, nothing is extracted
+    yield tuples of entry path, file name and utf-8 content
+    """
+    with zipfile.ZipFile(archive_path) as zip_file:
+        for info in iter_archive_entries(zip_file):
+            yield (
+                get_entry_path(archive_path, info.filename),
+                get_name(info.filename),
+                to_utf8(zip_file.read(info)),
+            )
+
+
+def iter_java_files(project_name: str) -> Iterator[Tuple[str, str, bytes]]:
+    """
+    load the java files of the project one by one
+    yield tuples of path, file name and utf-8 content
+    only the file being yielded is held in memory
+
+    :param project_name: the directory of the project, or a source archive
+    """
+    if is_archive(project_name):
+        yield from iter_archive_java_files(project_name)
+        return
+    for file_path in iter_java_file_paths(project_name):
+        yield file_path, get_name(file_path), read_java_file(file_path)
+
+
+def load_java_files(project_name: str) -> list[Tuple[str, str]]:
+    """
+    load all the contents of java files in the project
+    return a list of tuples of file name and content
+    """
     # the list containing tuples of name and content
     name_content_list: List[Tuple[str, str]] = []
-    for file_path in file_paths:
-        with open(file_path, "r") as file:
-            name_content_list.append((get_name(file_path), file.read()))
-    
+    for _, name, content in iter_java_files(project_name):
+        name_content_list.append((name, content.decode("utf-8")))
+
     # for name, content in name_content_list:
     #     print(name)
     #     print(content)
@@ -0,0 +1,110 @@
+"""
+shared parser service
+the java grammar is compiled and loaded at most once per process
+and every analyzer reuses the same parser
+"""
+from __future__ import annotations
+from typing import List
+import hashlib
+import os
+import tree_sitter
+
+# the directory of this file, paths below are relative to it
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# the compiled grammar library
+LIBRARY_PATH = os.path.join(BASE_DIR, "build", "my-languages.so")
+# the repositories of the grammars in the library
+GRAMMAR_PATHS: List[str] = [os.path.join(BASE_DIR, "tree-sitter-java")]
+
+_java_language: tree_sitter.Language | None = None  # the loaded java language
+_parser: tree_sitter.Parser | None = None  # the shared parser
+_grammar_version: str | None = None  # the version of the grammar
+
+
+def grammar_source_paths() -> List[str]:
+    """
+    get the paths of the source files the library is compiled from
+    """
+    source_paths: List[str] = []
+    for grammar_path in GRAMMAR_PATHS:
+        src_path = os.path.join(grammar_path, "src")
+        source_paths.append(os.path.join(src_path, "parser.c"))
+        for scanner_name in ("scanner.cc", "scanner.c"):
+            scanner_path = os.path.join(src_path, scanner_name)
+            if os.path.exists(scanner_path):
+                source_paths.append(scanner_path)
+                break
+    return source_paths
+
+
+def is_library_up_to_date() -> bool:
+    """
+    check if the compiled library is newer than all its source files
+    """
+    if not os.path.exists(LIBRARY_PATH):
+        return False
+    library_mtime = os.path.getmtime(LIBRARY_PATH)
+    for source_path in grammar_source_paths():
+        if os.path.getmtime(source_path) > library_mtime:
+            return False
+    return True
+
+
+def build_library() -> bool:
+    """
+    build the library if it is not up to date
+    return True if the library was compiled
+    """
+    if is_library_up_to_date():
+        return False
+    os.makedirs(os.path.dirname(LIBRARY_PATH), exist_ok=True)
+    return tree_sitter.Language.build_library(LIBRARY_PATH, GRAMMAR_PATHS)
+
+
+def get_language() -> tree_sitter.Language:
+    """
+    get the java language, build and load it on first use
+    """
+    global _java_language
+    if _java_language is None:
+        build_library()
+        _java_language = tree_sitter.Language(LIBRARY_PATH, "java")
+    return _java_language
+
+
+def get_parser() -> tree_sitter.Parser:
+    """
+    get the shared parser of java, create it on first use
+    """
+    global _parser
+    if _parser is None:
+        parser = tree_sitter.Parser()
+        parser.set_language(get_language())
+        _parser = parser
+    return _parser
+
+
+def grammar_version() -> str:
+    """
+    get the version of the grammar
+    it is the hash of the grammar sources, so it changes with the grammar
+    """
+    global _grammar_version
+    if _grammar_version is None:
+        hasher = hashlib.sha1()
+        for source_path in grammar_source_paths():
+            with open(source_path, "rb") as file:
+                hasher.update(file.read())
+        _grammar_version = hasher.hexdigest()[:16]
+    return _grammar_version
+
+
+def reset() -> None:
+    """
+    drop the loaded language and parser
+    the next call of get_parser loads them again
+    """
+    global _java_language
+    global _parser
+    _java_language = None
+    _parser = None
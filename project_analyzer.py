@@ -0,0 +1,618 @@
+from __future__ import annotations
+from typing import ContextManager, Deque, Iterable, Iterator, List, Tuple
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import Future, ProcessPoolExecutor
+from load_java_files import (
+    get_entry_path,
+    get_name,
+    is_archive,
+    iter_archive_entries,
+    iter_java_files,
+    to_utf8,
+)
+from AnalysisCache import AnalysisCache
+from AnalysisError import AnalysisError
+from JavaAnalyzer import JavaAnalyzer
+from JavaFileFacts import JavaFileFacts
+from SymbolIndex import SymbolIndex
+from Instrumentation import Instrumentation
+import logging
+import os
+import time
+import zipfile
+import tree_sitter
+import parser_service
+
+logger = logging.getLogger(__name__)
+
+
+def init_worker() -> None:
+    """
+    warm up the parser of a worker process
+    """
+    parser_service.get_parser()
+
+
+# the number of files sent to a worker in one task
+BATCH_SIZE = 16
+
+
+def analyze_source(
+    path_name_content: Tuple[str, str, bytes],
+    engine: str = "walker",
+    instrumentation: Instrumentation | None = None,
+    old_tree: tree_sitter.Tree | None = None,
+) -> Tuple[JavaAnalyzer | None, AnalysisError | None]:
+    """
+    parse, extract and resolve one java file, an error in any step doesn't
+    escape, the analyzer keeps the facts found before it
+    return the analyzer, None if the file couldn't be parsed, and the first
+    error, None if it was analyzed completely
+
+    :param old_tree: the edited tree of the previous content, see 'JavaAnalyzer'
+    """
+    path, name, content = path_name_content
+
+    def phase(phase_name: str) -> ContextManager:
+        if instrumentation is None:
+            return nullcontext()
+        return instrumentation.phase(phase_name)
+
+    java_analyzer = None
+    analysis_error = None
+    try:
+        with phase("parse"):
+            java_analyzer = JavaAnalyzer(name, content, old_tree)
+        try:
+            with phase("walk"):
+                java_analyzer.extract(engine)
+        except Exception as error:
+            analysis_error = AnalysisError.from_exception(error, path)
+        with phase("import-resolution"):
+            java_analyzer.resolve_dependency()
+    except Exception as error:
+        if analysis_error is None:
+            analysis_error = AnalysisError.from_exception(error, path)
+    return java_analyzer, analysis_error
+
+
+def analyze_file(
+    path_name_content: Tuple[str, str, bytes],
+    engine: str = "walker",
+    instrumentation: Instrumentation | None = None,
+) -> Tuple[JavaFileFacts, AnalysisError | None]:
+    """
+    parse and analyze one java file
+    an error in the analysis doesn't escape, the file keeps the facts
+    found before it, so one odd file never stops a run
+    return its facts and its error, None if it was analyzed completely
+
+    :param path_name_content: the path, name and content of the file
+    :param engine: the engine extracting the facts, "walker" or "query"
+    :param instrumentation: the metrics the phases are timed into, None for none
+    """
+    path, name, _ = path_name_content
+    start_time = time.perf_counter()
+    java_analyzer, analysis_error = analyze_source(
+        path_name_content, engine, instrumentation
+    )
+    if java_analyzer is None:
+        # not even parsed, the file has no facts
+        return JavaFileFacts("", name, "", set(), set(), set()), analysis_error
+    if instrumentation is not None:
+        instrumentation.record_file(path, time.perf_counter() - start_time)
+        instrumentation.count_nodes(java_analyzer.tree)
+    java_analyzer.release()
+    return JavaFileFacts.from_analyzer(java_analyzer), analysis_error
+
+
+def analyze_batch(
+    path_name_content_list: List[Tuple[str, str, bytes]],
+    engine: str = "walker",
+    instrumentation: Instrumentation | None = None,
+) -> List[Tuple[JavaFileFacts, AnalysisError | None]]:
+    """
+    parse and analyze several java files
+    return their facts and errors in the same order
+    """
+    return [
+        analyze_file(path_name_content, engine, instrumentation)
+        for path_name_content in path_name_content_list
+    ]
+
+
+def analyze_batch_instrumented(
+    path_name_content_list: List[Tuple[str, str, bytes]],
+    engine: str = "walker",
+    with_node_count: bool = True,
+) -> Tuple[List[Tuple[JavaFileFacts, AnalysisError | None]], Instrumentation]:
+    """
+    parse and analyze several java files in a worker
+    return their facts and errors and the metrics of the worker
+
+    :param with_node_count: count the nodes of the trees by type
+    """
+    instrumentation = Instrumentation(with_node_count=with_node_count)
+    return (
+        analyze_batch(path_name_content_list, engine, instrumentation),
+        instrumentation,
+    )
+
+
+def analyze_project(
+    project_name: str,
+    workers: int | None = None,
+    cache: AnalysisCache | None = None,
+    engine: str = "walker",
+    instrumentation: Instrumentation | None = None,
+    memory_limit: int | None = None,
+    error_list: List[AnalysisError] | None = None,
+    error_budget: int | None = None,
+) -> List[JavaFileFacts]:
+    """
+    analyze all the java files in the project
+    the files are streamed from disk in batches to a pool of worker processes,
+    and only the batches in flight are held in memory
+    files found unchanged in the cache are not parsed again
+
+    :param project_name: the directory of the project, or a source archive
+        analyzed by 'analyze_archive'
+    :param workers: the number of worker processes, by default one per core,
+        1 analyzes the files in this process
+    :param cache: the cache of the facts, None to analyze every file
+    :param engine: the engine extracting the facts, "walker" or "query"
+    :param instrumentation: the metrics of the run, None to collect none
+    :param memory_limit: the most bytes of source read but not analyzed yet,
+        the batches in flight are finished before more is read, None for
+        no limit; the trees are dropped file by file, so the memory of
+        the run is the source in flight, its trees and the facts
+    :param error_list: the errors of the failed files are appended to it,
+        None to log them; a failed file keeps its partial facts and is
+        not cached, so the next run with the cache retries only the failed files
+    :param error_budget: the most files that may fail, the run stops with
+        an exception beyond it, None for no limit
+    return the facts of the files in the order they are found, not linked yet
+    """
+    if is_archive(project_name):
+        return analyze_archive(
+            project_name,
+            workers,
+            cache,
+            engine,
+            instrumentation,
+            memory_limit,
+            error_list,
+            error_budget,
+        )
+    file_iterator = iter_java_files(project_name)
+    if instrumentation is not None:
+        file_iterator = instrumentation.timed(file_iterator, "load")
+    return analyze_files(
+        file_iterator,
+        workers,
+        cache,
+        engine,
+        instrumentation,
+        memory_limit,
+        error_list,
+        error_budget,
+    )
+
+
+def analyze_files(
+    file_iterator: Iterable[Tuple[str, str, bytes]],
+    workers: int | None = None,
+    cache: AnalysisCache | None = None,
+    engine: str = "walker",
+    instrumentation: Instrumentation | None = None,
+    memory_limit: int | None = None,
+    error_list: List[AnalysisError] | None = None,
+    error_budget: int | None = None,
+) -> List[JavaFileFacts]:
+    """
+    analyze the java files of the iterator, like 'analyze_project'
+    the files may come from anywhere, e.g. the object store of git
+
+    :param file_iterator: the path, name and utf-8 content of every file
+    return the facts of the files in the order of the iterator, not linked yet
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    java_file_facts_list: List[JavaFileFacts | None] = []
+    executor: ProcessPoolExecutor | None = None
+    # the batches sent to the workers, waiting for their facts
+    pending_queue: Deque[Tuple[List[Tuple[int, str, str, bytes]], Future]] = deque()
+    batch: List[Tuple[int, str, str, bytes]] = []  # index, path, name and content
+    in_flight_bytes = 0  # the bytes of source not analyzed yet
+    error_count = 0  # the number of failed files
+
+    def finish_batch(
+        batch: List[Tuple[int, str, str, bytes]],
+        facts_error_list: List[Tuple[JavaFileFacts, AnalysisError | None]],
+        worker_instrumentation: Instrumentation | None = None,
+    ) -> None:
+        """
+        store the facts of an analyzed batch and count its errors
+        """
+        nonlocal in_flight_bytes
+        nonlocal error_count
+        if worker_instrumentation is not None:
+            instrumentation.merge(worker_instrumentation)
+        for (index, file_path, _, content), (
+            java_file_facts,
+            analysis_error,
+        ) in zip(batch, facts_error_list):
+            java_file_facts_list[index] = java_file_facts
+            in_flight_bytes -= len(content)
+            if analysis_error is None:
+                if cache is not None:
+                    cache.put(file_path, content, java_file_facts, engine)
+                continue
+            error_count += 1
+            if error_list is None:
+                logger.warning("partial facts for %s", analysis_error)
+            else:
+                error_list.append(analysis_error)
+            if error_budget is not None and error_count > error_budget:
+                raise Exception("error budget exceeded!", error_count, analysis_error)
+
+    def finish_pending() -> None:
+        """
+        wait for the oldest batch in flight and store its facts
+        """
+        finished_batch, future = pending_queue.popleft()
+        if instrumentation is None:
+            finish_batch(finished_batch, future.result())
+        else:
+            finish_batch(finished_batch, *future.result())
+
+    def submit_batch() -> None:
+        """
+        analyze the current batch, in a worker if there are several
+        """
+        nonlocal batch
+        nonlocal executor
+        path_name_content_list = [
+            (file_path, name, content) for _, file_path, name, content in batch
+        ]
+        if workers <= 1:
+            finish_batch(
+                batch, analyze_batch(path_name_content_list, engine, instrumentation)
+            )
+        else:
+            if executor is None:
+                executor = ProcessPoolExecutor(
+                    max_workers=workers, initializer=init_worker
+                )
+            if instrumentation is None:
+                future = executor.submit(analyze_batch, path_name_content_list, engine)
+            else:
+                future = executor.submit(
+                    analyze_batch_instrumented,
+                    path_name_content_list,
+                    engine,
+                    instrumentation.with_node_count,
+                )
+            pending_queue.append((batch, future))
+            # bound the number of batches in flight
+            if len(pending_queue) > workers * 2:
+                finish_pending()
+        batch = []
+
+    try:
+        for file_path, name, content in file_iterator:
+            java_file_facts = None
+            if cache is not None:
+                if instrumentation is None:
+                    java_file_facts = cache.get(file_path, content, engine)
+                else:
+                    with instrumentation.phase("cache"):
+                        java_file_facts = cache.get(file_path, content, engine)
+            java_file_facts_list.append(java_file_facts)
+            if java_file_facts is None:
+                if memory_limit is not None:
+                    # make room for the file, the oldest batches first
+                    while in_flight_bytes + len(content) > memory_limit:
+                        if pending_queue:
+                            finish_pending()
+                        elif batch:
+                            submit_batch()
+                        else:
+                            break
+                batch.append((len(java_file_facts_list) - 1, file_path, name, content))
+                in_flight_bytes += len(content)
+                if len(batch) >= BATCH_SIZE:
+                    submit_batch()
+        if batch:
+            submit_batch()
+        while pending_queue:
+            finish_pending()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return java_file_facts_list
+
+
+def analyze_archive(
+    archive_path: str,
+    workers: int | None = None,
+    cache: AnalysisCache | None = None,
+    engine: str = "walker",
+    instrumentation: Instrumentation | None = None,
+    memory_limit: int | None = None,
+    error_list: List[AnalysisError] | None = None,
+    error_budget: int | None = None,
+) -> List[JavaFileFacts]:
+    """
+    analyze the java files of a source archive, e.g. a '-sources.jar',
+    like 'analyze_project', the entries are streamed from the archive
+    and nothing is extracted to disk
+    an entry is cached by its crc and size from the directory of the archive,
+    so an unchanged entry is not even decompressed
+
+    :param archive_path: the path of the '.jar' or '.zip'
+    return the facts of the entries in the order of their names, not linked yet
+    """
+    java_file_facts_list: List[JavaFileFacts | None] = []
+    missing_list: List[Tuple[int, zipfile.ZipInfo]] = []  # index and entry
+    with zipfile.ZipFile(archive_path) as zip_file:
+        for info in iter_archive_entries(zip_file):
+            java_file_facts = None
+            if cache is not None:
+                java_file_facts = cache.get_entry(
+                    get_entry_path(archive_path, info.filename),
+                    cache.end_key(f"{info.CRC:08x}.{info.file_size}", engine),
+                )
+            java_file_facts_list.append(java_file_facts)
+            if java_file_facts is None:
+                missing_list.append((len(java_file_facts_list) - 1, info))
+
+        def iter_missing_entries() -> Iterator[Tuple[str, str, bytes]]:
+            for _, info in missing_list:
+                yield (
+                    get_entry_path(archive_path, info.filename),
+                    get_name(info.filename),
+                    to_utf8(zip_file.read(info)),
+                )
+
+        file_iterator = iter_missing_entries()
+        if instrumentation is not None:
+            file_iterator = instrumentation.timed(file_iterator, "load")
+        entry_error_list: List[AnalysisError] = []
+        analyzed_facts_list = analyze_files(
+            file_iterator,
+            workers,
+            None,
+            engine,
+            instrumentation,
+            memory_limit,
+            entry_error_list,
+            error_budget,
+        )
+
+    # the failed entries are not cached, so they are tried again
+    failed_path_set = {analysis_error.path for analysis_error in entry_error_list}
+    for (index, info), java_file_facts in zip(missing_list, analyzed_facts_list):
+        java_file_facts_list[index] = java_file_facts
+        entry_path = get_entry_path(archive_path, info.filename)
+        if cache is not None and entry_path not in failed_path_set:
+            cache.put_entry(
+                entry_path,
+                cache.end_key(f"{info.CRC:08x}.{info.file_size}", engine),
+                java_file_facts,
+            )
+    for analysis_error in entry_error_list:
+        if error_list is None:
+            logger.warning("partial facts for %s", analysis_error)
+        else:
+            error_list.append(analysis_error)
+    return java_file_facts_list
+
+
+def link_project(java_file_facts_list: List[JavaFileFacts]) -> None:
+    """
+    resolve the dependencies between the files
+    """
+    SymbolIndex(java_file_facts_list).link()
+
+
+def warn_ambiguous_names(java_file_facts_list: List[JavaFileFacts]) -> None:
+    """
+    warn about the names several imported ids match, the facts keep them,
+    so the files from the cache or the workers are reported too
+    """
+    for java_file_facts in java_file_facts_list:
+        for java_class_id, name, candidate_list in java_file_facts.ambiguous_name_list:
+            logger.warning(
+                "ambiguous name %s in %s: %s, %s is chosen",
+                name,
+                java_class_id,
+                candidate_list,
+                candidate_list[0],
+            )
+
+
+# test code
+if __name__ == "__main__":
+    import argparse
+    import json
+    from GraphIndex import GraphIndex
+    from GraphSimplifier import GraphSimplifier
+    from graph_export import export_graph
+    from graph_metrics import find_cycles, write_metrics_report
+    from Painter import Painter
+
+    arg_parser = argparse.ArgumentParser(description="analyze a java project")
+    arg_parser.add_argument("project", nargs="?", default="example-project")
+    arg_parser.add_argument("workers", nargs="?", type=int, default=None)
+    arg_parser.add_argument("--engine", default="walker", choices=("walker", "query"))
+    arg_parser.add_argument("--report", help="write the metrics as json to the path")
+    arg_parser.add_argument("--profile", help="write a cProfile of the run to the path")
+    arg_parser.add_argument("--render", action="store_true", help="render the graph")
+    arg_parser.add_argument(
+        "--memory-limit",
+        type=int,
+        default=None,
+        help="the most megabytes of source read but not analyzed yet",
+    )
+    arg_parser.add_argument(
+        "--archive",
+        action="append",
+        default=[],
+        help="a source archive linked with the project, e.g. a '-sources.jar', "
+        "only its classes the project uses are drawn",
+    )
+    arg_parser.add_argument("--verbose", action="store_true", help="log debug output")
+    arg_parser.add_argument(
+        "--errors", help="write the errors of the failed files as json lines"
+    )
+    arg_parser.add_argument(
+        "--error-budget",
+        type=int,
+        default=None,
+        help="the most files that may fail before the run stops",
+    )
+    arg_parser.add_argument(
+        "--collapse", action="store_true", help="draw one node for every package"
+    )
+    arg_parser.add_argument(
+        "--depth", type=int, default=None, help="collapse packages to this depth"
+    )
+    arg_parser.add_argument(
+        "--expand", action="append", default=[], help="a collapsed package to expand"
+    )
+    arg_parser.add_argument(
+        "--export", help="export the graph to a '.jsonl', '.graphml' or '.npz' path"
+    )
+    arg_parser.add_argument(
+        "--metrics", help="write the graph metrics as json to the path"
+    )
+    arg_parser.add_argument(
+        "--highlight-cycles", action="store_true", help="draw the cycles in red"
+    )
+    arg_parser.add_argument(
+        "--hide-jdk", action="store_true", help="leave out the edges to the jdk"
+    )
+    arg_parser.add_argument(
+        "--edge-budget", type=int, default=None, help="the most edges drawn"
+    )
+    arg_parser.add_argument(
+        "--hub-degree",
+        type=int,
+        default=None,
+        help="elide the dependencies on classes used by more classes than this",
+    )
+    arg_parser.add_argument(
+        "--reduce",
+        action="store_true",
+        help="drop the inheritance and realization edges implied by a chain",
+    )
+    arg_parser.add_argument("--focus", help="draw only the neighborhood of this class")
+    arg_parser.add_argument("--hops", type=int, default=1, help="the neighborhood size")
+    arg_parser.add_argument(
+        "--direction", default="forward", choices=("forward", "reverse", "both")
+    )
+    args = arg_parser.parse_args()
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.WARNING, format="%(message)s"
+    )
+
+    # the node count walks every tree again, only for a profile or a report
+    instrumentation = Instrumentation(
+        profile=args.profile is not None,
+        with_node_count=args.profile is not None or args.report is not None,
+    )
+    error_list: List[AnalysisError] = []
+    with AnalysisCache() as cache:
+        java_file_facts_list = analyze_project(
+            args.project,
+            args.workers,
+            cache,
+            args.engine,
+            instrumentation,
+            None if args.memory_limit is None else args.memory_limit << 20,
+            error_list,
+            args.error_budget,
+        )
+        project_file_count = len(java_file_facts_list)
+        # the library sources resolve the names the project uses
+        for archive_path in args.archive:
+            java_file_facts_list += analyze_archive(
+                archive_path,
+                args.workers,
+                cache,
+                args.engine,
+                instrumentation,
+                None if args.memory_limit is None else args.memory_limit << 20,
+                error_list,
+                # the budget covers the whole run, not every archive
+                None
+                if args.error_budget is None
+                else args.error_budget - len(error_list),
+            )
+    for analysis_error in error_list:
+        print("partial facts:", analysis_error)
+    warn_ambiguous_names(java_file_facts_list)
+    if args.errors is not None:
+        with open(args.errors, "w") as f:
+            for analysis_error in error_list:
+                f.write(json.dumps(analysis_error.to_dict()) + "\n")
+    with instrumentation.phase("link"):
+        link_project(java_file_facts_list)
+    # the classes of the archives are only drawn as the targets of the project
+    java_class_list = [
+        java_class
+        for java_file_facts in java_file_facts_list[:project_file_count]
+        for java_class in java_file_facts.public_class_set
+    ]
+
+    painter = Painter(args.collapse, args.depth, set(args.expand), args.hide_jdk)
+    graph_index = None
+    simplified = (
+        args.edge_budget is not None or args.hub_degree is not None or args.reduce
+    )
+    if (
+        args.focus is not None
+        or args.metrics is not None
+        or args.highlight_cycles
+        or simplified
+    ):
+        graph_index = GraphIndex(java_class_list, args.hide_jdk)
+    if args.focus is None:
+        for java_class in java_class_list:
+            painter.add_one(java_class)
+    else:
+        painter.add_subgraph(
+            graph_index,
+            graph_index.neighborhood(args.focus, args.hops, args.direction),
+        )
+    if args.highlight_cycles:
+        painter.highlight_cycles(find_cycles(graph_index))
+    if simplified:
+        graph_simplifier = GraphSimplifier(graph_index, painter.is_shown)
+        painter.keep_edges(
+            graph_simplifier.simplify(args.edge_budget, args.hub_degree, args.reduce)
+        )
+        print("simplified:", graph_simplifier.report())
+    if args.metrics is not None:
+        write_metrics_report(graph_index, args.metrics)
+    with instrumentation.phase("dot"):
+        painter.generate_dot_code()
+    if args.export is not None:
+        export_graph(java_class_list, args.export, args.hide_jdk)
+    if args.render:
+        with instrumentation.phase("render"):
+            painter.render_graph()
+    instrumentation.stop_profile(args.profile)
+
+    report = instrumentation.report()
+    print(f"analyzed {len(java_file_facts_list)} files in {report['wall_seconds']:.3f}s")
+    for phase_name, seconds in report["phase_seconds"].items():
+        print(f"  {phase_name}: {seconds:.3f}s")
+    for process_name, peak_bytes in report["peak_memory_bytes"].items():
+        if peak_bytes is not None:
+            print(f"  peak memory of {process_name}: {peak_bytes / (1 << 20):.1f}MB")
+    print("cache", cache)
+    if args.report is not None:
+        instrumentation.write_report(args.report)
@@ -0,0 +1,392 @@
+from __future__ import annotations
+from typing import Dict, FrozenSet, List, Tuple
+from AnalysisError import AnalysisError
+from JavaClass import ClassState, JavaClass
+import tree_sitter
+import parser_service
+
+# the node types whose children the walker of JavaAnalyzer analyzes
+DESCEND_TYPE_SET: FrozenSet[str] = frozenset(
+    {
+        "program",
+        "package_declaration",
+        "import_declaration",
+        "class_declaration",
+        "super_interfaces",
+        "type_list",
+        "generic_type",
+        "type_arguments",
+        "class_body",
+        "field_declaration",
+        "array_type",
+        "method_declaration",
+        "formal_parameters",
+        "formal_parameter",
+        "block",
+        "expression_statement",
+        "method_invocation",
+    }
+)
+
+# the node types of the types the walker analyzes the children of
+TYPE_DESCEND_TYPE_SET: FrozenSet[str] = frozenset(
+    {"type_list", "generic_type", "type_arguments", "array_type"}
+)
+
+# the query capturing the nodes python can't reach cheaply by itself
+# the class members are visited from the classes in python,
+# the statements of the method bodies are left to the query
+QUERY_SOURCE = """
+(program (package_declaration) @package)
+(program (import_declaration) @import)
+(program (class_declaration) @class)
+(method_declaration
+  body: (block (expression_statement (method_invocation) @invocation))) @method
+(class_body
+  (block (expression_statement (method_invocation) @invocation)) @initializer)
+(block (block (expression_statement (method_invocation) @nested_invocation)))
+(block (class_declaration) @local_class)
+"""
+
+# the name set of JavaClass every state adds names to
+STATE_SET_NAME_DICT: Dict[ClassState, str] = {
+    ClassState.INHERITANCE: "inherit_name_set",
+    ClassState.REALIZATION: "realize_name_set",
+    ClassState.AGGREGATION: "aggregate_name_set",
+    ClassState.COMPOSITION: "compose_name_set",
+    ClassState.DEPENDENCY: "depend_name_set",
+}
+
+_query: tree_sitter.Query | None = None  # the compiled query
+
+# the context a node is analyzed in:
+# the current class, the class state and the available generic type names
+Context = Tuple[JavaClass | None, ClassState, FrozenSet[str]]
+
+
+def get_query() -> tree_sitter.Query:
+    """
+    get the compiled query, compile it on first use
+    """
+    global _query
+    if _query is None:
+        _query = parser_service.get_language().query(QUERY_SOURCE)
+    return _query
+
+
+def add_type_parameters(
+    node: tree_sitter.Node, generic_type_name_set: FrozenSet[str]
+) -> FrozenSet[str]:
+    """
+    add the type parameters declared by the class or method node
+    """
+    type_parameters = node.child_by_field_name("type_parameters")
+    if type_parameters is None:
+        return generic_type_name_set
+    return generic_type_name_set | {
+        type_parameter.text.decode() for type_parameter in type_parameters.named_children
+    }
+
+
+def extract_with_queries(java_analyzer) -> None:
+    """
+    extract the same information as the walker of JavaAnalyzer,
+    the package, imports, classes and the class names they use
+    the statements of the method bodies are searched by a compiled query in C,
+    python only visits the class members and the captured nodes
+    """
+    match_list = get_query().matches(java_analyzer.root_node)
+    class_dict: Dict[int, JavaClass] = {}  # the id of a class node maps to its class
+    scope_dict: Dict[
+        int, Tuple[JavaClass, FrozenSet[str]]
+    ] = {}  # the id of a method or initializer maps to its class and generic names
+    context_dict: Dict[int, Context | None] = {
+        java_analyzer.root_node.id: (None, ClassState.DEPENDENCY, frozenset())
+    }  # the id of a node maps to its context, None if the walker doesn't reach it
+
+    def get_context(node: tree_sitter.Node) -> Context | None:
+        """
+        get the context the walker analyzes the node in
+        None if the walker doesn't reach the node
+        it climbs the parents, so it is only used for rare nodes
+        """
+        # climb to the closest ancestor with a known context
+        chain: List[Tuple[tree_sitter.Node, tree_sitter.Node]] = []
+        while node.id not in context_dict:
+            parent = node.parent
+            chain.append((node, parent))
+            node = parent
+        context = context_dict[node.id]
+
+        # go down and work out the context of every node on the way
+        for child, parent in reversed(chain):
+            if context is not None and parent.type not in DESCEND_TYPE_SET:
+                context = None
+            if context is not None:
+                current_class, class_state, generic_type_name_set = context
+                match parent.type:
+                    case "class_declaration":
+                        current_class = class_dict.get(parent.id)
+                    case "super_interfaces":
+                        class_state = ClassState.REALIZATION
+                    case "field_declaration":
+                        class_state = ClassState.AGGREGATION
+                if class_state == ClassState.REALIZATION:
+                    # a type identifier before the child ends the realization
+                    sibling = child.prev_named_sibling
+                    while sibling is not None:
+                        if sibling.type == "type_identifier":
+                            class_state = ClassState.DEPENDENCY
+                            break
+                        sibling = sibling.prev_named_sibling
+                if parent.type in ("class_declaration", "method_declaration"):
+                    type_parameters = parent.child_by_field_name("type_parameters")
+                    if (
+                        type_parameters is not None
+                        and type_parameters.start_byte < child.start_byte
+                    ):
+                        generic_type_name_set = add_type_parameters(
+                            parent, generic_type_name_set
+                        )
+                context = (current_class, class_state, generic_type_name_set)
+            context_dict[child.id] = context
+        return context
+
+    def analyze_types(
+        node: tree_sitter.Node,
+        current_class: JavaClass,
+        class_state: ClassState,
+        generic_type_name_set: FrozenSet[str],
+    ) -> None:
+        """
+        analyze the types among the children of the node like the walker
+        """
+        for child_node in node.named_children:
+            child_type = child_node.type
+            if child_type == "type_identifier":
+                class_name = child_node.text.decode()
+                if class_name not in generic_type_name_set:
+                    getattr(current_class, STATE_SET_NAME_DICT[class_state]).add(
+                        class_name
+                    )
+                if class_state == ClassState.REALIZATION:
+                    class_state = ClassState.DEPENDENCY
+            elif child_type in TYPE_DESCEND_TYPE_SET:
+                analyze_types(
+                    child_node, current_class, class_state, generic_type_name_set
+                )
+
+    def analyze_invocation(
+        node: tree_sitter.Node,
+        current_class: JavaClass,
+        generic_type_name_set: FrozenSet[str],
+    ) -> None:
+        """
+        analyze a method invocation like the walker
+        """
+        first_child = node.named_children[0]
+        match first_child.type:
+            case "identifier":
+                current_class.depend_name_set.add(first_child.text.decode())
+            case "field_access":
+                pass  # handle it with the children
+            case _:
+                raise AnalysisError.at("unhandled case in method_invocation!", node)
+        for child_node in node.named_children:
+            match child_node.type:
+                case "field_access":
+                    current_class.depend_field_set.add(child_node.text.decode())
+                case "type_arguments":
+                    analyze_types(
+                        child_node,
+                        current_class,
+                        ClassState.DEPENDENCY,
+                        generic_type_name_set,
+                    )
+
+    def analyze_class(
+        node: tree_sitter.Node,
+        current_class: JavaClass | None,
+        generic_type_name_set: FrozenSet[str],
+    ) -> None:
+        """
+        create the class of a class declaration and analyze its members
+        """
+        # the node of the identifier
+        id_node = node.child_by_field_name("name")
+        if id_node is None or id_node.type != "identifier":
+            raise AnalysisError.at("unhandled situation in class_declaration!", node)
+        if current_class is None:
+            new_class = JavaClass(java_analyzer.package_name, id_node.text.decode(), [])
+        else:
+            new_outter_class_list = current_class.outter_class_name_list.copy()
+            new_outter_class_list.append(current_class.name)
+            new_class = JavaClass(
+                java_analyzer.package_name,
+                id_node.text.decode(),
+                new_outter_class_list,
+            )
+            current_class.compose_id_set.add(new_class.id)
+        class_dict[node.id] = new_class
+        # the class is kept before any error,
+        # so the partial facts still resolve the names using it
+        java_analyzer.public_class_set.add(new_class)
+        modifiers_node = node.named_children[0]
+        if modifiers_node.type != "modifiers" or not any(
+            child.type == "public" for child in modifiers_node.children
+        ):
+            raise AnalysisError.at("unhandled non-public class_declaration!", node)
+        generic_type_name_set = add_type_parameters(node, generic_type_name_set)
+
+        superclass = node.child_by_field_name("superclass")
+        if superclass is not None:
+            first_child = superclass.named_children[0]
+            if first_child.type == "generic_type":
+                # 'Base<String>' inherits 'Base'
+                first_child = first_child.named_children[0]
+            if first_child.type != "type_identifier":
+                raise AnalysisError.at("unhandled case in superclass!", superclass)
+            new_class.inherit_name_set.add(first_child.text.decode())
+
+        super_interfaces = node.child_by_field_name("interfaces")
+        if super_interfaces is not None:
+            analyze_types(
+                super_interfaces,
+                new_class,
+                ClassState.REALIZATION,
+                generic_type_name_set,
+            )
+
+        for member_node in node.child_by_field_name("body").named_children:
+            match member_node.type:
+                case "field_declaration":
+                    analyze_types(
+                        member_node,
+                        new_class,
+                        ClassState.AGGREGATION,
+                        generic_type_name_set,
+                    )
+                case "method_declaration":
+                    method_generic_type_name_set = add_type_parameters(
+                        member_node, generic_type_name_set
+                    )
+                    scope_dict[member_node.id] = (
+                        new_class,
+                        method_generic_type_name_set,
+                    )
+                    analyze_types(
+                        member_node,
+                        new_class,
+                        ClassState.DEPENDENCY,
+                        method_generic_type_name_set,
+                    )
+                    for parameter_node in member_node.child_by_field_name(
+                        "parameters"
+                    ).named_children:
+                        if parameter_node.type == "formal_parameter":
+                            analyze_types(
+                                parameter_node,
+                                new_class,
+                                ClassState.DEPENDENCY,
+                                method_generic_type_name_set,
+                            )
+                case "block":
+                    scope_dict[member_node.id] = (new_class, generic_type_name_set)
+                case "class_declaration":
+                    analyze_class(member_node, new_class, generic_type_name_set)
+
+    # the package and the imports come first, the classes need them
+    for _, capture_dict in match_list:
+        if "package" in capture_dict:
+            scoped_id_node = capture_dict["package"].named_children[0]
+            if scoped_id_node.type != "scoped_identifier":
+                raise AnalysisError.at(
+                    "unhandled situation in package_declaration!",
+                    capture_dict["package"],
+                )
+            java_analyzer.package_name = scoped_id_node.text.decode()
+            # set up id
+            java_analyzer.id = java_analyzer.package_name + "." + java_analyzer.name
+        elif "import" in capture_dict:
+            node = capture_dict["import"]
+            scoped_id_node = node.named_children[0]
+            if scoped_id_node.type != "scoped_identifier":
+                raise AnalysisError.at(
+                    "unhandled situation in import_declaration!", node
+                )
+            match node.named_child_count:
+                case 1:
+                    java_analyzer.import_file_set.add(scoped_id_node.text.decode())
+                case 2:
+                    java_analyzer.import_package_set.add(scoped_id_node.text.decode())
+                case _:
+                    raise AnalysisError.at(
+                        "unhandled situation in import_declaration!", node
+                    )
+
+    # the classes in document order, so outer classes come first
+    for _, capture_dict in match_list:
+        if "class" in capture_dict:
+            analyze_class(capture_dict["class"], None, frozenset())
+        elif "local_class" in capture_dict:
+            node = capture_dict["local_class"]
+            context = get_context(node)
+            if context is not None:
+                analyze_class(node, context[0], context[2])
+
+    # the method invocations in the bodies
+    for _, capture_dict in match_list:
+        if "invocation" in capture_dict:
+            scope_node = capture_dict.get("method") or capture_dict["initializer"]
+            if scope_node.id in scope_dict:
+                current_class, generic_type_name_set = scope_dict[scope_node.id]
+                analyze_invocation(
+                    capture_dict["invocation"], current_class, generic_type_name_set
+                )
+        elif "nested_invocation" in capture_dict:
+            node = capture_dict["nested_invocation"]
+            context = get_context(node)
+            if context is not None:
+                analyze_invocation(node, context[0], context[2])
+
+
+# test code
+if __name__ == "__main__":
+    import contextlib
+    import io
+    import time
+    from JavaAnalyzer import JavaAnalyzer
+    from load_java_files import iter_java_files
+
+    def get_facts(java_analyzer: JavaAnalyzer) -> tuple:
+        """
+        get the extracted facts in a comparable form
+        """
+        return (
+            java_analyzer.id,
+            sorted(java_analyzer.import_file_set),
+            sorted(java_analyzer.import_package_set),
+            sorted(
+                (java_class.id, [sorted(name_tuple) for name_tuple in java_class.to_record()[3]])
+                for java_class in java_analyzer.public_class_set
+            ),
+        )
+
+    for project_name in (
+        "example-project",
+        "example-dependency-graphs",
+        "course-02242-examples",
+    ):
+        engine_time_dict = {"walker": 0.0, "query": 0.0}
+        for _, name, content in iter_java_files(project_name):
+            facts_dict = {}
+            for engine in engine_time_dict:
+                java_analyzer = JavaAnalyzer(name, content)
+                start_time = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    java_analyzer.analyze(engine)
+                engine_time_dict[engine] += time.perf_counter() - start_time
+                facts_dict[engine] = get_facts(java_analyzer)
+            if facts_dict["walker"] != facts_dict["query"]:
+                raise Exception("the engines disagree on", name)
+        print(project_name, "same facts", engine_time_dict)
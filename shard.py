@@ -0,0 +1,319 @@
+"""
+sharded analysis of a project over several machines or processes
+the java files are split into shards by the hash of their paths,
+every shard is analyzed on its own and written to a facts file,
+then the facts files are merged back in the order of a single run
+and linked once, so the result is the same as analyzing the project whole
+"""
+from __future__ import annotations
+from typing import BinaryIO, Iterator, List, Tuple
+import heapq
+import marshal
+import os
+import struct
+import zlib
+from AnalysisCache import AnalysisCache, facts_version
+from JavaFileFacts import JavaFileFacts
+from load_java_files import get_name, iter_java_file_paths, read_java_file
+from project_analyzer import analyze_files
+
+# the first bytes of a facts file
+SHARD_MAGIC = b"JAVA-SHARD-FACTS\n"
+# the length of every block of a facts file
+BLOCK_LENGTH = struct.Struct("<I")
+
+
+def get_relative_path(project_name: str, file_path: str) -> str:
+    """
+    get the path of the file relative to the project, with '/' as separator,
+    so every machine names a file the same wherever the project is checked out
+    """
+    return os.path.relpath(file_path, project_name).replace(os.sep, "/")
+
+
+def get_shard(relative_path: str, shard_count: int) -> int:
+    """
+    get the shard of the file, the same in every process and on every machine
+    """
+    return zlib.crc32(relative_path.encode("utf-8", "surrogateescape")) % shard_count
+
+
+def walk_order_key(relative_path: str) -> Tuple[Tuple[int, str], ...]:
+    """
+    get the key sorting the paths in the order 'iter_java_file_paths' finds them,
+    the files of a directory before its subdirectories, both sorted by name
+    """
+    *dir_name_list, file_name = relative_path.split("/")
+    return (*((1, dir_name) for dir_name in dir_name_list), (0, file_name))
+
+
+def write_block(f: BinaryIO, value: object) -> None:
+    """
+    write a value as a block of the facts file
+    """
+    data = zlib.compress(marshal.dumps(value))
+    f.write(BLOCK_LENGTH.pack(len(data)))
+    f.write(data)
+
+
+def read_block(f: BinaryIO) -> object:
+    """
+    read the value of the next block of the facts file
+    """
+    head = f.read(BLOCK_LENGTH.size)
+    if len(head) < BLOCK_LENGTH.size:
+        raise Exception("truncated facts file!", f.name)
+    data = f.read(BLOCK_LENGTH.unpack(head)[0])
+    return marshal.loads(zlib.decompress(data))
+
+
+def analyze_shard(
+    project_name: str,
+    shard_index: int,
+    shard_count: int,
+    output_path: str,
+    workers: int | None = None,
+    cache: AnalysisCache | None = None,
+    engine: str = "walker",
+) -> int:
+    """
+    analyze the files of one shard of the project and write their facts,
+    the facts file holds everything the merge needs, nothing else is shared
+    the file is written aside and renamed, so a failed shard leaves no file
+
+    :param shard_index: the shard analyzed, from 0 to shard_count - 1
+    :param shard_count: the number of shards of the project
+    :param output_path: the path of the facts file
+    return the number of files of the shard
+    """
+    if not 0 <= shard_index < shard_count:
+        raise Exception("shard out of range!", shard_index, shard_count)
+    relative_path_list: List[str] = []
+
+    def iter_shard_files() -> Iterator[Tuple[str, str, bytes]]:
+        # only the files of the shard are read
+        for file_path in iter_java_file_paths(project_name):
+            relative_path = get_relative_path(project_name, file_path)
+            if get_shard(relative_path, shard_count) == shard_index:
+                relative_path_list.append(relative_path)
+                yield file_path, get_name(file_path), read_java_file(file_path)
+
+    java_file_facts_list = analyze_files(iter_shard_files(), workers, cache, engine)
+
+    temporary_path = output_path + ".tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(SHARD_MAGIC)
+        write_block(
+            f, (facts_version(), shard_index, shard_count, len(relative_path_list))
+        )
+        # the files are found in walk order, so the records are sorted for the merge
+        for relative_path, java_file_facts in zip(
+            relative_path_list, java_file_facts_list
+        ):
+            write_block(f, (relative_path, java_file_facts.to_record()))
+    os.replace(temporary_path, output_path)
+    return len(relative_path_list)
+
+
+def read_shard_header(f: BinaryIO) -> Tuple[str, int, int, int]:
+    """
+    read the header of a facts file
+    return the facts version, the shard index, the shard count and the file count
+    """
+    if f.read(len(SHARD_MAGIC)) != SHARD_MAGIC:
+        raise Exception("not a facts file!", f.name)
+    return read_block(f)
+
+
+def iter_shard_records(
+    f: BinaryIO, file_count: int
+) -> Iterator[Tuple[Tuple[Tuple[int, str], ...], str, tuple]]:
+    """
+    read the records of a facts file after its header
+    yield the walk order key, the relative path and the facts record of every file
+    """
+    for _ in range(file_count):
+        relative_path, record = read_block(f)
+        yield walk_order_key(relative_path), relative_path, record
+    if f.read(1):
+        raise Exception("trailing data in facts file!", f.name)
+
+
+def merge_shards(shard_path_list: List[str]) -> List[Tuple[str, JavaFileFacts]]:
+    """
+    merge the facts files of all the shards of a project
+    every file is sorted already, so they are merged in one pass,
+    the time is linear in the facts and logarithmic in the number of shards
+    the shards must come from the same facts version and the same split
+
+    :param shard_path_list: the paths of the facts files, in any order
+    return the relative paths and the facts of the files in the order of
+        a single run, not linked yet
+    """
+    file_list: List[BinaryIO] = []
+    try:
+        iterator_list: List[Iterator] = []
+        shard_count: int | None = None
+        shard_index_set = set()
+        for shard_path in shard_path_list:
+            f = open(shard_path, "rb")
+            file_list.append(f)
+            version, shard_index, count, file_count = read_shard_header(f)
+            if version != facts_version():
+                raise Exception("facts file of another version!", shard_path, version)
+            if shard_count is None:
+                shard_count = count
+            elif count != shard_count:
+                raise Exception("facts file of another split!", shard_path, count)
+            if shard_index in shard_index_set:
+                raise Exception("shard merged twice!", shard_path, shard_index)
+            shard_index_set.add(shard_index)
+            iterator_list.append(iter_shard_records(f, file_count))
+        if shard_count is not None and len(shard_index_set) != shard_count:
+            missing_index_list = sorted(set(range(shard_count)) - shard_index_set)
+            raise Exception("shards missing!", missing_index_list)
+
+        return [
+            (relative_path, JavaFileFacts.from_record(record))
+            for _, relative_path, record in heapq.merge(
+                *iterator_list, key=lambda item: item[0]
+            )
+        ]
+    finally:
+        for f in file_list:
+            f.close()
+
+
+# test code
+if __name__ == "__main__":
+    import argparse
+    import subprocess
+    import sys
+    import tempfile
+    import time
+    from project_analyzer import analyze_project, link_project
+
+    arg_parser = argparse.ArgumentParser(description="analyze a java project in shards")
+    subparsers = arg_parser.add_subparsers(dest="command", required=True)
+    analyze_parser = subparsers.add_parser("analyze", help="analyze one shard")
+    analyze_parser.add_argument("project")
+    analyze_parser.add_argument("--shard", type=int, required=True)
+    analyze_parser.add_argument("--count", type=int, required=True)
+    analyze_parser.add_argument("--output", required=True)
+    merge_parser = subparsers.add_parser("merge", help="merge and link the shards")
+    merge_parser.add_argument("shard_paths", nargs="+")
+    merge_parser.add_argument("--dot", help="write the dot code to the path")
+    merge_parser.add_argument(
+        "--export", help="export the graph to a '.jsonl', '.graphml' or '.npz' path"
+    )
+    local_parser = subparsers.add_parser(
+        "local", help="run every shard as a process here, then merge them"
+    )
+    local_parser.add_argument("project", nargs="?", default="example-project")
+    local_parser.add_argument("--count", type=int, default=4)
+    local_parser.add_argument(
+        "--check", action="store_true", help="compare with a single run"
+    )
+    for parser in (analyze_parser, local_parser):
+        parser.add_argument("--workers", type=int, default=1)
+        parser.add_argument("--engine", default="walker", choices=("walker", "query"))
+        parser.add_argument("--cache", help="the path of the facts cache")
+    args = arg_parser.parse_args()
+
+    if args.command == "analyze":
+        cache = None if args.cache is None else AnalysisCache(args.cache)
+        try:
+            file_count = analyze_shard(
+                args.project,
+                args.shard,
+                args.count,
+                args.output,
+                args.workers,
+                cache,
+                args.engine,
+            )
+        finally:
+            if cache is not None:
+                cache.close()
+        print(f"shard {args.shard}/{args.count}: {file_count} files")
+
+    elif args.command == "merge":
+        start = time.perf_counter()
+        path_facts_list = merge_shards(args.shard_paths)
+        java_file_facts_list = [java_file_facts for _, java_file_facts in path_facts_list]
+        link_project(java_file_facts_list)
+        print(
+            f"{len(java_file_facts_list)} files merged and linked "
+            f"in {time.perf_counter() - start:.2f} s"
+        )
+        java_class_list = [
+            java_class
+            for java_file_facts in java_file_facts_list
+            for java_class in java_file_facts.public_class_set
+        ]
+        if args.dot is not None:
+            from Painter import Painter
+
+            painter = Painter()
+            for java_class in java_class_list:
+                painter.add_one(java_class)
+            painter.write_dot(args.dot)
+        if args.export is not None:
+            from graph_export import export_graph
+
+            export_graph(java_class_list, args.export)
+
+    else:
+        with tempfile.TemporaryDirectory() as temporary_dir:
+            shard_path_list = [
+                os.path.join(temporary_dir, f"shard-{shard_index}.facts")
+                for shard_index in range(args.count)
+            ]
+            # every shard in a process of its own, as on separate machines
+            process_list = []
+            for shard_index, shard_path in enumerate(shard_path_list):
+                command = [
+                    sys.executable,
+                    os.path.abspath(__file__),
+                    "analyze",
+                    args.project,
+                    "--shard",
+                    str(shard_index),
+                    "--count",
+                    str(args.count),
+                    "--output",
+                    shard_path,
+                    "--workers",
+                    str(args.workers),
+                    "--engine",
+                    args.engine,
+                ]
+                if args.cache is not None:
+                    command += ["--cache", f"{args.cache}.{shard_index}"]
+                process_list.append(subprocess.Popen(command))
+            for process in process_list:
+                if process.wait() != 0:
+                    raise Exception("shard failed!", process.args)
+            start = time.perf_counter()
+            path_facts_list = merge_shards(shard_path_list)
+        java_file_facts_list = [java_file_facts for _, java_file_facts in path_facts_list]
+        link_project(java_file_facts_list)
+        print(
+            f"{len(java_file_facts_list)} files merged and linked "
+            f"in {time.perf_counter() - start:.2f} s"
+        )
+
+        if args.check:
+            from git_diff import get_edges
+
+            single_facts_list = analyze_project(args.project, 1, None, args.engine)
+            link_project(single_facts_list)
+            merged_list = [
+                (java_file_facts.id, get_edges(java_file_facts))
+                for java_file_facts in java_file_facts_list
+            ]
+            single_list = [
+                (java_file_facts.id, get_edges(java_file_facts))
+                for java_file_facts in single_facts_list
+            ]
+            print("same as a single run:", merged_list == single_list)
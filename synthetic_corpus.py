@@ -0,0 +1,196 @@
+from __future__ import annotations
+from typing import List, Tuple
+import os
+import random
+
+# the java types the fields and methods use besides the generated classes
+LIBRARY_TYPE_LIST = ["String", "Integer", "Object", "Thread", "StringBuilder"]
+# the generic java types and the number of their type arguments
+GENERIC_TYPE_LIST = [
+    ("List", 1),
+    ("Map", 2),
+    ("Set", 1),
+    ("Optional", 1),
+    ("Function", 2),
+]
+
+
+def get_package_names(package_count: int, package_depth: int) -> List[str]:
+    """
+    make the names of the packages, every one at least three names deep
+    """
+    package_depth = max(3, package_depth)
+    package_name_list: List[str] = []
+    for index in range(package_count):
+        name_list = ["org", "synth"]
+        rest = index
+        for level in range(package_depth - 3):
+            name_list.append(f"m{level}_{rest % 4}")
+            rest //= 4
+        name_list.append(f"p{index}")
+        package_name_list.append(".".join(name_list))
+    return package_name_list
+
+
+def make_class_body(
+    rng: random.Random,
+    class_name: str,
+    type_name_list: List[str],
+    generic: bool,
+    depth: int,
+    nesting_depth: int,
+) -> List[str]:
+    """
+    make the lines of the members of a class
+    the inner classes are nested until the nesting depth
+    """
+    indent = "    " * (depth + 1)
+
+    def pick() -> str:
+        return rng.choice(type_name_list)
+
+    line_list: List[str] = []
+    if generic:
+        generic_name, argument_count = rng.choice(GENERIC_TYPE_LIST)
+        argument_list = ", ".join(pick() for _ in range(argument_count))
+        line_list.append(f"{indent}private {generic_name}<{argument_list}> items;")
+        line_list.append(
+            f"{indent}private Map<String, List<{pick()}>> index = new HashMap<>();"
+        )
+    for field_index in range(rng.randint(1, 3)):
+        line_list.append(f"{indent}private {pick()} field{field_index};")
+    if rng.random() < 0.3:
+        line_list.append(f"{indent}private {pick()}[] array;")
+
+    for method_index in range(rng.randint(1, 4)):
+        parameter = pick()
+        if generic and rng.random() < 0.5:
+            line_list.append(
+                f"{indent}public <T extends {parameter}> {pick()} "
+                f"method{method_index}(T value, List<? extends {pick()}> list) {{"
+            )
+        else:
+            line_list.append(
+                f"{indent}public {pick()} method{method_index}({parameter} value) {{"
+            )
+        line_list.append(f"{indent}    {pick()} local = value.method{method_index}();")
+        line_list.append(f"{indent}    {pick()}.method{rng.randint(0, 3)}(local);")
+        line_list.append(f"{indent}    System.out.println(value);")
+        if rng.random() < 0.3:
+            line_list.append(f"{indent}    if (local != null) {{")
+            line_list.append(f"{indent}        helper{method_index}(local);")
+            line_list.append(f"{indent}    }}")
+        line_list.append(f"{indent}    return null;")
+        line_list.append(f"{indent}}}")
+
+    if depth < nesting_depth:
+        inner_name = f"{class_name}Inner{depth}"
+        line_list.append(f"{indent}public class {inner_name} {{")
+        line_list.extend(
+            make_class_body(
+                rng, inner_name, type_name_list, generic, depth + 1, nesting_depth
+            )
+        )
+        line_list.append(f"{indent}}}")
+    return line_list
+
+
+def generate_corpus(
+    root: str,
+    file_count: int = 100,
+    package_count: int | None = None,
+    package_depth: int = 4,
+    nesting_depth: int = 1,
+    generic_ratio: float = 0.3,
+    wildcard_import_ratio: float = 0.3,
+    inheritance_fan_out: int = 3,
+    seed: int = 0,
+) -> List[str]:
+    """
+    write a synthetic java project, the same arguments write the same files
+    return the paths of the files
+
+    :param root: the directory the project is written to
+    :param file_count: the number of java files, one public class each
+    :param package_count: the number of packages, by default one per 20 files
+    :param package_depth: the number of names of a package name
+    :param nesting_depth: the depth of the inner classes of a class
+    :param generic_ratio: the share of classes with generic types
+    :param wildcard_import_ratio: the share of imports of whole packages
+    :param inheritance_fan_out: the number of classes extending each class,
+        0 for no inheritance
+    :param seed: the seed of the random choices
+    """
+    rng = random.Random(seed)
+    if package_count is None:
+        package_count = max(1, file_count // 20)
+    package_name_list = get_package_names(package_count, package_depth)
+
+    # the package and name of every class, the class i is in package i % count
+    class_list: List[Tuple[str, str]] = [
+        (package_name_list[index % package_count], f"Class{index}")
+        for index in range(file_count)
+    ]
+
+    path_list: List[str] = []
+    for index, (package_name, class_name) in enumerate(class_list):
+        import_line_list: List[str] = []
+        type_name_list = list(LIBRARY_TYPE_LIST)
+        for _ in range(rng.randint(1, 5)):
+            other_package_name, other_class_name = rng.choice(class_list)
+            type_name_list.append(other_class_name)
+            if other_package_name == package_name:
+                continue
+            if rng.random() < wildcard_import_ratio:
+                import_line_list.append(f"import {other_package_name}.*;")
+            else:
+                import_line_list.append(
+                    f"import {other_package_name}.{other_class_name};"
+                )
+        generic = rng.random() < generic_ratio
+        if generic:
+            import_line_list.append("import java.util.*;")
+            import_line_list.append("import java.util.function.*;")
+
+        # the classes form a tree, the class i extends the class (i - 1) // fan out
+        header = f"public class {class_name}"
+        if generic:
+            header += f"<E extends {rng.choice(type_name_list)}>"
+        if inheritance_fan_out > 0 and index > 0:
+            parent_package_name, parent_name = class_list[
+                (index - 1) // inheritance_fan_out
+            ]
+            header += f" extends {parent_name}"
+            if parent_package_name != package_name:
+                import_line_list.append(f"import {parent_package_name}.{parent_name};")
+        if rng.random() < 0.5:
+            header += f" implements {rng.choice(type_name_list)}"
+            if generic:
+                header += f", Comparable<{class_name}>"
+
+        line_list = [f"package {package_name};", ""]
+        line_list.extend(sorted(set(import_line_list)))
+        line_list.append("")
+        line_list.append(f"// generated, seed {seed}")
+        line_list.append(header + " {")
+        line_list.extend(
+            make_class_body(rng, class_name, type_name_list, generic, 0, nesting_depth)
+        )
+        line_list.append("}")
+
+        dir_path = os.path.join(root, *package_name.split("."))
+        os.makedirs(dir_path, exist_ok=True)
+        file_path = os.path.join(dir_path, class_name + ".java")
+        with open(file_path, "w", encoding="utf-8", newline="\n") as f:
+            f.write("\n".join(line_list) + "\n")
+        path_list.append(file_path)
+    return path_list
+
+
+# test code
+if __name__ == "__main__":
+    import sys
+
+    root = sys.argv[1] if len(sys.argv) > 1 else "synthetic-project"
+    file_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    print(len(generate_corpus(root, file_count)), "files written to", root)
@@ -0,0 +1,50 @@
+from __future__ import annotations
+import asyncio
+import os
+import pytest
+from daemon import AnalysisDaemon, resolve_inside
+
+# the root of the repository with the bundled projects
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_resolve_inside(tmp_path):
+    root_dir = str(tmp_path / "root")
+    os.makedirs(os.path.join(root_dir, "a"))
+    assert resolve_inside(root_dir, "a/B.java") == os.path.join(root_dir, "a", "B.java")
+    for path in ("../B.java", "a/../../B.java", str(tmp_path / "B.java")):
+        with pytest.raises(Exception, match="outside"):
+            resolve_inside(root_dir, path)
+    # a link leaving the directory is refused too
+    os.symlink(str(tmp_path), os.path.join(root_dir, "link"))
+    with pytest.raises(Exception, match="outside"):
+        resolve_inside(root_dir, "link/B.java")
+
+
+def test_requests_stay_inside(tmp_path):
+    output_dir = str(tmp_path / "output")
+    daemon = AnalysisDaemon(
+        os.path.join(ROOT, "example-project"), 1, output_dir=output_dir
+    )
+
+    async def run() -> None:
+        await daemon.load()
+        class_id = next(daemon.state.java_classes()).id
+        response = await daemon.handle_request(
+            b'{"id": 1, "method": "render", "params": {"class": "%s", '
+            b'"output": "../escaped.dot"}}' % class_id.encode()
+        )
+        assert "outside" in response["error"]
+        response = await daemon.handle_request(
+            b'{"id": 2, "method": "analyze", "params": {"paths": ["../../x.java"]}}'
+        )
+        assert "outside" in response["error"]
+        result = await daemon.render({"class": class_id, "output": "sub/graph.dot"})
+        assert result["output"] == os.path.join(output_dir, "sub", "graph.dot")
+
+    try:
+        asyncio.run(run())
+    finally:
+        daemon.executor.shutdown()
+    assert os.path.exists(os.path.join(output_dir, "sub", "graph.dot"))
+    assert not os.path.exists(str(tmp_path / "escaped.dot"))
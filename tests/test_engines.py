@@ -0,0 +1,135 @@
+from __future__ import annotations
+from typing import List
+import os
+import pytest
+from AnalysisCache import AnalysisCache
+from AnalysisError import AnalysisError
+from JavaClass import RECORD_SET_NAMES
+from JavaFileFacts import JavaFileFacts
+from project_analyzer import analyze_file, analyze_project, warn_ambiguous_names
+from synthetic_corpus import generate_corpus
+
+# the root of the repository with the bundled projects
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# a file with the constructs the engines reach differently: generics,
+# inner and anonymous classes, initializers and nested invocations
+MIXED_SOURCE = """
+package a.b.c;
+import java.util.*;
+import x.y.Z;
+public final class Mixed<T extends Comparable<T>> extends Base<T>
+        implements Iface<T>, Second {
+    static { Registry.register(new Entry()); }
+    { Helper.init(this); }
+    Map<Key, List<Value>> field;
+    Z[] array;
+    public <E> Map<String, List<E>> method(List<Foo> a, E[] b, int c) {
+        Bar x = new Bar();
+        for (int i = 0; i < c; i++) { Util.call(String.valueOf(i)); }
+        if (a.isEmpty()) { Checker.fail(x.field.sub); }
+        Runnable task = new Runnable() { public void run() { Job.start(); } };
+        foo.bar.Baz.run(new Qux());
+        return Collections.<E>emptyMap();
+    }
+    public class Inner<E> extends Base<E> implements Runner<E> { E e; Helper h; }
+}
+"""
+
+# a file failing in both engines, the walker stops in document order at the
+# local class, the query engine analyzes the members of the classes first
+LOCAL_CLASS_SOURCE = b"""
+package a.b;
+public class A {
+    void method() { class Deep { } }
+    public class B { }
+}
+"""
+
+# a file importing two classes of the same name
+AMBIGUOUS_SOURCE = b"""
+package a.b;
+import p.X;
+import q.X;
+public class C extends X { }
+"""
+
+
+def get_facts(project: str, engine: str) -> List:
+    """
+    analyze the project with the engine
+    return the facts and the errors of every file, the sets sorted
+    """
+    error_list: List[AnalysisError] = []
+    java_file_facts_list = analyze_project(
+        project, 1, None, engine, error_list=error_list
+    )
+    return [fact_tuple(java_file_facts) for java_file_facts in java_file_facts_list] + [
+        analysis_error.to_dict() for analysis_error in error_list
+    ]
+
+
+def fact_tuple(java_file_facts: JavaFileFacts) -> tuple:
+    class_list = [
+        (java_class.id, [sorted(getattr(java_class, n)) for n in RECORD_SET_NAMES])
+        for java_class in java_file_facts.public_class_set
+    ]
+    return (
+        java_file_facts.id,
+        java_file_facts.package_name,
+        sorted(java_file_facts.import_file_set),
+        sorted(java_file_facts.import_package_set),
+        sorted(class_list),
+        java_file_facts.ambiguous_name_list,
+    )
+
+
+@pytest.mark.parametrize(
+    "project", ["example-project", "example-dependency-graphs", "course-02242-examples"]
+)
+def test_bundled_projects(project):
+    project = os.path.join(ROOT, project)
+    assert get_facts(project, "query") == get_facts(project, "walker")
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_synthetic_corpus(tmp_path, seed):
+    generate_corpus(str(tmp_path), 150, seed=seed)
+    assert get_facts(str(tmp_path), "query") == get_facts(str(tmp_path), "walker")
+
+
+def test_mixed_constructs(tmp_path):
+    package_dir = tmp_path / "a" / "b" / "c"
+    package_dir.mkdir(parents=True)
+    (package_dir / "Mixed.java").write_text(MIXED_SOURCE)
+    walker_facts = get_facts(str(tmp_path), "walker")
+    assert walker_facts[0][0] == "a.b.c.Mixed"
+    assert get_facts(str(tmp_path), "query") == walker_facts
+
+
+def test_cache_keeps_engines_apart(tmp_path):
+    path_name_content = ("a/b/A.java", "A", LOCAL_CLASS_SOURCE)
+    facts_dict = {}
+    for engine in ("walker", "query"):
+        java_file_facts, analysis_error = analyze_file(path_name_content, engine)
+        assert analysis_error is not None
+        facts_dict[engine] = java_file_facts
+    assert fact_tuple(facts_dict["walker"]) != fact_tuple(facts_dict["query"])
+
+    with AnalysisCache(str(tmp_path / "facts.db")) as cache:
+        cache.put("a/b/A.java", LOCAL_CLASS_SOURCE, facts_dict["walker"], "walker")
+        assert cache.get("a/b/A.java", LOCAL_CLASS_SOURCE, "query") is None
+        java_file_facts = cache.get("a/b/A.java", LOCAL_CLASS_SOURCE, "walker")
+        assert fact_tuple(java_file_facts) == fact_tuple(facts_dict["walker"])
+
+
+@pytest.mark.parametrize("engine", ["walker", "query"])
+def test_ambiguous_name(caplog, engine):
+    java_file_facts, analysis_error = analyze_file(
+        ("a/b/C.java", "C", AMBIGUOUS_SOURCE), engine
+    )
+    assert analysis_error is None
+    assert java_file_facts.ambiguous_name_list == [("a.b.C", "X", ["p.X", "q.X"])]
+    assert next(iter(java_file_facts.public_class_set)).inherit_id_set == {"p.X"}
+    warn_ambiguous_names([java_file_facts])
+    assert "ambiguous name X in a.b.C: ['p.X', 'q.X'], p.X is chosen" in caplog.text
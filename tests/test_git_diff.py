@@ -0,0 +1,107 @@
+from __future__ import annotations
+from typing import Set
+import os
+import re
+import shutil
+import subprocess
+import pytest
+from git_diff import Edge, diff_revisions, get_edges
+from project_analyzer import analyze_project, link_project
+from synthetic_corpus import generate_corpus
+
+
+def git(repository: str, *argument_list: str) -> None:
+    subprocess.run(
+        [
+            "git",
+            "-C",
+            repository,
+            "-c",
+            "user.name=test",
+            "-c",
+            "user.email=test@example.com",
+            *argument_list,
+        ],
+        check=True,
+        capture_output=True,
+    )
+
+
+def commit_all(repository: str) -> None:
+    git(repository, "add", "-A")
+    git(repository, "commit", "-q", "--allow-empty", "-m", "change")
+
+
+def get_all_edges(project: str) -> Set[Edge]:
+    """
+    get the edges of the project linked as a whole
+    """
+    java_file_facts_list = analyze_project(project, 1)
+    link_project(java_file_facts_list)
+    edge_set: Set[Edge] = set()
+    for java_file_facts in java_file_facts_list:
+        edge_set |= get_edges(java_file_facts)
+    return edge_set
+
+
+def change_files(repository: str, step: int) -> None:
+    """
+    remove a file, move one to another package and rename the class of another
+    """
+    path_list = sorted(
+        os.path.join(dir_path, file_name)
+        for dir_path, dir_name_list, file_name_list in os.walk(repository)
+        if ".git" not in dir_path.split(os.sep)
+        for file_name in file_name_list
+        if file_name.endswith(".java")
+    )
+    removed_path, moved_path, renamed_path, target_path = path_list[step::7][:4]
+    os.remove(removed_path)
+
+    content = open(moved_path).read()
+    target_dir = os.path.dirname(target_path)
+    package_name = os.path.relpath(target_dir, repository).replace(os.sep, ".")
+    content = re.sub(r"package [\w.]+;", f"package {package_name};", content)
+    os.remove(moved_path)
+    with open(os.path.join(target_dir, os.path.basename(moved_path)), "w") as f:
+        f.write(content)
+
+    name = os.path.basename(renamed_path)[: -len(".java")]
+    content = open(renamed_path).read().replace(name, name + "Renamed")
+    os.remove(renamed_path)
+    with open(renamed_path.replace(name, name + "Renamed"), "w") as f:
+        f.write(content)
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+def test_diff_matches_whole_linking(tmp_path):
+    repository = str(tmp_path / "repository")
+    generate_corpus(repository, 80, seed=1)
+    git(repository, "init", "-q")
+    commit_all(repository)
+    edge_set_list = [get_all_edges(repository)]
+    for step in range(2):
+        change_files(repository, step)
+        commit_all(repository)
+        edge_set_list.append(get_all_edges(repository))
+
+    state = None
+    for step in range(2):
+        old_revision = f"HEAD~{2 - step}"
+        new_revision = f"HEAD~{1 - step}"
+        old_edge_set, new_edge_set = edge_set_list[step : step + 2]
+        # from git, then from the state of the last diff
+        for revision_diff in (
+            diff_revisions(repository, old_revision, new_revision),
+            diff_revisions(repository, old_revision, new_revision, state=state),
+        ):
+            assert revision_diff.added_edge_set == new_edge_set - old_edge_set
+            assert revision_diff.removed_edge_set == old_edge_set - new_edge_set
+        state = revision_diff.state
+        # the files the change doesn't reach are never linked
+        assert state.unlinked_index_set
+
+    linked_edge_set: Set[Edge] = set()
+    for java_file_facts in state.java_file_facts_list():
+        linked_edge_set |= get_edges(java_file_facts)
+    assert linked_edge_set == edge_set_list[-1]
@@ -0,0 +1,67 @@
+from __future__ import annotations
+from collections import Counter
+from typing import List
+import io
+import json
+import os
+import pytest
+from JavaClass import JavaClass
+from graph_export import get_csr_id, load_csr, write_csr, write_jsonl
+from project_analyzer import analyze_project, link_project
+
+# the root of the repository with the bundled projects
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_java_classes() -> List[JavaClass]:
+    """
+    get the classes of the example project twice, analyzed apart,
+    so every id belongs to two classes, and a class of its own id
+    """
+    java_class_list: List[JavaClass] = []
+    for _ in range(2):
+        java_file_facts_list = analyze_project(os.path.join(ROOT, "example-project"), 1)
+        link_project(java_file_facts_list)
+        for java_file_facts in java_file_facts_list:
+            java_class_list.extend(java_file_facts.public_class_set)
+    java_class = JavaClass("p", "Only", [])
+    java_class.depend_id_set.add(java_class_list[0].id)
+    java_class_list.insert(1, java_class)
+    return java_class_list
+
+
+@pytest.mark.parametrize("hide_jdk", [False, True])
+def test_csr_matches_jsonl_with_duplicate_ids(tmp_path, hide_jdk):
+    numpy = pytest.importorskip("numpy")
+    java_class_list = get_java_classes()
+
+    output = io.StringIO()
+    write_jsonl(java_class_list, output, hide_jdk)
+    id_dict = {}
+    edge_counter = Counter()
+    for line in output.getvalue().splitlines():
+        record = json.loads(line)
+        if record["kind"] == "node":
+            id_dict[record["id"]] = record["name"]
+        else:
+            edge_counter[
+                (id_dict[record["source"]], id_dict[record["target"]], record["label"])
+            ] += 1
+
+    csr_path = str(tmp_path / "graph.npz")
+    write_csr(java_class_list, csr_path, hide_jdk)
+    array_dict = load_csr(csr_path, mmap=False)
+    indptr = array_dict["indptr"]
+    assert len(indptr) == len(id_dict) + 1
+    assert numpy.all(numpy.diff(indptr) >= 0)
+    csr_edge_counter = Counter()
+    for source in range(len(id_dict)):
+        for position in range(indptr[source], indptr[source + 1]):
+            csr_edge_counter[
+                (
+                    get_csr_id(array_dict, source),
+                    get_csr_id(array_dict, int(array_dict["indices"][position])),
+                    str(array_dict["labels"][array_dict["relations"][position]]),
+                )
+            ] += 1
+    assert csr_edge_counter == edge_counter
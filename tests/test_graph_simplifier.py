@@ -0,0 +1,91 @@
+from __future__ import annotations
+from typing import Dict, Iterable, Set
+import pytest
+from GraphIndex import GraphIndex
+from GraphSimplifier import REDUCED_LABEL_SET, GraphSimplifier
+from JavaClass import JavaClass
+from project_analyzer import analyze_project, link_project
+from synthetic_corpus import generate_corpus
+
+
+def reachable(edge_dict: Dict[str, Set[str]]) -> Dict[str, Set[str]]:
+    """
+    get the ids every class reaches along the edges
+    """
+    reachable_dict: Dict[str, Set[str]] = {}
+    for start in edge_dict:
+        seen_set: Set[str] = set()
+        stack = list(edge_dict[start])
+        while stack:
+            node = stack.pop()
+            if node not in seen_set:
+                seen_set.add(node)
+                stack.extend(edge_dict.get(node, ()))
+        reachable_dict[start] = seen_set
+    return reachable_dict
+
+
+def check_reduction(java_classes: Iterable[JavaClass]) -> int:
+    """
+    reduce the graph and check every class reaches the same classes
+    along the inheritance and realization edges
+    return the number of edges reduced
+    """
+    graph_index = GraphIndex(java_classes)
+    graph_simplifier = GraphSimplifier(graph_index)
+    kept_edge_dict = graph_simplifier.simplify()
+    before_dict: Dict[str, Set[str]] = {}
+    after_dict: Dict[str, Set[str]] = {}
+    for java_class_id in graph_index.class_dict:
+        number = graph_index.number_dict[java_class_id]
+        target_set = {
+            graph_index.id_list[target]
+            for target, label in graph_index.forward_list[number]
+            if label in REDUCED_LABEL_SET
+        }
+        before_dict[java_class_id] = target_set
+        after_dict[java_class_id] = target_set & kept_edge_dict[java_class_id]
+    assert reachable(after_dict) == reachable(before_dict)
+    return graph_simplifier.reduced_count
+
+
+def make_class(name: str, parent_id_list: Iterable[str]) -> JavaClass:
+    java_class = JavaClass("p", name, [])
+    for parent_id in parent_id_list:
+        java_class.inherit_id_set.add(parent_id)
+    return java_class
+
+
+def test_chain_is_reduced():
+    reduced_count = check_reduction(
+        [
+            make_class("A", ["p.B", "p.C"]),
+            make_class("B", ["p.C"]),
+            make_class("C", []),
+        ]
+    )
+    assert reduced_count == 1
+
+
+def test_cycle_keeps_reachability():
+    # both classes of the cycle reach Object only through their own edge
+    reduced_count = check_reduction(
+        [
+            make_class("A", ["p.B", "java.lang.Object"]),
+            make_class("B", ["p.A", "java.lang.Object"]),
+            make_class("C", ["p.A", "java.lang.Object"]),
+        ]
+    )
+    assert reduced_count == 1  # only C -> Object
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2, 3])
+def test_synthetic_corpus_keeps_reachability(tmp_path, seed):
+    generate_corpus(str(tmp_path), 300, seed=seed)
+    java_file_facts_list = analyze_project(str(tmp_path), 1)
+    link_project(java_file_facts_list)
+    check_reduction(
+        java_class
+        for java_file_facts in java_file_facts_list
+        for java_class in java_file_facts.public_class_set
+    )
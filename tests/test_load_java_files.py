@@ -0,0 +1,20 @@
+from __future__ import annotations
+import codecs
+from load_java_files import load_java_files, read_java_file
+
+SOURCE = "package a.b;\n// café\npublic class A { }\n"
+
+
+def test_encodings_read_as_utf8(tmp_path):
+    package_dir = tmp_path / "a" / "b"
+    package_dir.mkdir(parents=True)
+    for name, content in (
+        ("Plain", SOURCE.encode("utf-8")),
+        ("Marked", codecs.BOM_UTF16_LE + SOURCE.encode("utf-16-le")),
+        # latin-1 without a mark isn't valid utf-8
+        ("Latin", SOURCE.encode("latin-1")),
+    ):
+        path = package_dir / f"{name}.java"
+        path.write_bytes(content)
+        assert read_java_file(str(path)) == SOURCE.encode("utf-8")
+    assert [content for _, content in load_java_files(str(tmp_path))] == [SOURCE] * 3
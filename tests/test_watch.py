@@ -0,0 +1,84 @@
+from __future__ import annotations
+from typing import List
+import os
+import pytest
+from AnalysisError import AnalysisError
+from JavaAnalyzer import JavaAnalyzer
+from JavaClass import RECORD_SET_NAMES, JavaClass
+from StringTable import string_table
+from watch import ProjectWatcher
+
+# the content of the watched file, the name of its parent changes between the polls
+CONTENT = (
+    "package a.b;\npublic class A extends %s {"
+    " Type0 f0; Type1 f1; Type2 f2; Type3 f3; Type4 f4; Type5 f5; Type6 f6; }\n"
+)
+
+
+def get_facts(java_class: JavaClass) -> List[List[str]]:
+    return [sorted(getattr(java_class, set_name)) for set_name in RECORD_SET_NAMES]
+
+
+@pytest.mark.parametrize(
+    "hidden_name, parent_name",
+    [("Hidden", "Parent"), ("HiddenClass", "ParentParentParent"), ("H", "P")],
+)
+def test_failed_analysis_keeps_polling(tmp_path, hidden_name, parent_name):
+    package_dir = tmp_path / "a" / "b"
+    package_dir.mkdir(parents=True)
+    path = str(package_dir / "A.java")
+    poll_count = 0
+
+    def write(content: str) -> None:
+        nonlocal poll_count
+        poll_count += 1
+        with open(path, "w") as f:
+            f.write(content)
+        # a new modification time, even within the resolution of the clock
+        os.utime(path, ns=(poll_count * 10**9, poll_count * 10**9))
+
+    write(CONTENT % "Base")
+    project_watcher = ProjectWatcher(str(tmp_path))
+    project_watcher.poll()
+
+    # a class that is not public fails the analysis after the tree is edited,
+    # the file keeps its facts so far and the next poll starts from scratch
+    write(
+        f"package a.b;\nclass {hidden_name} {{ }}\n"
+        + (CONTENT % "Base")[len("package a.b;\n") :]
+    )
+    project_watcher.poll()
+    assert isinstance(project_watcher.error_dict[path], AnalysisError)
+    assert project_watcher.watched_file_dict[path].tree is None
+
+    content = CONTENT % parent_name
+    write(content)
+    project_watcher.poll()
+    assert not project_watcher.error_dict
+    java_analyzer = JavaAnalyzer("A", content)
+    java_analyzer.analyze()
+    assert get_facts(next(project_watcher.state.java_classes())) == get_facts(
+        next(iter(java_analyzer.public_class_set))
+    )
+
+
+def test_string_table_stays_bounded(tmp_path):
+    package_dir = tmp_path / "a" / "b"
+    package_dir.mkdir(parents=True)
+    path = str(package_dir / "A.java")
+    project_watcher = ProjectWatcher(str(tmp_path))
+    length_list: List[int] = []
+    for poll_count in range(1, 301):
+        content = CONTENT % f"Parent{poll_count}"
+        with open(path, "w") as f:
+            f.write(content)
+        os.utime(path, ns=(poll_count * 10**9, poll_count * 10**9))
+        project_watcher.poll()
+        length_list.append(len(string_table))
+    # every poll adds a name, the replaced names are dropped now and then
+    assert max(length_list) < 100
+    java_analyzer = JavaAnalyzer("A", content)
+    java_analyzer.analyze()
+    assert get_facts(next(project_watcher.state.java_classes())) == get_facts(
+        next(iter(java_analyzer.public_class_set))
+    )
@@ -0,0 +1,215 @@
+from __future__ import annotations
+from typing import Callable, Dict, Set, Tuple
+from AnalysisError import AnalysisError
+from JavaFileFacts import JavaFileFacts
+from ProjectState import ProjectState
+from load_java_files import get_name, read_java_file
+from project_analyzer import analyze_source
+import logging
+import os
+import time
+import tree_sitter
+
+logger = logging.getLogger(__name__)
+
+
+def common_prefix_length(old: bytes, new: bytes) -> int:
+    """
+    get the length of the common prefix of two contents
+    """
+    low, high = 0, min(len(old), len(new))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[:middle] == new[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def common_suffix_length(old: bytes, new: bytes, max_length: int) -> int:
+    """
+    get the length of the common suffix of two contents, at most max_length
+    """
+    low, high = 0, max_length
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[len(old) - middle :] == new[len(new) - middle :]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def get_point(content: bytes, byte_offset: int) -> Tuple[int, int]:
+    """
+    get the row and column of the byte offset in the content
+    """
+    row = content.count(b"\n", 0, byte_offset)
+    column = byte_offset - content.rfind(b"\n", 0, byte_offset) - 1
+    return (row, column)
+
+
+def edit_tree(tree: tree_sitter.Tree, old: bytes, new: bytes) -> None:
+    """
+    tell the tree which byte range changed from the old to the new content
+    """
+    start_byte = common_prefix_length(old, new)
+    suffix_length = common_suffix_length(
+        old, new, min(len(old), len(new)) - start_byte
+    )
+    old_end_byte = len(old) - suffix_length
+    new_end_byte = len(new) - suffix_length
+    tree.edit(
+        start_byte=start_byte,
+        old_end_byte=old_end_byte,
+        new_end_byte=new_end_byte,
+        start_point=get_point(old, start_byte),
+        old_end_point=get_point(old, old_end_byte),
+        new_end_point=get_point(new, new_end_byte),
+    )
+
+
+class WatchedFile:
+    """
+    the last seen version of a watched java file
+    """
+
+    def __init__(
+        self,
+        mtime_ns: int,
+        size: int,
+        content: bytes,
+        tree: tree_sitter.Tree | None,
+    ) -> None:
+        self.mtime_ns = mtime_ns  # the modification time of the file
+        self.size = size  # the size of the file
+        self.content = content  # the content the tree is parsed from
+        # the tree of the content, None once it is edited for a new content,
+        # or if the analysis of the content failed
+        self.tree: tree_sitter.Tree | None = tree
+
+
+class ProjectWatcher:
+    """
+    watch the java files of a project by polling
+    a changed file is parsed incrementally from its previous tree,
+    and only the files it affects are linked again
+    """
+
+    def __init__(self, project_name: str, interval: float = 0.2) -> None:
+        """
+        :param project_name: the directory of the project
+        :param interval: the seconds between two polls
+        """
+        self.project_name = project_name
+        self.interval = interval
+        self.state = ProjectState()  # the linked facts of the project
+        self.watched_file_dict: Dict[str, WatchedFile] = {}  # path maps to file
+        # path maps to the error of the last analysis of the file
+        self.error_dict: Dict[str, AnalysisError] = {}
+
+    def scan(self) -> Dict[str, os.stat_result]:
+        """
+        find the java files of the project and their status
+        """
+        stat_dict: Dict[str, os.stat_result] = {}
+        for dir_path, _, file_names in os.walk(self.project_name):
+            for file_name in file_names:
+                if file_name.endswith(".java"):
+                    file_path = os.path.join(dir_path, file_name)
+                    try:
+                        stat_dict[file_path] = os.stat(file_path)
+                    except FileNotFoundError:
+                        continue
+        return stat_dict
+
+    def load_file(self, path: str, stat: os.stat_result) -> Set[str]:
+        """
+        parse and analyze a new or changed file
+        a failed analysis keeps the facts found before the error
+        return the paths of the files linked again
+        """
+        content = read_java_file(path)
+        watched_file = self.watched_file_dict.get(path)
+        old_tree = None
+        if watched_file is not None:
+            if watched_file.content == content:
+                watched_file.mtime_ns = stat.st_mtime_ns
+                return set()
+            old_tree = watched_file.tree
+            if old_tree is not None:
+                # the edit can't be undone, so a failed analysis leaves no tree
+                # and the next change is parsed from scratch
+                watched_file.tree = None
+                edit_tree(old_tree, watched_file.content, content)
+
+        java_analyzer, analysis_error = analyze_source(
+            (path, get_name(path), content), old_tree=old_tree
+        )
+        tree = None
+        if analysis_error is None:
+            self.error_dict.pop(path, None)
+            tree = java_analyzer.tree
+        else:
+            logger.warning("partial facts for %s", analysis_error)
+            self.error_dict[path] = analysis_error
+        self.watched_file_dict[path] = WatchedFile(
+            stat.st_mtime_ns, stat.st_size, content, tree
+        )
+        if java_analyzer is None:
+            java_file_facts = JavaFileFacts("", get_name(path), "", set(), set(), set())
+        else:
+            java_file_facts = JavaFileFacts.from_analyzer(java_analyzer)
+        return self.state.update_file(path, java_file_facts)
+
+    def poll(self) -> Set[str]:
+        """
+        check the project once and update the changed files
+        return the paths of the files linked again
+        """
+        stat_dict = self.scan()
+        relinked_path_set: Set[str] = set()
+        for path in list(self.watched_file_dict):
+            if path not in stat_dict:
+                del self.watched_file_dict[path]
+                self.error_dict.pop(path, None)
+                relinked_path_set |= self.state.remove_file(path)
+        for path, stat in stat_dict.items():
+            watched_file = self.watched_file_dict.get(path)
+            if (
+                watched_file is None
+                or watched_file.mtime_ns != stat.st_mtime_ns
+                or watched_file.size != stat.st_size
+            ):
+                relinked_path_set |= self.load_file(path, stat)
+        # every class of the process is in the state, the dropped names can go
+        self.state.compact_strings()
+        return relinked_path_set
+
+    def run(self, callback: Callable[[Set[str], float], None] | None = None) -> None:
+        """
+        poll the project until interrupted
+
+        :param callback: called with the paths of the files linked again
+            and the seconds the update took, after every update
+        """
+        while True:
+            start_time = time.perf_counter()
+            relinked_path_set = self.poll()
+            if relinked_path_set and callback is not None:
+                callback(relinked_path_set, time.perf_counter() - start_time)
+            time.sleep(self.interval)
+
+
+# test code
+if __name__ == "__main__":
+    import sys
+
+    def print_update(relinked_path_set: Set[str], seconds: float) -> None:
+        print(f"relinked {len(relinked_path_set)} files in {seconds * 1000:.1f}ms")
+        for path in sorted(relinked_path_set):
+            print(" ", path)
+
+    project_name = sys.argv[1] if len(sys.argv) > 1 else "example-project"
+    ProjectWatcher(project_name).run(print_update)